@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+from config import Config
+from generation_jobs import check_llm_result
+from job_queue import JobQueue, PRIORITY_LOW
+
+# Fields each analysis prompt reads; other edits (ids, timestamps, notes) do not invalidate it
+ANALYSIS_FIELDS = {
+    'characters': ['name', 'age', 'description', 'personality', 'goals', 'conflicts'],
+    'scenes': ['scene_number', 'title', 'location', 'time_of_day', 'tone_mood', 'characters',
+               'goal', 'conflict_stakes', 'action']
+}
+
+class AnalysisPrefetcher:
+    """Precompute scene and character analyses in the background after they are saved
+
+    Analyses are cached by a hash of the fields the prompt uses, so an entity that did
+    not change is never analyzed twice, and "Analyze with AI" is instant once the
+    low-priority background job has finished.
+    """
+
+    def __init__(self, job_queue: JobQueue, llm_client, cache_file: str = None, debounce_seconds: float = None):
+        self.job_queue = job_queue
+        self.llm_client = llm_client
+        self.cache_file = cache_file or os.path.join("data", "analysis_cache.json")
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else Config.PREFETCH_DEBOUNCE_SECONDS
+        self.lock = threading.Lock()
+        self.timers = {}  # (script_id, data_type, entity_id) -> pending Timer
+        self.cache = self.load_cache()
+        self.job_queue.register_handler('analysis', self.run_analysis_job, self.store_job_result)
+
+    def load_cache(self) -> Dict:
+        """Load cached analyses from JSON file"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+            except Exception as e:
+                print(f"Error loading analysis cache: {e}")
+        return {}
+
+    def save_cache(self):
+        """Save cached analyses to JSON file, dropping the oldest beyond the limit"""
+        with self.lock:
+            while len(self.cache) > Config.ANALYSIS_CACHE_LIMIT:
+                self.cache.pop(next(iter(self.cache)))
+            try:
+                os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+                with open(self.cache_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.cache, f, indent=2, ensure_ascii=False)
+            except Exception as e:
+                print(f"Error saving analysis cache: {e}")
+
+    @staticmethod
+    def analysis_key(data_type: str, data: Dict) -> str:
+        """Content hash of the fields an analysis depends on"""
+        relevant = {field: data.get(field) for field in ANALYSIS_FIELDS[data_type]}
+        encoded = json.dumps([data_type, relevant], sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def analyze(self, data_type: str, data: Dict) -> str:
+        """Run the analysis prompt for an entity"""
+        if data_type == 'characters':
+            return self.llm_client.analyze_character(data)
+        return self.llm_client.analyze_scene(data)
+
+    def run_analysis_job(self, payload: Dict) -> str:
+        return check_llm_result(self.analyze(payload['data_type'], payload['data']))
+
+    def store_job_result(self, job: Dict):
+        self.store(job['payload']['key'], job['result'])
+
+    def store(self, key: str, analysis: str):
+        with self.lock:
+            self.cache.pop(key, None)
+            self.cache[key] = analysis
+        self.save_cache()
+
+    def get_cached(self, data_type: str, data: Dict) -> Optional[str]:
+        """Return a precomputed analysis if the entity is unchanged since it was analyzed"""
+        with self.lock:
+            return self.cache.get(self.analysis_key(data_type, data))
+
+    def get_analysis(self, data_type: str, data: Dict) -> str:
+        """Return the cached analysis, or run it now and cache it"""
+        cached = self.get_cached(data_type, data)
+        if cached is not None:
+            return cached
+        analysis = self.analyze(data_type, data)
+        if not analysis.startswith("Error generating"):
+            self.store(self.analysis_key(data_type, data), analysis)
+        return analysis
+
+    def on_script_change(self, username: str, script_id: str, data_type: str, entity_id: str, data: Optional[Dict]):
+        """ScriptAwareManager listener: schedule a debounced analysis of a saved scene or character"""
+        if data_type not in ANALYSIS_FIELDS:
+            return
+        timer_key = (script_id, data_type, entity_id)
+        with self.lock:
+            pending = self.timers.pop(timer_key, None)
+            if pending:
+                pending.cancel()
+            if data is None:
+                return
+            # Rapid successive saves of the same entity only trigger one analysis
+            timer = threading.Timer(self.debounce_seconds, self.enqueue, args=(username, data_type, dict(data), timer_key))
+            timer.daemon = True
+            self.timers[timer_key] = timer
+        timer.start()
+
+    def enqueue(self, username: str, data_type: str, data: Dict, timer_key=None):
+        """Queue a low-priority analysis job unless the current content was already analyzed"""
+        with self.lock:
+            if timer_key is not None:
+                self.timers.pop(timer_key, None)
+        key = self.analysis_key(data_type, data)
+        with self.lock:
+            if key in self.cache:
+                return
+        label = data.get('name') if data_type == 'characters' else f"Scene {data.get('scene_number', 'N/A')}"
+        self.job_queue.submit(
+            'analysis',
+            {'data_type': data_type, 'data': data, 'key': key},
+            username,
+            label=f"Analyze {label}",
+            priority=PRIORITY_LOW,
+            dedupe_key=key
+        )
@@ -25,14 +25,27 @@ from text_modifier import TextModifier
 from llm_client import LLMClient
 from chat_manager import ChatManager
 from word_exporter import WordExporter
+from screenplay_exporters import FDXExporter, FountainExporter
+from screenplay_importer import import_screenplay
+from screenplay_parser import scene_stats
+from pagination import Paginator
 from scene_generator import SceneGenerator
 from sample_data import add_sample_data_to_managers
+from job_queue import JobQueue
+from generation_jobs import register_generation_handlers
+from analysis_prefetcher import AnalysisPrefetcher
+from text_pipeline import PIPELINE_STAGES, TextPipeline, stage_label
+from batch_transform import BatchTransformer, is_stale_revision, pending_revisions
+from export_bundle import BundleExporter
+from export_worker import ExportWorker
 
 # Import new user management modules
 from user_manager import UserManager
 from login_interface import LoginInterface
 from script_selector import ScriptSelector
 from script_aware_manager import ScriptAwareManager
+from context_index import ScriptContextIndex
+from embedding_index import ScriptEmbeddingIndex
 
 # Initialize configuration
 Config.create_directories()
@@ -59,18 +72,65 @@ login_interface.render_logout()
 # Initialize script selector
 script_selector = ScriptSelector(user_manager)
 
+# Retrieval index for chat context, shared across reruns and kept current by entity edits
+@st.cache_resource
+def get_context_index():
+    return ScriptContextIndex()
+
+context_index = get_context_index()
+
+# Local semantic index for "similar scenes" and semantic search, persisted under the scripts folder
+@st.cache_resource
+def get_embedding_index():
+    return ScriptEmbeddingIndex()
+
+embedding_index = get_embedding_index()
+
+# Screenplay pagination, kept per script so edits only re-paginate from the changed scene on
+@st.cache_resource
+def get_paginator():
+    return Paginator()
+
+paginator = get_paginator()
+
 # Initialize script-aware manager
 script_aware_manager = ScriptAwareManager(user_manager)
+script_aware_manager.add_listener(context_index.on_script_change)
+script_aware_manager.add_listener(embedding_index.on_script_change)
 
 # Initialize managers (keeping original for compatibility with other features)
 @st.cache_resource
 def get_managers():
-    return CharacterManager(), SceneManager(), LocationManager(), TextModifier(), LLMClient(), ChatManager(), WordExporter()
+    llm_client = LLMClient()
+    return CharacterManager(), SceneManager(), LocationManager(), TextModifier(llm_client), llm_client, ChatManager(), WordExporter()
 
 character_manager, scene_manager, location_manager, text_modifier, llm_client, chat_manager, word_exporter = get_managers()
 
+# Background job queue for long-running generation; jobs persist in data/jobs.json across reruns.
+# Every handler is registered before the workers start so re-queued jobs find theirs.
+@st.cache_resource
+def get_background_services():
+    job_queue = JobQueue()
+    register_generation_handlers(job_queue, llm_client, text_modifier)
+    analysis_prefetcher = AnalysisPrefetcher(job_queue, llm_client)
+    text_pipeline = TextPipeline(text_modifier, job_queue)
+    batch_transformer = BatchTransformer(job_queue, user_manager, text_modifier)
+    export_worker = ExportWorker()
+    bundle_exporter = BundleExporter(job_queue, user_manager, word_exporter, export_worker)
+    job_queue.start()
+    return job_queue, analysis_prefetcher, text_pipeline, batch_transformer, export_worker, bundle_exporter
+
+job_queue, analysis_prefetcher, text_pipeline, batch_transformer, export_worker, bundle_exporter = get_background_services()
+
+def prefetch_analyses(username, script_id, data_type, entity_id, data):
+    """Opt-in: analyze saved scenes and characters in the background"""
+    if st.session_state.get('prefetch_analyses', Config.PREFETCH_ANALYSES):
+        analysis_prefetcher.on_script_change(username, script_id, data_type, entity_id, data)
+
+script_aware_manager.add_listener(prefetch_analyses)
+
 # Initialize scene generator with script-aware manager
-scene_generator = SceneGenerator(script_aware_manager, script_aware_manager, script_aware_manager, llm_client)
+scene_generator = SceneGenerator(script_aware_manager, script_aware_manager, script_aware_manager, llm_client, job_queue)
 
 # Sidebar navigation
 with st.sidebar:
@@ -84,6 +144,13 @@ with st.sidebar:
         menu_icon="cast",
         default_index=0,
     )
+    
+    st.checkbox(
+        "⚡ Precompute AI analyses",
+        value=Config.PREFETCH_ANALYSES,
+        key="prefetch_analyses",
+        help="Analyze scenes and characters in the background after you save them, so 'Analyze' is instant."
+    )
 
 # Custom CSS for modern styling
 st.markdown('''
@@ -180,7 +247,7 @@ if selected == "Dashboard":
     st.markdown('---')
     
     # Statistics
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
         stats = script_aware_manager.get_scene_statistics(username)
@@ -216,6 +283,15 @@ if selected == "Dashboard":
         </div>
         """, unsafe_allow_html=True)
     
+    with col5:
+        page_count = paginator.page_count(st.session_state.current_script_id, script_aware_manager.get_scene_sequence(username))
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>📄 Pages</h3>
+            <h2>{page_count} (~{page_count} min)</h2>
+        </div>
+        """, unsafe_allow_html=True)
+    
     # Recent Activity
     st.markdown('<h2 class="section-header">Recent Activity</h2>', unsafe_allow_html=True)
     
@@ -226,24 +302,83 @@ if selected == "Dashboard":
         col1, col2 = st.columns(2)
         
         with col1:
+            # Rendered by the export worker processes; this session only polls the handle
             if st.button("📥 Export All Scenes to Word", type="primary"):
-                try:
-                    characters = list(script_aware_manager.get_characters(username).values())
-                    filepath = word_exporter.export_scenes_to_word(scenes, characters, "My Screenplay", "Screenwriter")
-                    
-                    with open(filepath, 'rb') as f:
-                        st.download_button(
-                            label="📥 Download Full Script",
-                            data=f.read(),
-                            file_name=os.path.basename(filepath),
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        )
-                    st.success("Script exported successfully!")
-                except Exception as e:
-                    st.error(f"Error exporting: {str(e)}")
+                characters = list(script_aware_manager.get_characters(username).values())
+                scene_index = paginator.paginate(st.session_state.current_script_id, scenes)['scenes']
+                st.session_state.word_export_handle = export_worker.submit(
+                    scenes, characters, "My Screenplay", "Screenwriter", scene_index, label="Full Script",
+                    key=st.session_state.current_script_id
+                )
+            
+            export_handle = st.session_state.get('word_export_handle')
+            export_status = export_worker.status(export_handle) if export_handle else None
+            if export_status and export_status['status'] == 'running':
+                st.progress(export_status['done'] / max(1, export_status['total']),
+                            text=f"Exporting... {export_status['done']}/{export_status['total']} scenes")
+                if st.button("🔄 Refresh", key="refresh_word_export"):
+                    st.rerun()
+            elif export_status and export_status['status'] == 'failed':
+                st.error(f"Error exporting: {export_status['error']}")
+            elif export_handle and export_status is None:
+                # Only the most recent exports are kept in memory
+                st.warning("This export has expired. Export again to download it.")
+            elif export_status:
+                data, filename = export_worker.result(export_handle)
+                if Config.EXPORT_PERSIST and st.session_state.get('word_export_saved') != export_handle:
+                    word_exporter.persist_export(data, filename)
+                    st.session_state.word_export_saved = export_handle
+                
+                st.download_button(
+                    label="📥 Download Full Script",
+                    data=data,
+                    file_name=filename,
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )
+                st.success("Script exported successfully!")
         
         with col2:
             st.info(f"📊 {len(scenes)} scenes ready for export")
+            export_format = st.selectbox("Other formats:", ["Fountain (.fountain)", "Final Draft (.fdx)"])
+            if st.button("📥 Export Script"):
+                exporter = FountainExporter() if export_format.startswith("Fountain") else FDXExporter()
+                data, filename = exporter.render(script_aware_manager.get_scene_sequence(username), "My Screenplay", "Screenwriter")
+                st.download_button(
+                    label=f"📥 Download {export_format.split(' (')[0]}",
+                    data=data,
+                    file_name=filename,
+                    mime=exporter.mime
+                )
+        
+        # Zip bundles are rendered by worker processes in the background
+        with st.expander("📦 Bulk Export (zip)", expanded=False):
+            bundle_mode = st.radio(
+                "Bundle:", ['scripts', 'scenes'],
+                format_func=lambda mode: "All my scripts, one document each" if mode == 'scripts' else "Every scene of this script as its own document"
+            )
+            if st.button("📦 Build Bundle"):
+                bundle_exporter.submit(username, bundle_mode, st.session_state.current_script_id)
+                st.info("⏳ Bundle queued. It will appear below when ready.")
+            
+            bundle_jobs = job_queue.list_jobs(username, kinds=['export_bundle'], limit=3)
+            if bundle_jobs and st.button("🔄 Refresh", key="refresh_bundles"):
+                st.rerun()
+            for job in bundle_jobs:
+                progress = bundle_exporter.get_progress(job)
+                st.write(f"**{job['label']}** – {job['status']}")
+                if job['status'] == 'running' and progress['total']:
+                    st.progress(progress['done'] / progress['total'], text=f"{progress['done']}/{progress['total']} documents")
+                elif job['status'] == 'failed' and job['error']:
+                    st.caption(job['error'])
+                elif job['status'] == 'done' and os.path.exists(job['result']['path']):
+                    with open(job['result']['path'], 'rb') as f:
+                        st.download_button(
+                            label=f"📥 Download ({job['result']['count']} documents)",
+                            data=f.read(),
+                            file_name=job['result']['filename'],
+                            mime="application/zip",
+                            key=f"download_bundle_{job['id']}"
+                        )
     else:
         # Sample data generation
         st.subheader("🎬 Get Started")
@@ -354,7 +489,7 @@ elif selected == "Characters":
                     
                     if st.button("🔍 Analyze Character", key="analyze_selected_char"):
                         with st.spinner("Analyzing character..."):
-                            analysis = llm_client.analyze_character(selected_char)
+                            analysis = analysis_prefetcher.get_analysis('characters', selected_char)
                             st.text_area("Character Analysis", analysis, height=300)
                     
                     if st.button("🗑️ Delete Character", key="delete_selected_char"):
@@ -558,13 +693,105 @@ elif selected == "Scenes":
                 else:
                     st.error("Scene already exists or error occurred.")
     
+    # Bulk import: the file is parsed as a stream and everything is saved in one write
+    with st.expander("📤 Import Screenplay", expanded=False):
+        uploaded_script = st.file_uploader("Fountain, Final Draft or Word file", type=['fountain', 'spmd', 'txt', 'fdx', 'docx'])
+        if uploaded_script is not None:
+            try:
+                imported = import_screenplay(uploaded_script, uploaded_script.name)
+            except Exception as e:
+                imported = None
+                st.error(f"Could not read {uploaded_script.name}: {e}")
+            
+            if imported:
+                st.write(f"Found **{len(imported['scenes'])}** scenes, **{len(imported['characters'])}** characters "
+                         f"and **{len(imported['locations'])}** locations"
+                         + (f" in *{imported['title']}*" if imported['title'] else "") + ".")
+                if st.button("📥 Import into Current Script", disabled=not imported['scenes']):
+                    counts = script_aware_manager.import_entities(
+                        username, imported['scenes'], list(imported['characters'].values()), list(imported['locations'].values())
+                    )
+                    if counts:
+                        # Imports skip per-entity listeners, so index the imported entities once here
+                        imported_script = script_aware_manager.get_current_script_data(username)
+                        if imported_script:
+                            embedding_index.sync_script(imported_script)
+                        st.success(f"Imported {counts['scenes']} scenes, {counts['characters']} new characters "
+                                   f"and {counts['locations']} new locations.")
+                        st.rerun()
+                    else:
+                        st.error("Import failed.")
+    
+    # Batch transforms: apply a text tool to every scene; results arrive as revisions to review
+    with st.expander("🧰 Batch Transform All Scenes", expanded=False):
+        batch_methods = ['modify_tone', 'improve_dialogue', 'add_visual_elements', 'add_conflict', 'expand_scene', 'condense_scene']
+        col1, col2 = st.columns(2)
+        with col1:
+            batch_method = st.selectbox("Transform:", batch_methods, format_func=lambda method: PIPELINE_STAGES[method][0])
+        with col2:
+            _, param_label, param_choices = PIPELINE_STAGES[batch_method]
+            if param_label and param_choices:
+                batch_param = st.selectbox(param_label, param_choices, key="batch_param_choice")
+            elif param_label:
+                batch_param = st.text_input(param_label, key="batch_param_text")
+            else:
+                batch_param = ""
+        
+        if st.button("▶️ Run on All Scenes"):
+            current_script = script_aware_manager.get_current_script_data(username)
+            batch_transformer.submit(username, current_script['id'], script_aware_manager.get_scene_sequence(username),
+                                     {'method': batch_method, 'param': batch_param})
+            st.info("⏳ Batch transform queued. New revisions will appear on each scene for review.")
+        
+        batch_jobs = job_queue.list_jobs(username, kinds=['batch_transform'], limit=5)
+        if batch_jobs and st.button("🔄 Refresh", key="refresh_batch_jobs"):
+            st.rerun()
+        for job in batch_jobs:
+            progress = batch_transformer.get_progress(username, job)
+            st.write(f"**{job['label']}** – {job['status']} ({progress['done']}/{progress['total']} scenes)")
+            if progress['total']:
+                st.progress(progress['done'] / progress['total'])
+            if job['status'] in ('failed', 'cancelled'):
+                if job['error']:
+                    st.caption(job['error'])
+                if st.button("↻ Resume", key=f"resume_batch_{job['id']}"):
+                    batch_transformer.retry(job)
+                    st.rerun()
+    
     # Scene list and management
     st.subheader("📋 Scene List")
     
     # Search functionality
-    scene_search = st.text_input("🔍 Search scenes...")
+    scene_search = st.text_input("🔍 Search scenes...", help="Use @name to find the scenes where a character speaks")
+    semantic_search = st.checkbox("Semantic search (match by meaning, not exact words)")
+    search_all_scripts = semantic_search and st.checkbox("Include my other scripts")
     
-    if scene_search:
+    if scene_search and semantic_search:
+        current_script = script_aware_manager.get_current_script_data(username)
+        all_scenes = script_aware_manager.get_scenes(username)
+        if search_all_scripts:
+            user_scripts = {script['id']: script for script in user_manager.get_user_scripts(username)}
+            # Scripts edited since they were first indexed are kept current by the change listener
+            for script in user_scripts.values():
+                embedding_index.ensure_indexed(script)
+            matches = [(script_id, scene_id, score) for script_id, scene_id, score
+                       in embedding_index.search_user_scripts(list(user_scripts), scene_search, 'scenes', top_k=10) if score > 0]
+            other_matches = [match for match in matches if not current_script or match[0] != current_script['id']]
+            if other_matches:
+                st.write("**Matches in your other scripts:**")
+                for script_id, scene_id, score in other_matches:
+                    other = user_scripts[script_id].get('scenes', {}).get(scene_id, {})
+                    st.write(f"{user_scripts[script_id].get('name', 'Untitled')} - Scene {other.get('scene_number', 'N/A')}: "
+                             f"{other.get('title', 'No title')} ({score:.2f})")
+            matches = [(scene_id, score) for script_id, scene_id, score in matches
+                       if current_script and script_id == current_script['id']]
+        elif current_script:
+            embedding_index.sync_script(current_script)
+            matches = embedding_index.semantic_search(current_script['id'], scene_search, 'scenes', top_k=10)
+        else:
+            matches = []
+        scenes = {scene_id: all_scenes[scene_id] for scene_id, score in matches if scene_id in all_scenes and score > 0}
+    elif scene_search:
         scenes = script_aware_manager.search_scenes(username, scene_search)
     else:
         scenes = script_aware_manager.get_scenes(username)
@@ -596,6 +823,23 @@ elif selected == "Scenes":
                     st.write(f"**Characters:** {', '.join(selected_scene.get('characters', [])) if isinstance(selected_scene.get('characters', []), list) else selected_scene.get('characters', 'None')}")
                     st.write(f"**Goal:** {selected_scene.get('goal', 'No goal')}")
                     st.write(f"**Script Content:** {selected_scene.get('action', 'No content')}")
+                    
+                    for revision in pending_revisions(selected_scene):
+                        with st.expander(f"📝 Revision: {revision['label']} ({revision['created_at'][:16]})", expanded=True):
+                            st.text_area("Revised content", revision['action'], height=200, disabled=True,
+                                         key=f"revision_{revision['id']}")
+                            stale = is_stale_revision(selected_scene, revision)
+                            if stale:
+                                st.warning("The scene was edited after this revision was made; accepting it would discard those edits.")
+                            col_accept, col_reject = st.columns(2)
+                            with col_accept:
+                                if st.button("✅ Accept", key=f"accept_revision_{revision['id']}", disabled=stale):
+                                    script_aware_manager.review_scene_revision(username, selected_scene_id, revision['id'], True)
+                                    st.rerun()
+                            with col_reject:
+                                if st.button("❌ Reject", key=f"reject_revision_{revision['id']}"):
+                                    script_aware_manager.review_scene_revision(username, selected_scene_id, revision['id'], False)
+                                    st.rerun()
                 
                 with col2:
                     if st.button("✏️ Edit Scene", key="edit_selected_scene"):
@@ -603,20 +847,35 @@ elif selected == "Scenes":
                     
                     if st.button("🔍 Analyze Scene", key="analyze_selected_scene"):
                         with st.spinner("Analyzing scene..."):
-                            analysis = llm_client.analyze_scene(selected_scene)
+                            analysis = analysis_prefetcher.get_analysis('scenes', selected_scene)
                             st.text_area("Scene Analysis", analysis, height=300)
                     
+                    if st.button("🔗 Find Similar Scenes", key="similar_selected_scene"):
+                        current_script = script_aware_manager.get_current_script_data(username)
+                        similar = []
+                        if current_script:
+                            embedding_index.sync_script(current_script)
+                            similar = embedding_index.similar_scenes(current_script['id'], selected_scene_id, top_k=5)
+                        all_scenes = script_aware_manager.get_scenes(username)
+                        if similar:
+                            for scene_id, score in similar:
+                                other = all_scenes.get(scene_id, {})
+                                st.write(f"Scene {other.get('scene_number', 'N/A')}: {other.get('title', 'No title')} ({score:.2f})")
+                        else:
+                            st.info("No other scenes to compare with yet.")
+                    
                     if st.button("📥 Export Scene", key="export_selected_scene"):
                         try:
-                            filepath = word_exporter.export_single_scene(selected_scene)
-                            with open(filepath, 'rb') as f:
-                                st.download_button(
-                                    label="📥 Download",
-                                    data=f.read(),
-                                    file_name=os.path.basename(filepath),
-                                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                                    key=f"download_selected_scene"
-                                )
+                            data, filename = word_exporter.render_single_scene(selected_scene)
+                            if Config.EXPORT_PERSIST:
+                                word_exporter.persist_export(data, filename)
+                            st.download_button(
+                                label="📥 Download",
+                                data=data,
+                                file_name=filename,
+                                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                                key=f"download_selected_scene"
+                            )
                             st.success("Scene exported!")
                         except Exception as e:
                             st.error(f"Error exporting: {str(e)}")
@@ -690,14 +949,22 @@ elif selected == "Script Analysis":
     
     scenes = script_aware_manager.get_scene_sequence(username)
     if scenes:
+        pagination = paginator.paginate(st.session_state.current_script_id, scenes)
+        st.metric("Estimated Length", f"{pagination['pages']} pages", help="One screenplay page is about one minute of screen time")
         scene_data = []
-        for scene in scenes:
+        for scene, paging in zip(scenes, pagination['scenes']):
             characters_count = len(scene.get('characters', [])) if isinstance(scene.get('characters', []), list) else 0
+            stats = scene_stats(scene.get('action', '') or '')
+            words = stats['dialogue_words'] + stats['action_words']
             scene_data.append({
                 'Scene': scene.get('scene_number', 0),
                 'Title': scene.get('title', 'No title'),
                 'Location': scene.get('location', 'Unknown'),
                 'Characters': characters_count,
+                'Speaking': len(stats['speakers']),
+                'Dialogue %': round(100 * stats['dialogue_words'] / words) if words else 0,
+                'Page': paging['page'],
+                'Length (pages)': paging['length'],
                 'Content Length': len(scene.get('action', '')),
                 'Time': scene.get('time_of_day', 'Unknown')
             })
@@ -720,13 +987,13 @@ elif selected == "Script Analysis":
             # Analyze characters
             character_insights = []
             for char in list(characters.values())[:3]:  # Limit to first 3 characters
-                insight = llm_client.analyze_character(char)
+                insight = analysis_prefetcher.get_analysis('characters', char)
                 character_insights.append(f"**{char.get('name', 'Unknown')}:** {insight[:200]}...")
             
             # Analyze scenes
             scene_insights = []
             for scene in scenes[:3]:  # Limit to first 3 scenes
-                insight = llm_client.analyze_scene(scene)
+                insight = analysis_prefetcher.get_analysis('scenes', scene)
                 scene_insights.append(f"**Scene {scene.get('scene_number', 'N/A')}:** {insight[:200]}...")
             
             # Display insights
@@ -739,6 +1006,16 @@ elif selected == "Script Analysis":
             for insight in scene_insights:
                 st.markdown(insight)
                 st.divider()
+    
+    with st.expander("⚙️ AI Request Metrics", expanded=False):
+        metrics = llm_client.get_metrics()
+        st.write(f"**Requests sent:** {metrics['single_flight']['executed']}")
+        st.write(f"**Duplicate requests coalesced:** {metrics['single_flight']['coalesced']}")
+        st.write(f"**Cached prompt prefix reuses:** {metrics['prefix_cache']['handle_hits']}")
+        for operation, models in metrics['router'].items():
+            for model, stats in models.items():
+                st.write(f"**{operation} → {model}:** {stats['calls']} calls, {stats['errors']} errors, "
+                         f"avg {stats['ewma_seconds'] or 0:.2f}s")
 
 # Chat
 elif selected == "Chat":
@@ -750,6 +1027,11 @@ elif selected == "Chat":
     # Display chat history
     chat_history = chat_manager.get_chat_history(username, script_id)
     
+    chat_summary = chat_manager.get_chat_summary(username, script_id)
+    if chat_summary:
+        with st.expander("🧠 Earlier in this conversation", expanded=False):
+            st.write(chat_summary)
+    
     if chat_history:
         st.subheader("📝 Chat History")
         st.markdown('''
@@ -769,6 +1051,22 @@ elif selected == "Chat":
                 </div>
                 """, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
+        
+        if script_id:
+            with st.expander("🔎 Search this conversation", expanded=False):
+                chat_query = st.text_input("Find earlier messages by meaning", key="chat_semantic_search")
+                if chat_query:
+                    chat_key = chat_manager.get_user_chat_key(username, script_id)
+                    found = [(int(index), score) for index, score
+                             in embedding_index.semantic_search(script_id, chat_query, f"chat:{chat_key}", top_k=5) if score > 0]
+                    found = [(index, score) for index, score in found if index < len(chat_history)]
+                    if found:
+                        for index, score in found:
+                            message = chat_history[index]
+                            speaker = 'You' if message['role'] == 'user' else 'Yana'
+                            st.write(f"**{speaker}:** {message['content']} ({score:.2f})")
+                    else:
+                        st.info("No matching messages in this conversation.")
     
     # Chat input
     with st.form("chat_form"):
@@ -788,6 +1086,8 @@ elif selected == "Chat":
         with col2:
             if st.form_submit_button("Clear Chat History"):
                 chat_manager.clear_chat_history(username, script_id)
+                if script_id:
+                    embedding_index.sync_chat(script_id, chat_manager.get_user_chat_key(username, script_id), [])
                 st.rerun()
         with col3:
             if st.form_submit_button("📝 Text Tools"):
@@ -806,6 +1106,16 @@ elif selected == "Chat":
             st.text(context_summary)
         else:
             st.info("No characters or scenes created yet. Start by adding some content!")
+        
+        # What the last chat turn actually sent to the model
+        context_report = st.session_state.get('chat_context_report')
+        if context_report:
+            st.caption(f"Last message context: {context_report['used_tokens']} / {context_report['token_budget']} tokens")
+            for section, section_report in context_report['sections'].items():
+                st.caption(
+                    f"{section.title()}: {len(section_report['included'])} included, "
+                    f"{len(section_report['summarized'])} summarized, {len(section_report['dropped'])} dropped"
+                )
     
     # Chat suggestions
     with st.expander("💡 Chat Suggestions", expanded=False):
@@ -851,19 +1161,36 @@ elif selected == "Chat":
         
         # Get AI response with context
         with st.spinner("Yana is thinking..."):
-            context = chat_manager.get_full_context_for_ai(
+            current_script = script_aware_manager.get_current_script_data(username) or {}
+            context, context_report = chat_manager.build_context_for_ai(
                 character_manager=script_aware_manager,
                 scene_manager=script_aware_manager,
                 location_manager=script_aware_manager,
                 user_message=user_input,
                 username=username,
-                script_id=script_id
+                script_id=script_id,
+                context_index=context_index,
+                script_version=current_script.get('last_modified')
             )
+            st.session_state.chat_context_report = context_report
             
-            ai_response = llm_client.chat_with_context(user_input, context)
+            # The script overview only changes when the script does, so it is rendered once per
+            # script version and sent as a cacheable prompt prefix
+            script_context = llm_client.prefix_cache.get_prefix(
+                f"{script_id}:{current_script.get('last_modified', '')}",
+                lambda: chat_manager.get_script_overview(script_aware_manager, script_aware_manager, script_aware_manager, username)
+            )
+            
+            ai_response = llm_client.chat_with_context(user_input, context, script_context=script_context)
             
             # Add AI response to chat history
             chat_manager.add_message(username, 'assistant', ai_response, script_id)
+            # Fold older turns into the running summary once the history gets long
+            chat_manager.compact_history(username, llm_client, script_id)
+            if script_id:
+                # Only new or shifted messages are embedded; the rest keep their vectors
+                embedding_index.sync_chat(script_id, chat_manager.get_user_chat_key(username, script_id),
+                                          chat_manager.get_chat_history(username, script_id))
             
             # Show AI response
             st.markdown(f"""
@@ -885,6 +1212,11 @@ if st.session_state.get('show_text_tools', False):
         st.session_state.show_text_tools = False
         st.rerun()
     
+    def submit_text_tool(label, method, *args):
+        """Run a text tool in the background; results show up under Results below"""
+        job_queue.submit('text_tool', {'method': method, 'args': list(args)}, username, label=label)
+        st.info(f"⏳ '{label}' is running in the background.")
+    
     # Text input
     text_input = st.text_area("Enter your text here:", height=200, placeholder="Paste your scene, dialogue, or any text you want to modify...")
     
@@ -913,22 +1245,25 @@ if st.session_state.get('show_text_tools', False):
             selected_tone = st.selectbox("Select tone to change to:", tone_options)
             
             if st.button("🎭 Change Tone"):
-                with st.spinner("Modifying tone..."):
-                    modified_text = text_modifier.modify_tone(text_input, selected_tone)
-                    st.text_area("Modified Text:", modified_text, height=200)
+                submit_text_tool(f"Change Tone ({selected_tone})", 'modify_tone', text_input, selected_tone)
+            
+            # Variants: several tones, or several takes on one tone, in one round-trip
+            compare_tones = st.multiselect("Compare tones side by side:", tone_options, default=tone_options[:3])
+            if st.button("🎭 Compare Tones") and compare_tones:
+                submit_text_tool(f"Compare Tones ({', '.join(compare_tones)})", 'modify_tone_variants', text_input, compare_tones)
+            
+            sample_count = st.slider("Alternatives:", min_value=2, max_value=4, value=3)
+            if st.button(f"🎲 {sample_count} Alternatives in Selected Tone"):
+                submit_text_tool(f"Alternatives ({selected_tone})", 'sample_tone_variants', text_input, selected_tone, sample_count)
             
             # Visual elements
             if st.button("🎬 Add Visual Elements"):
-                with st.spinner("Adding visual elements..."):
-                    enhanced_text = text_modifier.add_visual_elements(text_input)
-                    st.text_area("Enhanced Text:", enhanced_text, height=200)
+                submit_text_tool("Add Visual Elements", 'add_visual_elements', text_input)
             
             # Dialogue improvement
             character_name = st.text_input("Character name (optional):", key="dialogue_char")
             if st.button("💬 Improve Dialogue"):
-                with st.spinner("Improving dialogue..."):
-                    improved_dialogue = text_modifier.improve_dialogue(text_input, character_name)
-                    st.text_area("Improved Dialogue:", improved_dialogue, height=200)
+                submit_text_tool("Improve Dialogue", 'improve_dialogue', text_input, character_name)
         
         with col2:
             st.subheader("Structure & Content")
@@ -938,24 +1273,18 @@ if st.session_state.get('show_text_tools', False):
             expansion_type = st.selectbox("What to expand:", expansion_types)
             
             if st.button("📈 Expand Scene"):
-                with st.spinner("Expanding scene..."):
-                    expanded_text = text_modifier.expand_scene(text_input, expansion_type)
-                    st.text_area("Expanded Text:", expanded_text, height=200)
+                submit_text_tool(f"Expand Scene ({expansion_type})", 'expand_scene', text_input, expansion_type)
             
             # Scene condensation
             if st.button("📉 Condense Scene"):
-                with st.spinner("Condensing scene..."):
-                    condensed_text = text_modifier.condense_scene(text_input)
-                    st.text_area("Condensed Text:", condensed_text, height=200)
+                submit_text_tool("Condense Scene", 'condense_scene', text_input)
             
             # Perspective change
             perspectives = ["first person", "third person limited", "third person omniscient", "second person"]
             new_perspective = st.selectbox("Select perspective:", perspectives)
             
             if st.button("🔄 Change Perspective"):
-                with st.spinner("Changing perspective..."):
-                    new_text = text_modifier.change_perspective(text_input, new_perspective)
-                    st.text_area("New Perspective:", new_text, height=200)
+                submit_text_tool(f"Change Perspective ({new_perspective})", 'change_perspective', text_input, new_perspective)
         
         # Advanced tools
         st.subheader("🔧 Advanced Tools")
@@ -968,17 +1297,92 @@ if st.session_state.get('show_text_tools', False):
             conflict_type = st.selectbox("Conflict type:", conflict_types)
             
             if st.button("⚔️ Add Conflict"):
-                with st.spinner("Adding conflict..."):
-                    conflict_text = text_modifier.add_conflict(text_input, conflict_type)
-                    st.text_area("Text with Conflict:", conflict_text, height=200)
+                submit_text_tool(f"Add Conflict ({conflict_type})", 'add_conflict', text_input, conflict_type)
         
         with col2:
             # Character development
             character_name_dev = st.text_input("Character to develop:", key="dev_char")
             if st.button("🎭 Enhance Character Development"):
-                with st.spinner("Enhancing character development..."):
-                    enhanced_text = text_modifier.enhance_character_development(text_input, character_name_dev)
-                    st.text_area("Enhanced Text:", enhanced_text, height=200)
+                submit_text_tool("Enhance Character Development", 'enhance_character_development', text_input, character_name_dev)
+        
+        # Pipelines: chain tools; each stage is cached, so changing a later stage reuses earlier outputs
+        st.subheader("🔗 Pipeline")
+        if 'pipeline_stages' not in st.session_state:
+            st.session_state.pipeline_stages = []
+        
+        presets = text_pipeline.list_presets(username)
+        if presets:
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                preset_name = st.selectbox("Saved pipelines:", list(presets.keys()))
+            with col2:
+                if st.button("📂 Load"):
+                    st.session_state.pipeline_stages = list(presets[preset_name])
+                    st.rerun()
+            with col3:
+                if st.button("🗑️ Delete Preset"):
+                    text_pipeline.delete_preset(username, preset_name)
+                    st.rerun()
+        
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            stage_method = st.selectbox("Stage:", list(PIPELINE_STAGES.keys()),
+                                        format_func=lambda method: PIPELINE_STAGES[method][0])
+        with col2:
+            _, param_label, param_choices = PIPELINE_STAGES[stage_method]
+            if param_label and param_choices:
+                stage_param = st.selectbox(param_label, param_choices, key="pipeline_param_choice")
+            elif param_label:
+                stage_param = st.text_input(param_label, key="pipeline_param_text")
+            else:
+                stage_param = ""
+        with col3:
+            if st.button("➕ Add Stage"):
+                st.session_state.pipeline_stages.append({'method': stage_method, 'param': stage_param})
+                st.rerun()
+        
+        for i, stage in enumerate(st.session_state.pipeline_stages):
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.write(f"{i + 1}. {stage_label(stage)}")
+            with col2:
+                if st.button("✖", key=f"remove_stage_{i}"):
+                    st.session_state.pipeline_stages.pop(i)
+                    st.rerun()
+        
+        if st.session_state.pipeline_stages:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("▶️ Run Pipeline"):
+                    stages = st.session_state.pipeline_stages
+                    label = "Pipeline: " + " → ".join(stage_label(stage) for stage in stages)
+                    job_queue.submit('text_pipeline', {'text': text_input, 'stages': stages}, username, label=label)
+                    st.info(f"⏳ '{label}' is running in the background.")
+            with col2:
+                new_preset_name = st.text_input("Preset name:", key="pipeline_preset_name")
+            with col3:
+                if st.button("💾 Save Preset") and new_preset_name:
+                    text_pipeline.save_preset(username, new_preset_name, st.session_state.pipeline_stages)
+                    st.success(f"Saved pipeline '{new_preset_name}'")
+
+    # Results of background text tool jobs (kept across reruns and page changes)
+    text_tool_jobs = job_queue.list_jobs(username, kinds=['text_tool', 'text_pipeline'], limit=5)
+    if text_tool_jobs:
+        st.subheader("📬 Results")
+        if st.button("🔄 Refresh Results"):
+            st.rerun()
+        for job in text_tool_jobs:
+            if job['status'] == 'done' and isinstance(job['result'], list):
+                st.write(f"**{job['label']}:**")
+                for i, (col, variant) in enumerate(zip(st.columns(len(job['result'])), job['result'])):
+                    with col:
+                        st.text_area(variant['label'], variant['text'], height=250, key=f"text_tool_result_{job['id']}_{i}")
+            elif job['status'] == 'done':
+                st.text_area(f"{job['label']}:", job['result'], height=200, key=f"text_tool_result_{job['id']}")
+            elif job['status'] == 'failed':
+                st.error(f"{job['label']}: {job['error']}")
+            else:
+                st.info(f"⏳ {job['label']}: {job['status']}")
 
 # Footer
 st.markdown("---")
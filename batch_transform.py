@@ -0,0 +1,126 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import Config
+from job_queue import JobQueue, PRIORITY_LOW
+from text_pipeline import apply_stage, stage_label
+
+def scene_order(scene: Dict):
+    """Sort key putting scenes in script order"""
+    try:
+        return (0, int(scene.get('scene_number', 0)), str(scene.get('id', '')))
+    except (TypeError, ValueError):
+        return (1, 0, str(scene.get('id', '')))
+
+def pending_revisions(scene: Dict) -> List[Dict]:
+    """Revisions of a scene that still wait for review"""
+    return [revision for revision in scene.get('revisions', []) if revision.get('status') == 'pending']
+
+def is_stale_revision(scene: Dict, revision: Dict) -> bool:
+    """Whether the scene was edited after the revision was generated from it"""
+    return 'source_action' in revision and revision['source_action'] != scene.get('action', '')
+
+class BatchTransformer:
+    """Apply a text tool to every scene of a script as a background job
+
+    Scenes are transformed by a bounded thread pool. Each result is written straight away
+    as a pending revision on its scene (scene['revisions']), which doubles as the checkpoint:
+    when a job is resumed after a crash or restart, scenes that already have a revision from
+    the same batch are skipped. Nothing replaces the scene text until a revision is accepted.
+    """
+
+    def __init__(self, job_queue: JobQueue, user_manager, text_modifier, workers: int = None):
+        self.job_queue = job_queue
+        self.user_manager = user_manager
+        self.text_modifier = text_modifier
+        self.workers = workers or Config.BATCH_WORKERS
+        self.job_queue.register_handler('batch_transform', self.run_batch_job)
+
+    def submit(self, username: str, script_id: str, scenes: List[Dict], stage: Dict) -> str:
+        """Queue a transform of the given scenes (e.g. ScriptAwareManager.get_scene_sequence) and return the job id"""
+        scene_ids = [scene['id'] for scene in sorted(scenes, key=scene_order)
+                     if scene.get('id') and scene.get('action', '').strip()]
+        batch_id = uuid.uuid4().hex[:12]
+        return self.job_queue.submit(
+            'batch_transform',
+            {'batch_id': batch_id, 'username': username, 'script_id': script_id, 'scene_ids': scene_ids, 'stage': stage},
+            username,
+            label=f"Batch: {stage_label(stage)} ({len(scene_ids)} scenes)",
+            priority=PRIORITY_LOW,
+            metadata={'batch_id': batch_id, 'script_id': script_id}
+        )
+
+    def get_scene(self, username: str, script_id: str, scene_id: str) -> Optional[Dict]:
+        script = self.user_manager.get_script(username, script_id)
+        if not script:
+            return None
+        return script.get('scenes', {}).get(scene_id)
+
+    def is_done(self, scene: Dict, batch_id: str) -> bool:
+        return any(revision.get('batch_id') == batch_id for revision in scene.get('revisions', []))
+
+    def get_progress(self, username: str, job: Dict) -> Dict:
+        """Completed and total scene counts of a batch job"""
+        payload = job['payload']
+        done = 0
+        for scene_id in payload['scene_ids']:
+            scene = self.get_scene(username, payload['script_id'], scene_id)
+            if scene and self.is_done(scene, payload['batch_id']):
+                done += 1
+        return {'done': done, 'total': len(payload['scene_ids'])}
+
+    def write_revision(self, username: str, script_id: str, scene_id: str, revision: Dict) -> bool:
+        """Checkpoint: store a transformed scene as a pending revision"""
+        # The same lock guards every other change to the scripts, so a concurrent edit is not overwritten
+        with self.user_manager.lock:
+            script = self.user_manager.get_script(username, script_id)
+            if not script or scene_id not in script.get('scenes', {}):
+                return False
+            script['scenes'][scene_id].setdefault('revisions', []).append(revision)
+            return self.user_manager.update_script(username, script_id, script)
+
+    def transform_scene(self, username: str, payload: Dict, scene_id: str) -> bool:
+        """Transform one scene unless this batch already did; returns False if the scene is gone"""
+        scene = self.get_scene(username, payload['script_id'], scene_id)
+        if scene is None:
+            return False
+        if self.is_done(scene, payload['batch_id']):
+            return True
+
+        source_text = scene.get('action', '')
+        text = apply_stage(self.text_modifier, source_text, payload['stage'])
+        revision = {
+            'id': uuid.uuid4().hex[:12],
+            'batch_id': payload['batch_id'],
+            'label': stage_label(payload['stage']),
+            'action': text,
+            'source_action': source_text,
+            'status': 'pending',
+            'created_at': datetime.now().isoformat()
+        }
+        return self.write_revision(username, payload['script_id'], scene_id, revision)
+
+    def run_batch_job(self, payload: Dict) -> str:
+        username = payload['username']
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {scene_id: executor.submit(self.transform_scene, username, payload, scene_id)
+                       for scene_id in payload['scene_ids']}
+            for scene_id, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failures.append(f"scene {scene_id}: {e}")
+
+        if failures:
+            # Completed scenes stay checkpointed; re-running the batch only retries these
+            raise RuntimeError(f"{len(failures)} of {len(payload['scene_ids'])} scenes failed: " + "; ".join(failures[:3]))
+        return f"{len(payload['scene_ids'])} scenes transformed; review the new revisions on the Scenes page."
+
+    def retry(self, job: Dict) -> str:
+        """Re-run a failed or cancelled batch; scenes it already transformed are skipped"""
+        return self.job_queue.submit(
+            'batch_transform', job['payload'], job['username'], label=job['label'],
+            priority=PRIORITY_LOW, metadata=job['metadata']
+        )
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+YanaChat - Export throughput benchmark across script sizes and formats
+
+Generates synthetic scripts (deterministic for a seed) and measures wall time, peak Python
+memory (tracemalloc) and output size of every exporter: Word (.docx) with a cold and a warm
+fragment cache, Fountain and Final Draft (.fdx). Results are printed as JSON so runs can be
+compared to spot export performance regressions. With --verify, every size is also exported
+to Word (with a scene index) and imported back, and the imported scene and character counts are
+checked against the originals.
+
+Usage:
+    python benchmarks/export_benchmark.py
+    python benchmarks/export_benchmark.py --sizes 10 100 1000 5000 --repeat 3 --output export_results.json
+    python benchmarks/export_benchmark.py --formats docx_cold fountain --sizes 5000
+    python benchmarks/export_benchmark.py --sizes 10 100 --verify
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pagination import Paginator
+from screenplay_exporters import FDXExporter, FountainExporter
+from screenplay_importer import import_screenplay
+from word_exporter import WordExporter
+
+DEFAULT_SIZES = [10, 100, 500, 1000, 5000]
+LOCATIONS = ["INT. NEWSROOM", "EXT. CITY STREET", "INT. POLICE STATION", "EXT. ROOFTOP", "INT. APARTMENT"]
+TIMES = ["Morning", "Afternoon", "Evening", "Night"]
+NAMES = ["SARAH", "MARCUS", "ELENA", "DETECTIVE RODRIGUEZ", "SENATOR WHITMORE"]
+WORDS = ("the rain hits the window as she turns away from the desk and stares at the city lights "
+         "below while the phone keeps ringing somewhere in the dark office").split()
+
+def sentence(rng: random.Random, low: int, high: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+    return text[0].upper() + text[1:] + "."
+
+def synthetic_scene(rng: random.Random, number: int) -> dict:
+    """A scene with a few action paragraphs and dialogue exchanges, like app-entered scenes"""
+    blocks = []
+    for _ in range(rng.randint(2, 6)):
+        if rng.random() < 0.4:
+            blocks.append(" ".join(sentence(rng, 6, 18) for _ in range(rng.randint(1, 3))))
+        else:
+            speech = [rng.choice(NAMES)]
+            if rng.random() < 0.2:
+                speech.append("(quietly)")
+            speech.append(sentence(rng, 4, 20))
+            blocks.append("\n".join(speech))
+    return {
+        'id': str(number),
+        'scene_number': number,
+        'title': f"Scene {number}",
+        'location': rng.choice(LOCATIONS),
+        'time_of_day': rng.choice(TIMES),
+        'action': "\n\n".join(blocks),
+        'notes': sentence(rng, 4, 10) if rng.random() < 0.1 else ""
+    }
+
+def synthetic_script(scene_count: int, seed: int):
+    rng = random.Random(seed)
+    scenes = [synthetic_scene(rng, number) for number in range(1, scene_count + 1)]
+    characters = [{'name': name.title(), 'age': 30, 'description': sentence(rng, 8, 16),
+                   'personality': sentence(rng, 6, 12)} for name in NAMES]
+    return scenes, characters
+
+def build_exporters():
+    """Map format names to functions exporting (scenes, characters) and returning the file contents"""
+    fountain, fdx = FountainExporter(), FDXExporter()
+    warm_exporter = WordExporter()
+
+    def docx_cold(scenes, characters):
+        # A new exporter per run: template built, fragment cache empty
+        return WordExporter().render_scenes(scenes, characters, "Benchmark", "Benchmark")[0]
+
+    def docx_warm(scenes, characters):
+        # Shared exporter: after the first run every scene comes from the fragment cache
+        return warm_exporter.render_scenes(scenes, characters, "Benchmark", "Benchmark")[0]
+
+    return {
+        'docx_cold': docx_cold,
+        'docx_warm': docx_warm,
+        'fountain': lambda scenes, characters: fountain.render(scenes, "Benchmark", "Benchmark")[0],
+        'fdx': lambda scenes, characters: fdx.render(scenes, "Benchmark", "Benchmark")[0]
+    }
+
+def timed(export, scenes, characters):
+    """Run one export and return (seconds, file contents)"""
+    gc.collect()
+    start = time.perf_counter()
+    data = export(scenes, characters)
+    return time.perf_counter() - start, data
+
+def peak_memory(export, scenes, characters) -> int:
+    """Peak traced Python memory of one export; measured in a separate run since tracing slows it down"""
+    gc.collect()
+    tracemalloc.start()
+    export(scenes, characters)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def max_rss_mb():
+    """Peak resident memory of the whole benchmark process, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1_000_000 if sys.platform == 'darwin' else 1000), 1)
+
+def verify_roundtrip(scenes, characters) -> dict:
+    """Export to Word with a scene index, import the file again and compare what came back"""
+    scene_index = Paginator().paginate("benchmark", scenes)['scenes']
+    data, filename = WordExporter().render_scenes(scenes, characters, "Benchmark", "Benchmark", scene_index)
+    imported = import_screenplay(io.BytesIO(data), filename)
+    return {
+        'scenes': len(imported['scenes']),
+        'characters': len(imported['characters']),
+        'ok': (len(imported['scenes']) == len(scenes)
+               and [scene['action'] != '' for scene in imported['scenes']] == [scene['action'] != '' for scene in scenes]
+               and {name.lower() for name in imported['characters']} >= {char['name'].lower() for char in characters})
+    }
+
+def run_benchmark(sizes, formats, repeat: int, seed: int, verify: bool = False) -> dict:
+    exporters = build_exporters()
+    results = []
+    roundtrips = []
+    for size in sizes:
+        scenes, characters = synthetic_script(size, seed)
+        if verify:
+            roundtrips.append(dict(verify_roundtrip(scenes, characters), size=size))
+            print(f"{'roundtrip':>10} {size:>6} scenes: {'ok' if roundtrips[-1]['ok'] else 'MISMATCH'}", file=sys.stderr)
+        for name in formats:
+            export = exporters[name]
+            if name == 'docx_warm':
+                export(scenes, characters)  # fill the fragment cache
+            samples = [timed(export, scenes, characters) for _ in range(repeat)]
+            times = [seconds for seconds, _ in samples]
+            peak = peak_memory(export, scenes, characters)
+            results.append({
+                'format': name,
+                'scenes': size,
+                'runs': repeat,
+                'mean_s': round(statistics.mean(times), 4),
+                'min_s': round(min(times), 4),
+                'max_s': round(max(times), 4),
+                'scenes_per_s': round(size / statistics.mean(times), 1) if statistics.mean(times) > 0 else None,
+                'peak_memory_mb': round(peak / 1_000_000, 2),
+                'output_kb': round(len(samples[-1][1]) / 1000, 1)
+            })
+            print(f"{name:>10} {size:>6} scenes: {results[-1]['mean_s']:.3f}s", file=sys.stderr)
+    report = {
+        'seed': seed,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'note': ("peak_memory_mb is Python heap traced by tracemalloc in an extra, untimed run; "
+                 "lxml's own allocations only show in the process-wide max_rss_mb"),
+        'max_rss_mb': max_rss_mb(),
+        'results': results
+    }
+    if verify:
+        report['roundtrip'] = roundtrips
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark export wall time, memory and output size by script size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Scene counts of the synthetic scripts")
+    parser.add_argument("--formats", nargs="+", default=["docx_cold", "docx_warm", "fountain", "fdx"],
+                        choices=["docx_cold", "docx_warm", "fountain", "fdx"])
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size and format")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verify", action="store_true", help="Also check that Word exports import back with the same scenes")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.formats, args.repeat, args.seed, args.verify)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+YanaChat - End-to-end benchmark of LLM-dependent paths against the offline simulator
+
+Runs the TextModifier tools, the Scene Generator prompts, character/scene analysis and
+chat (context building + response) through LLMClient with a SimulatorBackend, and prints
+per-operation latency statistics as JSON. No network access or API key is needed.
+
+Usage:
+    python benchmarks/llm_benchmark.py --iterations 20 --concurrency 4
+    python benchmarks/llm_benchmark.py --no-sleep --error-rate 0.05 --output results.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_manager import ChatManager
+from llm_backends import SimulatorBackend
+from llm_client import LLMClient
+from sample_data import get_sample_characters, get_sample_locations, get_sample_scenes
+from scene_generator import SceneGenerator
+from text_modifier import TextModifier
+
+class SampleScript:
+    """Read-only stand-in for ScriptAwareManager backed by the bundled sample data"""
+
+    def __init__(self):
+        self.characters = {str(i + 1): char for i, char in enumerate(get_sample_characters())}
+        self.scenes = get_sample_scenes()
+        self.locations = {str(i + 1): loc for i, loc in enumerate(get_sample_locations())}
+
+    def get_characters(self, username: str):
+        return self.characters
+
+    def get_scene_sequence(self, username: str):
+        return self.scenes
+
+    def get_locations(self, username: str):
+        return self.locations
+
+def build_operations(llm_client: LLMClient, script: SampleScript):
+    """Map operation names to zero-argument callables exercising each LLM-dependent path"""
+    text_modifier = TextModifier(llm_client)
+    chat_manager = ChatManager.__new__(ChatManager)  # in-memory only, no chat_history.json
+    chat_manager.chat_history = {}
+    scene = script.scenes[0]
+    scene_text = scene['action']
+    character = script.characters['1']
+
+    def chat():
+        context, _ = chat_manager.build_context_for_ai(script, script, script, "How can I raise the stakes for Sarah?", "benchmark")
+        overview = chat_manager.get_script_overview(script, script, script, "benchmark")
+        return llm_client.chat_with_context("How can I raise the stakes for Sarah?", context, script_context=overview)
+
+    return {
+        'text.modify_tone': lambda: text_modifier.modify_tone(scene_text, "suspenseful"),
+        'text.expand_scene': lambda: text_modifier.expand_scene(scene_text, "dialogue"),
+        'text.condense_scene': lambda: text_modifier.condense_scene(scene_text),
+        'text.improve_dialogue': lambda: text_modifier.improve_dialogue(scene_text, "Sarah"),
+        'text.add_visual_elements': lambda: text_modifier.add_visual_elements(scene_text),
+        'text.add_conflict': lambda: text_modifier.add_conflict(scene_text, "interpersonal"),
+        'scene.auto_generate': lambda: llm_client.generate_response(SceneGenerator.build_auto_generate_prompt(scene)),
+        'scene.process': lambda: llm_client.generate_response(SceneGenerator.build_process_prompt(scene_text), operation='rewrite'),
+        'scene.custom_request': lambda: llm_client.generate_response(SceneGenerator.build_custom_request_prompt("Add more tension", scene_text), operation='rewrite'),
+        'analyze.scene': lambda: llm_client.analyze_scene(scene),
+        'analyze.character': lambda: llm_client.analyze_character(character),
+        'chat': chat
+    }
+
+def timed(operation):
+    """Run an operation and return (seconds, failed)"""
+    start = time.perf_counter()
+    result = operation()
+    elapsed = time.perf_counter() - start
+    # LLMClient reports failures as "Error ..." strings rather than raising
+    return elapsed, isinstance(result, str) and result.startswith("Error")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_benchmark(iterations: int, concurrency: int, backend: SimulatorBackend) -> dict:
+    """Run every operation `iterations` times with `concurrency` worker threads"""
+    llm_client = LLMClient(backend=backend)
+    operations = build_operations(llm_client, SampleScript())
+    results = {}
+
+    for name, operation in operations.items():
+        start = time.perf_counter()
+        # Vary nothing between iterations: identical prompts are part of the realistic workload
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(lambda _: timed(operation), range(iterations)))
+        wall = time.perf_counter() - start
+        latencies = [elapsed for elapsed, _ in samples]
+        results[name] = {
+            'calls': iterations,
+            'errors': sum(1 for _, failed in samples if failed),
+            'mean_s': round(statistics.mean(latencies), 4),
+            'p50_s': round(percentile(latencies, 0.5), 4),
+            'p95_s': round(percentile(latencies, 0.95), 4),
+            'max_s': round(max(latencies), 4),
+            'throughput_per_s': round(iterations / wall, 2) if wall > 0 else None
+        }
+
+    return {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'simulator': {
+            'latency_distribution': backend.latency_distribution,
+            'latency_mean': backend.latency_mean,
+            'latency_stddev': backend.latency_stddev,
+            'tokens_per_second': backend.tokens_per_second,
+            'error_rate': backend.error_rate,
+            'seed': backend.seed,
+            'sleep': backend.sleep
+        },
+        'backend_stats': dict(backend.stats),
+        'client_metrics': llm_client.get_metrics(),
+        'operations': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM-dependent paths against the offline simulator")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency-distribution", default=None, choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--latency-mean", type=float, default=None)
+    parser.add_argument("--latency-stddev", type=float, default=None)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-sleep", action="store_true", help="Do not actually wait; measure client overhead only")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    backend = SimulatorBackend(
+        latency_distribution=args.latency_distribution,
+        latency_mean=args.latency_mean,
+        latency_stddev=args.latency_stddev,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        sleep=not args.no_sleep
+    )
+    report = run_benchmark(args.iterations, args.concurrency, backend)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from config import Config
+from context_builder import ContextBuilder
 
 class ChatManager:
     def __init__(self):
         self.chat_file = os.path.join(Config.SCRIPT_FILE_PATH, "chat_history.json")
+        self.summary_file = os.path.join(Config.SCRIPT_FILE_PATH, "chat_summaries.json")
+        self.archive_dir = os.path.join(Config.SCRIPT_FILE_PATH, "chat_archive")
         self.chat_history = self.load_chat_history()
+        self.chat_summaries = self.load_chat_summaries()
     
     def load_chat_history(self) -> Dict:
         """Load chat history from JSON file"""
@@ -34,6 +38,26 @@ class ChatManager:
         except Exception as e:
             print(f"Error saving chat history: {e}")
     
+    def load_chat_summaries(self) -> Dict:
+        """Load running conversation summaries from JSON file"""
+        if os.path.exists(self.summary_file):
+            try:
+                with open(self.summary_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+            except Exception as e:
+                print(f"Error loading chat summaries: {e}")
+        return {}
+    
+    def save_chat_summaries(self):
+        """Save running conversation summaries to JSON file"""
+        try:
+            with open(self.summary_file, 'w', encoding='utf-8') as f:
+                json.dump(self.chat_summaries, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error saving chat summaries: {e}")
+    
     def get_user_chat_key(self, username: str, script_id: str = None) -> str:
         """Get the key for user's chat history"""
         if script_id:
@@ -70,6 +94,76 @@ class ChatManager:
         if chat_key in self.chat_history:
             self.chat_history[chat_key] = []
             self.save_chat_history()
+        if chat_key in self.chat_summaries:
+            del self.chat_summaries[chat_key]
+            self.save_chat_summaries()
+    
+    def get_chat_summary(self, username: str, script_id: str = None) -> str:
+        """Running summary of the messages compacted out of the chat history"""
+        chat_key = self.get_user_chat_key(username, script_id)
+        return self.chat_summaries.get(chat_key, {}).get('summary', '')
+    
+    def archive_messages(self, chat_key: str, messages: List[Dict]):
+        """Append raw messages to the conversation's archive (one JSON object per line)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with open(os.path.join(self.archive_dir, f"{chat_key}.jsonl"), 'a', encoding='utf-8') as f:
+            for message in messages:
+                f.write(json.dumps(message, ensure_ascii=False) + "\n")
+    
+    @staticmethod
+    def build_compaction_prompt(summary: str, messages: List[Dict]) -> str:
+        """Build the prompt that folds older messages into the running summary"""
+        transcript = "\n".join(
+            f"- {'User' if message['role'] == 'user' else 'Assistant'}: {message['content'][:Config.CHAT_COMPACT_MESSAGE_CHARS]}"
+            for message in messages
+        )
+        return f"""
+        Update the running summary of a conversation between a filmmaker and their screenwriting assistant.
+        Keep decisions made, the filmmaker's preferences, facts established about the story and characters,
+        and open questions. Drop small talk. Use at most {Config.CHAT_SUMMARY_MAX_WORDS} words.
+        
+        CURRENT SUMMARY:
+        {summary or "(none yet)"}
+        
+        NEW MESSAGES:
+        {transcript}
+        
+        Return only the updated summary.
+        """
+    
+    def compact_history(self, username: str, llm_client, script_id: str = None) -> bool:
+        """Fold older messages into the running summary once the history exceeds CHAT_COMPACT_THRESHOLD
+        
+        The summary is updated incrementally from its previous version and the messages being
+        compacted; those messages are archived and removed from the live history, which keeps
+        the CHAT_COMPACT_KEEP_RECENT most recent ones. Returns whether anything was compacted.
+        """
+        chat_key = self.get_user_chat_key(username, script_id)
+        history = self.chat_history.get(chat_key, [])
+        if len(history) <= Config.CHAT_COMPACT_THRESHOLD:
+            return False
+        
+        old_messages = history[:len(history) - Config.CHAT_COMPACT_KEEP_RECENT]
+        previous = self.chat_summaries.get(chat_key, {})
+        summary = llm_client.generate_response(
+            self.build_compaction_prompt(previous.get('summary', ''), old_messages), operation="summarize"
+        )
+        if summary.startswith("Error generating"):
+            # Keep the full history and try again after the next message
+            print(f"Chat compaction failed: {summary}")
+            return False
+        
+        self.archive_messages(chat_key, old_messages)
+        self.chat_summaries[chat_key] = {
+            'summary': summary.strip(),
+            'compacted_messages': previous.get('compacted_messages', 0) + len(old_messages),
+            'updated_at': datetime.now().isoformat()
+        }
+        self.save_chat_summaries()
+        # Messages added while the summary was generated stay in the history
+        self.chat_history[chat_key] = self.chat_history[chat_key][len(old_messages):]
+        self.save_chat_history()
+        return True
     
     def get_context_summary(self, character_manager, scene_manager, location_manager, username: str = None) -> str:
         """Get a summary of the current script context"""
@@ -96,45 +190,151 @@ class ChatManager:
         
         return " | ".join(summary) if summary else "No content created yet."
     
+    def get_script_overview(self, character_manager, scene_manager, location_manager, username: str = None) -> str:
+        """Get a compact, message-independent overview of the script (stable across chat turns)
+        
+        Entity counts plus as many characters, scenes and locations as fit in
+        CONTEXT_OVERVIEW_BUDGET, so the overview stays the same size however large the script grows.
+        """
+        if not username:
+            return "No user context available."
+        
+        characters = character_manager.get_characters(username)
+        scenes = scene_manager.get_scene_sequence(username)
+        locations = location_manager.get_locations(username)
+        if not (characters or scenes or locations):
+            return "No content created yet."
+        
+        builder = ContextBuilder(token_budget=Config.CONTEXT_OVERVIEW_BUDGET,
+                                 section_shares={'characters': 0.4, 'scenes': 0.4, 'locations': 0.2})
+        sections = {
+            'characters': [builder.make_item(char.get('name', 'Unknown'),
+                                             f"- {char.get('name', 'Unknown')}: {char.get('description', 'No description')[:80]}",
+                                             f"- {char.get('name', 'Unknown')}")
+                           for char in characters.values()],
+            'scenes': [builder.make_item(f"Scene {scene.get('scene_number', 'N/A')}",
+                                         f"- Scene {scene.get('scene_number', 'N/A')}: {scene.get('title', 'No title')} at {scene.get('location', 'Unknown location')}",
+                                         f"- Scene {scene.get('scene_number', 'N/A')}: {scene.get('title', 'No title')}")
+                       for scene in scenes],
+            'locations': [builder.make_item(loc.get('name', 'Unknown'), f"- {loc.get('name', 'Unknown')}")
+                          for loc in locations.values()]
+        }
+        overview, report = builder.build(sections)
+        
+        counts = f"SCRIPT: {len(characters)} characters, {len(scenes)} scenes, {len(locations)} locations"
+        omitted = sum(len(section['dropped']) for section in report['sections'].values())
+        if omitted:
+            counts += f" ({omitted} not listed here; details of relevant ones follow with each message)"
+        return f"{counts}\n\n{overview}"
+    
     def get_full_context_for_ai(self, character_manager, scene_manager, location_manager, user_message: str, username: str = None, script_id: str = None) -> str:
         """Get full context for AI processing"""
+        context, _ = self.build_context_for_ai(character_manager, scene_manager, location_manager, user_message, username, script_id)
+        return context
+    
+    def build_context_for_ai(self, character_manager, scene_manager, location_manager, user_message: str, username: str = None, script_id: str = None, token_budget: int = None, context_index=None, script_version: str = None) -> Tuple[str, Dict]:
+        """Build token-budgeted context for AI processing and report what was included
+        
+        When a ScriptContextIndex is given, only entities and earlier chat turns retrieved
+        for the user's message are considered, ranked by their BM25 score. A kind with no
+        retrieved entities (e.g. for "What should happen next?") falls back to all of its
+        entities in keyword-relevance order, so the model never gets an empty script context.
+        script_version lets the index skip re-syncing a script that has not changed.
+        """
         if not username:
-            return "No user context available."
+            return "No user context available.", {}
+        
+        builder = ContextBuilder(token_budget=token_budget)
+        query_terms = set(builder.keywords(user_message))
         
         characters = character_manager.get_characters(username)
         scenes = scene_manager.get_scene_sequence(username)
         locations = location_manager.get_locations(username)
+        chat_key = self.get_user_chat_key(username, script_id)
+        chat_history = self.get_chat_history(username, script_id)
+        
+        retrieved = None
+        if context_index is not None and script_id:
+            scenes_by_id = {str(scene.get('id', scene.get('scene_number'))): scene for scene in scenes}
+            context_index.sync_script(script_id, {'characters': characters, 'scenes': scenes_by_id, 'locations': locations},
+                                      version=script_version)
+            context_index.sync_chat(script_id, chat_key, chat_history)
+            retrieved = {
+                data_type: dict(context_index.retrieve(script_id, user_message, data_type))
+                for data_type in ('characters', 'scenes', 'locations', f"chat:{chat_key}")
+            }
+            if retrieved['characters']:
+                characters = {char_id: char for char_id, char in characters.items() if char_id in retrieved['characters']}
+            if retrieved['scenes']:
+                scenes = [scene for scene_id, scene in scenes_by_id.items() if scene_id in retrieved['scenes']]
+            if retrieved['locations']:
+                locations = {loc_id: loc for loc_id, loc in locations.items() if loc_id in retrieved['locations']}
         
-        context_parts = []
+        def relevance(data_type: str, entity_id, text: str) -> float:
+            if retrieved is not None and retrieved[data_type]:
+                return retrieved[data_type].get(str(entity_id), 0.0)
+            return builder.score_relevance(text, query_terms)
+        
+        sections = {}
         
         # Character context
-        if characters:
-            char_context = "CHARACTERS:\n"
-            for char in characters.values():
-                char_context += f"- {char.get('name', 'Unknown')}: {char.get('description', 'No description')}\n"
-            context_parts.append(char_context)
+        character_items = []
+        for char_id, char in characters.items():
+            name = char.get('name', 'Unknown')
+            description = char.get('description', 'No description')
+            full = f"- {name}: {description}"
+            for label, field in (('Personality', 'personality'), ('Goals', 'goals'), ('Conflicts', 'conflicts')):
+                if char.get(field):
+                    full += f" | {label}: {char[field]}"
+            summary = f"- {name}: {description[:80]}"
+            character_items.append(builder.make_item(name, full, summary, relevance('characters', char_id, full)))
+        sections['characters'] = character_items
         
         # Scene context
-        if scenes:
-            scene_context = "SCENES:\n"
-            for scene in scenes:
-                scene_context += f"- Scene {scene.get('scene_number', 'N/A')}: {scene.get('title', 'No title')} at {scene.get('location', 'Unknown location')}\n"
-            context_parts.append(scene_context)
+        scene_items = []
+        for scene in scenes:
+            summary = f"- Scene {scene.get('scene_number', 'N/A')}: {scene.get('title', 'No title')} at {scene.get('location', 'Unknown location')}"
+            full = summary
+            scene_characters = scene.get('characters', [])
+            if isinstance(scene_characters, list) and scene_characters:
+                full += f" | Characters: {', '.join(scene_characters)}"
+            if scene.get('goal'):
+                full += f" | Goal: {scene['goal']}"
+            if scene.get('action'):
+                full += f" | Content: {scene['action']}"
+            key = f"Scene {scene.get('scene_number', 'N/A')}"
+            scene_items.append(builder.make_item(key, full, summary, relevance('scenes', scene.get('id', scene.get('scene_number')), full)))
+        sections['scenes'] = scene_items
         
         # Location context
-        if locations:
-            loc_context = "LOCATIONS:\n"
-            for loc in locations.values():
-                loc_context += f"- {loc.get('name', 'Unknown')}: {loc.get('description', 'No description')}\n"
-            context_parts.append(loc_context)
+        location_items = []
+        for loc_id, loc in locations.items():
+            name = loc.get('name', 'Unknown')
+            full = f"- {name}: {loc.get('description', 'No description')}"
+            location_items.append(builder.make_item(name, full, f"- {name}", relevance('locations', loc_id, full)))
+        sections['locations'] = location_items
         
-        # Chat history context
-        chat_history = self.get_chat_history(username, script_id)
-        if chat_history:
-            history_context = "RECENT CHAT HISTORY:\n"
-            for message in chat_history[-5:]:  # Last 5 messages
-                role = "User" if message['role'] == 'user' else "Assistant"
-                history_context += f"- {role}: {message['content'][:100]}...\n"
-            context_parts.append(history_context)
-        
-        return "\n\n".join(context_parts) if context_parts else "No context available." 
\ No newline at end of file
+        # Chat history context: recent messages ranked highest, plus retrieved earlier turns
+        if retrieved is not None:
+            recent_start = max(0, len(chat_history) - Config.CONTEXT_RECENT_MESSAGES)
+            earlier = {int(position): score for position, score in retrieved[f"chat:{chat_key}"].items()}
+            positions = sorted(set(range(recent_start, len(chat_history))) | {p for p in earlier if p < recent_start})
+        else:
+            positions = list(range(max(0, len(chat_history) - Config.CONTEXT_HISTORY_MESSAGES), len(chat_history)))
+        history_items = []
+        running_summary = self.get_chat_summary(username, script_id)
+        if running_summary:
+            # Memory of compacted turns ranks above every live message
+            full = f"- Conversation so far: {running_summary}"
+            history_items.append(builder.make_item("Conversation summary", full, full[:300], 2e6))
+        for position in positions:
+            message = chat_history[position]
+            role = "User" if message['role'] == 'user' else "Assistant"
+            full = f"- {role}: {message['content']}"
+            summary = f"- {role}: {message['content'][:100]}..." if len(message['content']) > 100 else full
+            # Recent turns always outrank retrieved earlier ones
+            score = 1e6 + position if retrieved is None or position >= recent_start else earlier[position]
+            history_items.append(builder.make_item(f"{role} #{position + 1}", full, summary, score))
+        sections['history'] = history_items
+        
+        return builder.build(sections)
@@ -10,6 +10,96 @@ class Config:
     MODEL_NAME = os.getenv('MODEL_NAME', 'gemini-1.5-flash')
     TEMPERATURE = float(os.getenv('TEMPERATURE', '0.7'))
     MAX_TOKENS = int(os.getenv('MAX_TOKENS', '2000'))
+    # Model routing per operation class: comma-separated models of the same quality tier
+    # (traffic shifts to the one with the lowest observed latency) and an output token cap
+    MODEL_ROUTES = {
+        'chat': {'models': os.getenv('MODELS_CHAT', MODEL_NAME),
+                 'max_output_tokens': int(os.getenv('MAX_TOKENS_CHAT', '150'))},
+        'summarize': {'models': os.getenv('MODELS_SUMMARIZE', MODEL_NAME),
+                      'max_output_tokens': int(os.getenv('MAX_TOKENS_SUMMARIZE', '512'))},
+        'analyze': {'models': os.getenv('MODELS_ANALYZE', MODEL_NAME),
+                    'max_output_tokens': int(os.getenv('MAX_TOKENS_ANALYZE', '1500'))},
+        'rewrite': {'models': os.getenv('MODELS_REWRITE', MODEL_NAME),
+                    'max_output_tokens': int(os.getenv('MAX_TOKENS_REWRITE', str(MAX_TOKENS)))},
+        'generate': {'models': os.getenv('MODELS_GENERATE', MODEL_NAME),
+                     'max_output_tokens': int(os.getenv('MAX_TOKENS_GENERATE', str(MAX_TOKENS)))}
+    }
+    # Latency feedback: weight of the newest sample, and calls each model gets before latency decides
+    ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', '0.2'))
+    ROUTER_MIN_SAMPLES = int(os.getenv('ROUTER_MIN_SAMPLES', '3'))
+    # Text tool variants (several tones or samples) are sent as one parallel batch of at most this many calls
+    VARIANT_MAX_PARALLEL = int(os.getenv('VARIANT_MAX_PARALLEL', '4'))
+    # Text tool pipelines: cached stage outputs kept in data/pipeline_cache.json
+    PIPELINE_CACHE_LIMIT = int(os.getenv('PIPELINE_CACHE_LIMIT', '200'))
+    # Continuity checks: neighbouring scenes sent verbatim, earlier ones as cached hierarchical summaries
+    # (about SUMMARY_SEQUENCE_SIZE scenes per sequence, SUMMARY_ACT_SIZE sequences per act; data/summary_cache.json).
+    # Act summaries are folded further until at most SUMMARY_MAX_ACTS remain
+    CONTINUITY_NEIGHBOUR_SCENES = int(os.getenv('CONTINUITY_NEIGHBOUR_SCENES', '2'))
+    SUMMARY_SEQUENCE_SIZE = int(os.getenv('SUMMARY_SEQUENCE_SIZE', '6'))
+    SUMMARY_ACT_SIZE = int(os.getenv('SUMMARY_ACT_SIZE', '4'))
+    SUMMARY_MAX_ACTS = int(os.getenv('SUMMARY_MAX_ACTS', '8'))
+    SUMMARY_CACHE_LIMIT = int(os.getenv('SUMMARY_CACHE_LIMIT', '2000'))
+    SUMMARY_FALLBACK_CHARS = int(os.getenv('SUMMARY_FALLBACK_CHARS', '300'))
+    # Scene edits ("Process Scene", custom requests): 'patch' asks for line-range edits applied locally
+    # (falls back to a full rewrite if they do not apply), 'rewrite' always regenerates the whole scene
+    SCENE_EDIT_MODE = os.getenv('SCENE_EDIT_MODE', 'patch')
+    # Text generation backend: 'gemini' or 'simulator' (offline, deterministic)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    # Offline simulator: time to first token (seconds) drawn from fixed/uniform/normal/lognormal,
+    # plus output tokens / SIM_TOKENS_PER_SECOND; SIM_ERROR_RATE of calls fail
+    SIM_LATENCY_DISTRIBUTION = os.getenv('SIM_LATENCY_DISTRIBUTION', 'lognormal')
+    SIM_LATENCY_MEAN = float(os.getenv('SIM_LATENCY_MEAN', '0.6'))
+    SIM_LATENCY_STDDEV = float(os.getenv('SIM_LATENCY_STDDEV', '0.2'))
+    SIM_TOKENS_PER_SECOND = float(os.getenv('SIM_TOKENS_PER_SECOND', '80'))
+    SIM_ERROR_RATE = float(os.getenv('SIM_ERROR_RATE', '0.0'))
+    SIM_SEED = int(os.getenv('SIM_SEED', '42'))
+    # Record/replay cassette: LLM_CASSETTE_MODE is '', 'record' or 'replay'
+    LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', '')
+    LLM_CASSETTE_PATH = os.getenv('LLM_CASSETTE_PATH', './data/llm_cassette.json')
+    
+    # Prompt prefix caching (system prompt + script context reused across calls)
+    PROMPT_CACHE_MAX_ENTRIES = int(os.getenv('PROMPT_CACHE_MAX_ENTRIES', '64'))
+    PROMPT_CACHE_TTL_SECONDS = int(os.getenv('PROMPT_CACHE_TTL_SECONDS', '3600'))
+    # Prefixes shorter than this are sent inline; backends only accept fairly large cached contents
+    PROMPT_CACHE_MIN_CHARS = int(os.getenv('PROMPT_CACHE_MIN_CHARS', '4096'))
+    
+    # Chat context budget (approximate tokens sent as script context per chat turn)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))
+    CONTEXT_HISTORY_MESSAGES = int(os.getenv('CONTEXT_HISTORY_MESSAGES', '10'))
+    # Budget of the script overview sent as the cacheable chat prompt prefix (counts plus entities that fit)
+    CONTEXT_OVERVIEW_BUDGET = int(os.getenv('CONTEXT_OVERVIEW_BUDGET', '400'))
+    # Sections in priority order with their share of the budget; unused budget rolls over to the next section
+    CONTEXT_SECTION_SHARES = {
+        'history': float(os.getenv('CONTEXT_SHARE_HISTORY', '0.25')),
+        'characters': float(os.getenv('CONTEXT_SHARE_CHARACTERS', '0.25')),
+        'scenes': float(os.getenv('CONTEXT_SHARE_SCENES', '0.35')),
+        'locations': float(os.getenv('CONTEXT_SHARE_LOCATIONS', '0.15'))
+    }
+    # Chat compaction: past CHAT_COMPACT_THRESHOLD messages, all but the CHAT_COMPACT_KEEP_RECENT newest are
+    # folded into a running summary (SCRIPT_FILE_PATH/chat_summaries.json) and archived under chat_archive/
+    CHAT_COMPACT_THRESHOLD = int(os.getenv('CHAT_COMPACT_THRESHOLD', '30'))
+    CHAT_COMPACT_KEEP_RECENT = int(os.getenv('CHAT_COMPACT_KEEP_RECENT', '10'))
+    CHAT_COMPACT_MESSAGE_CHARS = int(os.getenv('CHAT_COMPACT_MESSAGE_CHARS', '1500'))
+    CHAT_SUMMARY_MAX_WORDS = int(os.getenv('CHAT_SUMMARY_MAX_WORDS', '250'))
+    # Retrieval: only the top-k matching entities of each kind (and matching earlier chat turns) are sent
+    CONTEXT_RETRIEVAL_TOP_K = int(os.getenv('CONTEXT_RETRIEVAL_TOP_K', '5'))
+    CONTEXT_RECENT_MESSAGES = int(os.getenv('CONTEXT_RECENT_MESSAGES', '4'))
+    
+    # Local semantic index (hashed n-gram embeddings, stored under SCRIPT_FILE_PATH/embeddings)
+    EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '256'))
+    # Changes are appended to a per-script log; the snapshot is rewritten once the log outgrows
+    # the index (and at least this many entries), so single edits don't rewrite every vector
+    EMBEDDING_LOG_MIN_ENTRIES = int(os.getenv('EMBEDDING_LOG_MIN_ENTRIES', '1000'))
+    
+    # Background jobs (stored in data/jobs.json)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_HISTORY_LIMIT = int(os.getenv('JOB_HISTORY_LIMIT', '200'))
+    # Whole-script batch transforms: scenes processed in parallel within one job
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '3'))
+    # Opt-in background analysis of saved scenes/characters (cached in data/analysis_cache.json)
+    PREFETCH_ANALYSES = os.getenv('PREFETCH_ANALYSES', 'false').lower() in ('1', 'true', 'yes')
+    PREFETCH_DEBOUNCE_SECONDS = float(os.getenv('PREFETCH_DEBOUNCE_SECONDS', '5'))
+    ANALYSIS_CACHE_LIMIT = int(os.getenv('ANALYSIS_CACHE_LIMIT', '500'))
     
     # File Paths
     SCRIPT_FILE_PATH = os.getenv('SCRIPT_FILE_PATH', './scripts/')
@@ -17,6 +107,24 @@ class Config:
     SCENE_FILE_PATH = os.getenv('SCENE_FILE_PATH', './scenes/')
     LOCATION_FILE_PATH = os.getenv('LOCATION_FILE_PATH', './locations/')
     
+    # Word exports are streamed to the browser; set EXPORT_PERSIST to also keep a copy in EXPORT_DIR.
+    # Exports in EXPORT_DIR older than EXPORT_RETENTION_DAYS or beyond the EXPORT_MAX_FILES newest are deleted
+    # whenever an export is saved there, so EXPORT_DIR should hold nothing but exports.
+    EXPORT_PERSIST = os.getenv('EXPORT_PERSIST', 'false').lower() in ('1', 'true', 'yes')
+    EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(SCRIPT_FILE_PATH, 'exports'))
+    EXPORT_RETENTION_DAYS = float(os.getenv('EXPORT_RETENTION_DAYS', '7'))
+    EXPORT_MAX_FILES = int(os.getenv('EXPORT_MAX_FILES', '20'))
+    # Rendered scenes kept in memory so re-exports only render scenes that changed
+    EXPORT_FRAGMENT_CACHE_SIZE = int(os.getenv('EXPORT_FRAGMENT_CACHE_SIZE', '2000'))
+    # Worker processes rendering Word and zip bundle exports (0 renders in the app process); defaults to one per core, up to 4
+    EXPORT_PROCESSES = int(os.getenv('EXPORT_PROCESSES', str(min(4, os.cpu_count() or 1))))
+    # Finished Word exports kept in memory for download
+    EXPORT_RESULT_LIMIT = int(os.getenv('EXPORT_RESULT_LIMIT', '20'))
+    # Parsed screenplay elements kept per scene content hash (used by export, analytics and search)
+    PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '5000'))
+    # Lines per screenplay page (Courier 12pt, standard margins); one page is about one minute of screen time
+    PAGE_LINES = int(os.getenv('PAGE_LINES', '55'))
+    
     # Ensure directories exist
     @staticmethod
     def create_directories():
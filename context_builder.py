@@ -0,0 +1,119 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could did do does for from had has have he her
+him his how i if in into is it its just me my no not of on or our out she so some than that the their them then
+there they this to up us was we were what when where which who why will with would you your
+""".split())
+
+SECTION_TITLES = {
+    'history': 'RECENT CHAT HISTORY',
+    'characters': 'CHARACTERS',
+    'scenes': 'SCENES',
+    'locations': 'LOCATIONS'
+}
+
+class ContextBuilder:
+    """Assemble chat context within a token budget, keeping the most relevant items"""
+
+    def __init__(self, token_budget: int = None, section_shares: Dict[str, float] = None):
+        self.token_budget = token_budget if token_budget is not None else Config.CONTEXT_TOKEN_BUDGET
+        self.section_shares = section_shares if section_shares is not None else Config.CONTEXT_SECTION_SHARES
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Estimate token count (roughly 4 characters per token for English prose)"""
+        if not text:
+            return 0
+        return max(1, (len(text) + 3) // 4)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Split text into lowercase word tokens"""
+        return WORD_PATTERN.findall(text.lower()) if text else []
+
+    @staticmethod
+    def keywords(text: str) -> List[str]:
+        """Word tokens without common stopwords, used for relevance matching"""
+        return [word for word in ContextBuilder.tokenize(text) if word not in STOPWORDS]
+
+    def score_relevance(self, text: str, query_terms: set) -> float:
+        """Score an item by the fraction of query terms it mentions"""
+        if not query_terms:
+            return 0.0
+        item_terms = set(self.keywords(text))
+        return len(item_terms & query_terms) / len(query_terms)
+
+    def make_item(self, key: str, full: str, summary: str = None, score: float = 0.0) -> Dict:
+        """Create a context item with a full and a summarized rendering"""
+        return {
+            'key': key,
+            'full': full,
+            'summary': summary if summary is not None else full,
+            'score': score
+        }
+
+    def fit_section(self, items: List[Dict], budget: int) -> Tuple[List[str], Dict]:
+        """Select items for one section, most relevant first, summarizing or dropping to fit the budget"""
+        ranked = sorted(enumerate(items), key=lambda pair: (-pair[1]['score'], pair[0]))
+        chosen = {}
+        used = 0
+        included, summarized, dropped = [], [], []
+
+        for index, item in ranked:
+            full_tokens = self.count_tokens(item['full'])
+            summary_tokens = self.count_tokens(item['summary'])
+            if used + full_tokens <= budget:
+                chosen[index] = item['full']
+                used += full_tokens
+                included.append(item['key'])
+            elif item['summary'] != item['full'] and used + summary_tokens <= budget:
+                chosen[index] = item['summary']
+                used += summary_tokens
+                summarized.append(item['key'])
+            else:
+                dropped.append(item['key'])
+
+        # Keep the original (script / chronological) order in the rendered output
+        lines = [chosen[index] for index in sorted(chosen)]
+        report = {
+            'budget': budget,
+            'used_tokens': used,
+            'included': included,
+            'summarized': summarized,
+            'dropped': dropped
+        }
+        return lines, report
+
+    def build(self, sections: Dict[str, List[Dict]]) -> Tuple[str, Dict]:
+        """Build the context string and a report of what was included per section"""
+        context_parts = []
+        report = {'token_budget': self.token_budget, 'sections': {}}
+        carry_over = 0
+        total_used = 0
+
+        for section, share in self.section_shares.items():
+            items = sections.get(section, [])
+            budget = int(self.token_budget * share) + carry_over
+            if not items:
+                carry_over = budget
+                continue
+
+            title = SECTION_TITLES.get(section, section.upper())
+            header_tokens = self.count_tokens(f"{title}:\n")
+            lines, section_report = self.fit_section(items, max(0, budget - header_tokens))
+            if lines:
+                context_parts.append(f"{title}:\n" + "\n".join(lines) + "\n")
+                section_report['used_tokens'] += header_tokens
+
+            carry_over = max(0, budget - section_report['used_tokens'])
+            total_used += section_report['used_tokens']
+            report['sections'][section] = section_report
+
+        report['used_tokens'] = total_used
+        context = "\n\n".join(context_parts) if context_parts else "No context available."
+        return context, report
@@ -0,0 +1,173 @@
+import hashlib
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from context_builder import ContextBuilder
+
+ENTITY_KINDS = ('characters', 'scenes', 'locations')
+
+def entity_text(data_type: str, data: Dict) -> str:
+    """Flatten an entity into the text that gets indexed"""
+    if data_type == 'characters':
+        fields = ['name', 'description', 'personality', 'goals', 'conflicts']
+    elif data_type == 'scenes':
+        fields = ['title', 'location', 'time_of_day', 'characters', 'goal', 'conflict_stakes', 'action']
+    else:
+        fields = ['name', 'description', 'type', 'objects', 'lighting']
+
+    parts = []
+    for field in fields:
+        value = data.get(field, '')
+        if isinstance(value, list):
+            value = ' '.join(str(v) for v in value)
+        parts.append(str(value))
+    return ' '.join(parts)
+
+def content_hash(text: str) -> str:
+    """Stable hash used to detect changed documents"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class BM25Index:
+    """Small in-memory BM25 index with incremental upserts and removals"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = {}  # doc_id -> {'hash', 'length', 'terms'}
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.total_length = 0
+
+    def upsert(self, doc_id: str, text: str) -> bool:
+        """Index or re-index a document; returns False when the content is unchanged"""
+        text_hash = content_hash(text)
+        existing = self.documents.get(doc_id)
+        if existing and existing['hash'] == text_hash:
+            return False
+        if existing:
+            self.remove(doc_id)
+
+        terms = Counter(ContextBuilder.keywords(text))
+        length = sum(terms.values())
+        self.documents[doc_id] = {'hash': text_hash, 'length': length, 'terms': terms}
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        return True
+
+    def remove(self, doc_id: str):
+        """Remove a document from the index"""
+        existing = self.documents.pop(doc_id, None)
+        if not existing:
+            return
+        self.total_length -= existing['length']
+        for term in existing['terms']:
+            term_postings = self.postings.get(term)
+            if term_postings is not None:
+                term_postings.pop(doc_id, None)
+                if not term_postings:
+                    del self.postings[term]
+
+    def search(self, query: str, prefix: str = '') -> Dict[str, float]:
+        """Score every document matching the query; optionally restrict to doc ids with a prefix"""
+        if not self.documents:
+            return {}
+
+        doc_count = len(self.documents)
+        average_length = self.total_length / doc_count if doc_count else 0
+        scores = {}
+        for term in set(ContextBuilder.keywords(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for doc_id, frequency in term_postings.items():
+                if prefix and not doc_id.startswith(prefix):
+                    continue
+                length = self.documents[doc_id]['length']
+                norm = self.k1 * (1 - self.b + self.b * length / average_length) if average_length else self.k1
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+class ScriptContextIndex:
+    """Per-script retrieval index over characters, scenes, locations and chat turns"""
+
+    def __init__(self):
+        self.indexes = {}  # script_id -> BM25Index
+        self.chat_counts = {}  # chat key -> (number of messages already indexed, fingerprint of the first one)
+        self.script_versions = {}  # script_id -> version of the script last synced
+        self.lock = threading.Lock()
+
+    def get_index(self, script_id: str) -> BM25Index:
+        """Get (or create) the index for a script"""
+        if script_id not in self.indexes:
+            self.indexes[script_id] = BM25Index()
+        return self.indexes[script_id]
+
+    def on_script_change(self, username: str, script_id: str, data_type: str, entity_id: str, data: Optional[Dict]):
+        """ScriptAwareManager listener: update a single entity after it is added, edited or deleted"""
+        if data_type not in ENTITY_KINDS:
+            return
+        with self.lock:
+            index = self.get_index(script_id)
+            doc_id = f"{data_type}:{entity_id}"
+            if data is None:
+                index.remove(doc_id)
+            else:
+                index.upsert(doc_id, entity_text(data_type, data))
+
+    def sync_script(self, script_id: str, entities: Dict[str, Dict], version: str = None) -> int:
+        """Bring the index in line with the script's entities; only changed entities are re-indexed
+
+        With a version (e.g. the script's last_modified), nothing is hashed when that version was
+        already synced; edits in between reach the index through on_script_change.
+        """
+        updated = 0
+        with self.lock:
+            if version is not None and self.script_versions.get(script_id) == version:
+                return 0
+            index = self.get_index(script_id)
+            seen = set()
+            for data_type in ENTITY_KINDS:
+                for entity_id, data in entities.get(data_type, {}).items():
+                    doc_id = f"{data_type}:{entity_id}"
+                    seen.add(doc_id)
+                    if index.upsert(doc_id, entity_text(data_type, data)):
+                        updated += 1
+            stale = [doc_id for doc_id in index.documents
+                     if doc_id.split(':', 1)[0] in ENTITY_KINDS and doc_id not in seen]
+            for doc_id in stale:
+                index.remove(doc_id)
+            self.script_versions[script_id] = version
+        return updated
+
+    def sync_chat(self, script_id: str, chat_key: str, messages: List[Dict]):
+        """Index chat messages that arrived since the last sync"""
+        with self.lock:
+            index = self.get_index(script_id)
+            indexed, first = self.chat_counts.get(chat_key, (0, None))
+            current_first = self.message_fingerprint(messages[0]) if messages else None
+            if len(messages) < indexed or (indexed and current_first != first):
+                # History was cleared or compacted (possibly regrown since); drop the old turns
+                for doc_id in [d for d in index.documents if d.startswith(f"chat:{chat_key}:")]:
+                    index.remove(doc_id)
+                indexed = 0
+            for position in range(indexed, len(messages)):
+                index.upsert(f"chat:{chat_key}:{position}", messages[position].get('content', ''))
+            self.chat_counts[chat_key] = (len(messages), current_first)
+
+    @staticmethod
+    def message_fingerprint(message: Dict) -> str:
+        """Identity of a chat message; the timestamp tells a repeated message from the original"""
+        return hashlib.sha1(f"{message.get('timestamp', '')}\x00{message.get('content', '')}".encode('utf-8')).hexdigest()
+
+    def retrieve(self, script_id: str, query: str, data_type: str, top_k: int = None) -> List[Tuple[str, float]]:
+        """Return the top-k (entity id, score) pairs of one kind for a query"""
+        if top_k is None:
+            top_k = Config.CONTEXT_RETRIEVAL_TOP_K
+        prefix = f"{data_type}:"
+        with self.lock:
+            scores = self.get_index(script_id).search(query, prefix)
+        ranked = sorted(scores.items(), key=lambda pair: -pair[1])[:top_k]
+        return [(doc_id[len(prefix):], score) for doc_id, score in ranked]
@@ -0,0 +1,302 @@
+import base64
+import json
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import Config
+from context_builder import ContextBuilder
+from context_index import ENTITY_KINDS, content_hash, entity_text
+
+class HashedNgramEmbedder:
+    """Dependency-free text embedder: hashed word unigrams and character trigrams, L2-normalized"""
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or Config.EMBEDDING_DIM
+
+    def features(self, text: str) -> List[str]:
+        """Word and character-trigram features for a text"""
+        words = ContextBuilder.keywords(text)
+        features = list(words)
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed many texts into a (len(texts), dim) float32 matrix"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # crc32 is stable across processes, unlike the built-in hash()
+            hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in self.features(text)), dtype=np.uint32)
+            if hashes.size == 0:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a single text"""
+        return self.embed_batch([text])[0]
+
+class EmbeddingStore:
+    """Contiguous float32 matrix of unit vectors with id bookkeeping and cosine top-k search"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.matrix = np.zeros((16, dim), dtype=np.float32)
+        self.ids = []
+        self.hashes = []
+        self.rows = {}  # doc id -> row
+        self.log_entries = 0  # changes appended to the log since the last snapshot
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert_many(self, doc_ids: List[str], hashes: List[str], vectors: np.ndarray):
+        """Insert or overwrite vectors, growing the matrix geometrically when full"""
+        for doc_id, text_hash, vector in zip(doc_ids, hashes, vectors):
+            row = self.rows.get(doc_id)
+            if row is None:
+                row = len(self.ids)
+                if row == self.matrix.shape[0]:
+                    grown = np.zeros((self.matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                    grown[:row] = self.matrix[:row]
+                    self.matrix = grown
+                self.ids.append(doc_id)
+                self.hashes.append(text_hash)
+                self.rows[doc_id] = row
+            else:
+                self.hashes[row] = text_hash
+            self.matrix[row] = vector
+
+    def remove(self, doc_id: str):
+        """Remove a vector by moving the last row into its slot"""
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = self.ids[last]
+            self.hashes[row] = self.hashes[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.hashes.pop()
+
+    def get_hash(self, doc_id: str) -> Optional[str]:
+        """Content hash stored for a document, if indexed"""
+        row = self.rows.get(doc_id)
+        return self.hashes[row] if row is not None else None
+
+    def get_vector(self, doc_id: str) -> Optional[np.ndarray]:
+        """Stored vector for a document, if indexed"""
+        row = self.rows.get(doc_id)
+        return self.matrix[row] if row is not None else None
+
+    def search_batch(self, queries: np.ndarray, top_k: int, prefix: str = '') -> List[List[Tuple[str, float]]]:
+        """Cosine top-k for a batch of unit query vectors, optionally restricted to ids with a prefix"""
+        count = len(self.ids)
+        if count == 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ self.matrix[:count].T
+        if prefix:
+            mask = np.fromiter((doc_id.startswith(prefix) for doc_id in self.ids), dtype=bool, count=count)
+            scores[:, ~mask] = -np.inf
+
+        k = min(top_k, count)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row_scores[candidates])]
+            results.append([(self.ids[i], float(row_scores[i])) for i in ordered if np.isfinite(row_scores[i])])
+        return results
+
+    @staticmethod
+    def log_path(path: str) -> str:
+        return f"{path}.log"
+
+    def save(self, path: str):
+        """Persist the store as a compressed .npz snapshot and start a new, empty change log"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, matrix=self.matrix[:len(self.ids)],
+                            ids=np.array(self.ids, dtype=str), hashes=np.array(self.hashes, dtype=str))
+        os.replace(tmp_path, path)
+        # Replaying an old log over the new snapshot is harmless, so a crash here loses nothing
+        if os.path.exists(self.log_path(path)):
+            os.remove(self.log_path(path))
+        self.log_entries = 0
+
+    def append_log(self, path: str, doc_ids: List[str], removed: List[str]):
+        """Append changed and removed documents to the change log next to the snapshot"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(self.log_path(path), 'a', encoding='utf-8') as f:
+            for doc_id in doc_ids:
+                row = self.rows[doc_id]
+                vector = base64.b64encode(self.matrix[row].astype(np.float32).tobytes()).decode('ascii')
+                f.write(json.dumps({'id': doc_id, 'hash': self.hashes[row], 'vector': vector}) + "\n")
+            for doc_id in removed:
+                f.write(json.dumps({'id': doc_id, 'removed': True}) + "\n")
+        self.log_entries += len(doc_ids) + len(removed)
+
+    def persist(self, path: str, doc_ids: List[str], removed: List[str]):
+        """Log a change, or write a new snapshot once the log outgrows the store
+
+        Logging keeps a single-entity edit O(1) on disk; compacting when the log is about as
+        long as the store keeps the amortized cost of snapshots low and loading fast.
+        """
+        if not doc_ids and not removed:
+            return
+        if self.log_entries + len(doc_ids) + len(removed) > max(Config.EMBEDDING_LOG_MIN_ENTRIES, len(self.ids)):
+            self.save(path)
+        else:
+            self.append_log(path, doc_ids, removed)
+
+    @classmethod
+    def load(cls, path: str, dim: int) -> 'EmbeddingStore':
+        """Load a persisted store and replay its change log, starting empty if the snapshot was
+        built with another dimension"""
+        store = cls(dim)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    matrix = data['matrix']
+                    if matrix.ndim != 2 or matrix.shape[1] != dim:
+                        return store
+                    store.upsert_many([str(i) for i in data['ids']], [str(h) for h in data['hashes']], matrix)
+            except Exception as e:
+                print(f"Error loading embeddings from {path}: {e}")
+        if os.path.exists(cls.log_path(path)):
+            try:
+                with open(cls.log_path(path), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # a write cut short by a crash; later lines cannot exist
+                        store.log_entries += 1
+                        if entry.get('removed'):
+                            store.remove(entry['id'])
+                            continue
+                        vector = np.frombuffer(base64.b64decode(entry['vector']), dtype=np.float32)
+                        if vector.size != dim:
+                            continue
+                        store.upsert_many([entry['id']], [entry['hash']], vector[np.newaxis, :])
+            except Exception as e:
+                print(f"Error replaying embedding log {cls.log_path(path)}: {e}")
+        return store
+
+class ScriptEmbeddingIndex:
+    """Per-script semantic index for scenes, characters, locations and chat messages
+
+    Each script is persisted as a snapshot (SCRIPT_FILE_PATH/embeddings/<script id>.npz) plus
+    an append-only log of the changes since, so saving one edited entity does not rewrite
+    the whole matrix.
+    """
+
+    def __init__(self, embedder: HashedNgramEmbedder = None, storage_dir: str = None):
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.storage_dir = storage_dir or os.path.join(Config.SCRIPT_FILE_PATH, "embeddings")
+        self.stores = {}  # script_id -> EmbeddingStore
+        self.lock = threading.Lock()
+
+    def store_path(self, script_id: str) -> str:
+        """Where a script's embeddings are persisted"""
+        return os.path.join(self.storage_dir, f"{script_id}.npz")
+
+    def get_store(self, script_id: str) -> EmbeddingStore:
+        """Get a script's store, loading it from disk on first use"""
+        if script_id not in self.stores:
+            self.stores[script_id] = EmbeddingStore.load(self.store_path(script_id), self.embedder.dim)
+        return self.stores[script_id]
+
+    def update_documents(self, script_id: str, documents: Dict[str, str], remove_missing_prefixes: Tuple[str, ...] = ()) -> int:
+        """Embed documents whose content changed (in one batch) and persist; returns how many were embedded"""
+        with self.lock:
+            store = self.get_store(script_id)
+            changed_ids, changed_hashes, changed_texts = [], [], []
+            for doc_id, text in documents.items():
+                text_hash = content_hash(text)
+                if store.get_hash(doc_id) != text_hash:
+                    changed_ids.append(doc_id)
+                    changed_hashes.append(text_hash)
+                    changed_texts.append(text)
+
+            stale = [doc_id for doc_id in store.ids
+                     if doc_id.startswith(remove_missing_prefixes) and doc_id not in documents] if remove_missing_prefixes else []
+            if changed_ids:
+                store.upsert_many(changed_ids, changed_hashes, self.embedder.embed_batch(changed_texts))
+            for doc_id in stale:
+                store.remove(doc_id)
+            store.persist(self.store_path(script_id), changed_ids, stale)
+            return len(changed_ids)
+
+    def on_script_change(self, username: str, script_id: str, data_type: str, entity_id: str, data: Optional[Dict]):
+        """ScriptAwareManager listener: re-embed or drop a single entity"""
+        if data_type not in ENTITY_KINDS or not script_id:
+            return
+        doc_id = f"{data_type}:{entity_id}"
+        if data is None:
+            with self.lock:
+                store = self.get_store(script_id)
+                if doc_id in store.rows:
+                    store.remove(doc_id)
+                    store.persist(self.store_path(script_id), [], [doc_id])
+        else:
+            self.update_documents(script_id, {doc_id: entity_text(data_type, data)})
+
+    def sync_script(self, script: Dict) -> int:
+        """Bring a whole script's entities up to date; unchanged entities are not re-embedded"""
+        documents = {}
+        for data_type in ENTITY_KINDS:
+            for entity_id, data in script.get(data_type, {}).items():
+                documents[f"{data_type}:{entity_id}"] = entity_text(data_type, data)
+        prefixes = tuple(f"{data_type}:" for data_type in ENTITY_KINDS)
+        return self.update_documents(script['id'], documents, prefixes)
+
+    def ensure_indexed(self, script: Dict) -> int:
+        """Build a script's index if it has never been built; after that, on_script_change keeps it current"""
+        with self.lock:
+            if script['id'] in self.stores or os.path.exists(self.store_path(script['id'])):
+                return 0
+        return self.sync_script(script)
+
+    def sync_chat(self, script_id: str, chat_key: str, messages: List[Dict]) -> int:
+        """Embed new chat messages of a conversation and drop the ones no longer in its history"""
+        documents = {f"chat:{chat_key}:{i}": message.get('content', '') for i, message in enumerate(messages)}
+        return self.update_documents(script_id, documents, (f"chat:{chat_key}:",))
+
+    def semantic_search(self, script_id: str, query: str, data_type: str = 'scenes', top_k: int = 5) -> List[Tuple[str, float]]:
+        """Find the entities of one kind closest in meaning to a free-text query"""
+        prefix = f"{data_type}:"
+        with self.lock:
+            results = self.get_store(script_id).search_batch(self.embedder.embed_batch([query]), top_k, prefix)[0]
+        return [(doc_id[len(prefix):], score) for doc_id, score in results]
+
+    def similar_scenes(self, script_id: str, scene_id: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Find the scenes most similar to a given scene"""
+        doc_id = f"scenes:{scene_id}"
+        with self.lock:
+            store = self.get_store(script_id)
+            vector = store.get_vector(doc_id)
+            if vector is None:
+                return []
+            results = store.search_batch(vector[np.newaxis, :], top_k + 1, 'scenes:')[0]
+        return [(other[len('scenes:'):], score) for other, score in results if other != doc_id][:top_k]
+
+    def search_user_scripts(self, script_ids: List[str], query: str, data_type: str = 'scenes', top_k: int = 10) -> List[Tuple[str, str, float]]:
+        """Semantic search across several scripts; returns (script_id, entity_id, score) triples"""
+        query_vector = self.embedder.embed_batch([query])
+        prefix = f"{data_type}:"
+        merged = []
+        with self.lock:
+            for script_id in script_ids:
+                for doc_id, score in self.get_store(script_id).search_batch(query_vector, top_k, prefix)[0]:
+                    merged.append((script_id, doc_id[len(prefix):], score))
+        merged.sort(key=lambda triple: -triple[2])
+        return merged[:top_k]
@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, List, Tuple
+from config import Config
+from batch_transform import scene_order
+from export_worker import ExportWorker, render_word
+from job_queue import JobQueue, PRIORITY_LOW
+from pagination import Paginator
+from screenplay_exporters import export_filename
+
+def archive_name(name: str, used: set) -> str:
+    """File name inside the bundle, made safe and unique"""
+    base = re.sub(r"[^\w\-]+", "_", name).strip("_") or "Untitled"
+    candidate, number = f"{base}.docx", 2
+    while candidate in used:
+        candidate, number = f"{base}_{number}.docx", number + 1
+    used.add(candidate)
+    return candidate
+
+class BundleExporter:
+    """Export many Word documents into one zip archive as a background job
+
+    Either every script of a user becomes one document, or every scene of one script its
+    own document. Documents are rendered by the ExportWorker process pool and written into
+    the archive as they complete. Only a bounded number of rendered documents wait in
+    memory at any time.
+    """
+
+    def __init__(self, job_queue: JobQueue, user_manager, word_exporter, export_worker: ExportWorker):
+        self.job_queue = job_queue
+        self.user_manager = user_manager
+        self.word_exporter = word_exporter
+        self.export_worker = export_worker
+        self.lock = threading.Lock()
+        self.progress = {}  # bundle id -> {'done', 'total'}
+        self.job_queue.register_handler('export_bundle', self.run_bundle_job)
+
+    def submit(self, username: str, mode: str = 'scripts', script_id: str = None) -> str:
+        """Queue a bundle of all scripts of a user (mode 'scripts') or all scenes of one script (mode 'scenes')"""
+        bundle_id = uuid.uuid4().hex[:12]
+        label = "Bundle: all scripts" if mode == 'scripts' else "Bundle: every scene"
+        return self.job_queue.submit(
+            'export_bundle',
+            {'bundle_id': bundle_id, 'username': username, 'mode': mode, 'script_id': script_id},
+            username,
+            label=label,
+            priority=PRIORITY_LOW,
+            metadata={'bundle_id': bundle_id}
+        )
+
+    def get_progress(self, job: Dict) -> Dict:
+        """Documents written and total documents of a bundle job"""
+        with self.lock:
+            return dict(self.progress.get(job['payload']['bundle_id'], {'done': 0, 'total': 0}))
+
+    def build_documents(self, payload: Dict) -> List[Tuple[str, tuple, str]]:
+        """(archive name, render_word arguments, worker affinity key) of every document in the bundle"""
+        username = payload['username']
+        used = set()
+        documents = []
+        if payload['mode'] == 'scripts':
+            for script in self.user_manager.get_user_scripts(username):
+                scenes = sorted(script.get('scenes', {}).values(), key=scene_order)
+                characters = list(script.get('characters', {}).values())
+                title = script.get('name') or "Screenplay"
+                scene_index = Paginator().paginate(script['id'], scenes)['scenes']
+                documents.append((archive_name(title, used), (scenes, characters, title, username, scene_index), script['id']))
+        else:
+            script = self.user_manager.get_script(username, payload['script_id'])
+            if not script:
+                raise ValueError("Script not found")
+            title = script.get('name') or "Screenplay"
+            for scene in sorted(script.get('scenes', {}).values(), key=scene_order):
+                name = f"Scene_{scene.get('scene_number', '')}_{scene.get('title', '')}"
+                scene_title = f"{title} - Scene {scene.get('scene_number', 'N/A')}"
+                documents.append((archive_name(name, used), ([scene], [], scene_title, username), None))
+        return documents
+
+    def run_bundle_job(self, payload: Dict) -> Dict:
+        documents = self.build_documents(payload)
+        bundle_id = payload['bundle_id']
+        with self.lock:
+            self.progress[bundle_id] = {'done': 0, 'total': len(documents)}
+
+        filename = export_filename("Bundle", "zip")
+        os.makedirs(Config.EXPORT_DIR, exist_ok=True)
+        filepath = os.path.join(Config.EXPORT_DIR, filename)
+        partial = f"{filepath}.part"
+        # Keep at most two documents per worker process in flight
+        in_flight = 2 * max(1, self.export_worker.processes)
+        try:
+            # .docx files are already compressed, so they are stored as-is
+            with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_STORED) as archive:
+                pending = {}
+                queued = iter(documents)
+                while True:
+                    while len(pending) < in_flight:
+                        document = next(queued, None)
+                        if document is None:
+                            break
+                        name, args, key = document
+                        pending[self.export_worker.run(render_word, *args, key=key)] = name
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        archive.writestr(pending.pop(future), future.result()[0])
+                        self.advance(bundle_id)
+            os.replace(partial, filepath)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+        self.word_exporter.cleanup_exports()
+        return {'path': filepath, 'filename': filename, 'count': len(documents)}
+
+    def advance(self, bundle_id: str):
+        with self.lock:
+            self.progress[bundle_id]['done'] += 1
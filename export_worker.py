@@ -0,0 +1,166 @@
+import multiprocessing
+import queue
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+# Set in every worker process by init_worker
+_process_exporter = None
+_progress_queue = None
+
+def init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+def get_process_exporter():
+    """WordExporter of the current process, created on first use so its template and
+    fragment cache are built once per process rather than once per document"""
+    global _process_exporter
+    if _process_exporter is None:
+        from word_exporter import WordExporter
+        _process_exporter = WordExporter()
+    return _process_exporter
+
+def render_word(scenes: List[Dict], characters: List[Dict], title: str, author: str,
+                scene_index: List[Dict] = None, handle: str = None) -> Tuple[bytes, str]:
+    """Render one Word document in a worker process; returns (file contents, file name)
+
+    With a handle, scene progress is reported back to the app process as (handle, done, total).
+    """
+    on_progress = None
+    if handle and _progress_queue is not None:
+        def on_progress(done, total):
+            # Report about every 5% so large scripts don't flood the queue
+            if done == total or done % max(1, total // 20) == 0:
+                _progress_queue.put((handle, done, total))
+    return get_process_exporter().render_scenes(scenes, characters, title, author, scene_index, on_progress)
+
+class ExportWorker:
+    """Render Word exports in worker processes
+
+    python-docx rendering is CPU-bound; in the Streamlit process it blocks the session that
+    started it and holds the GIL shared with every other session. Exports submitted here run
+    in separate processes, so concurrent exports from several sessions use several cores.
+    Each process keeps its own fragment cache, so exports with the same affinity key (e.g. a
+    script id) always go to the same process and re-exports of a script reuse its fragments.
+    submit() returns a handle for polling status and progress and collecting the result.
+    Finished results are kept for the EXPORT_RESULT_LIMIT most recent exports.
+    """
+
+    def __init__(self, processes: int = None):
+        self.processes = Config.EXPORT_PROCESSES if processes is None else processes
+        self.pools = {}  # slot -> single-process pool
+        self.next_slot = 0  # round robin for work without an affinity key
+        self.lock = threading.Lock()
+        self.exports = OrderedDict()  # handle -> {'future', 'label', 'done', 'total', 'submitted_at'}
+        self.progress_queue = None
+
+    def get_slot(self, key: str = None) -> int:
+        """Worker slot for an affinity key; work without a key is spread round robin"""
+        if key is not None:
+            return zlib.crc32(key.encode('utf-8')) % self.processes
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot = (slot + 1) % self.processes
+        return slot
+
+    def get_pool(self, slot: int) -> ProcessPoolExecutor:
+        """Single-process pool of a worker slot, started on first use"""
+        with self.lock:
+            if slot not in self.pools:
+                # Spawned workers do not inherit the Streamlit process's threads and locks
+                context = multiprocessing.get_context('spawn')
+                if self.progress_queue is None:
+                    self.progress_queue = context.Queue()
+                    threading.Thread(target=self.progress_loop, name="export-progress", daemon=True).start()
+                self.pools[slot] = ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                                       initializer=init_worker, initargs=(self.progress_queue,))
+            return self.pools[slot]
+
+    def run(self, fn, *args, key: str = None) -> Future:
+        """Run fn(*args) in the worker for key (or in this process when EXPORT_PROCESSES is 0)"""
+        if self.processes <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        slot = self.get_slot(key)
+        pool = self.get_pool(slot)
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # The worker died (e.g. out of memory); start a fresh one and try once more
+            self.reset_pool(slot, pool)
+            pool = self.get_pool(slot)
+            future = pool.submit(fn, *args)
+        future.add_done_callback(lambda done: self.reset_pool(slot, pool) if isinstance(done.exception(), BrokenProcessPool) else None)
+        return future
+
+    def reset_pool(self, slot: int, pool: ProcessPoolExecutor):
+        """Forget a broken worker so the next export in its slot starts a fresh one"""
+        with self.lock:
+            if self.pools.get(slot) is pool:
+                del self.pools[slot]
+
+    def progress_loop(self):
+        """Move progress reports from the worker processes onto the export handles"""
+        while True:
+            try:
+                handle, done, total = self.progress_queue.get()
+            except (EOFError, OSError, queue.Empty):
+                return
+            with self.lock:
+                export = self.exports.get(handle)
+                if export is not None:
+                    export['done'], export['total'] = done, total
+
+    def submit(self, scenes: List[Dict], characters: List[Dict], title: str = "Screenplay",
+               author: str = "Screenwriter", scene_index: List[Dict] = None, label: str = "", key: str = None) -> str:
+        """Start rendering a Word export and return its handle; key (e.g. the script id) picks the worker"""
+        handle = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.exports[handle] = {
+                'future': None, 'label': label or title, 'done': 0, 'total': len(scenes),
+                'submitted_at': datetime.now().isoformat()
+            }
+            while len(self.exports) > Config.EXPORT_RESULT_LIMIT:
+                self.exports.popitem(last=False)
+        future = self.run(render_word, scenes, characters, title, author, scene_index, handle, key=key)
+        with self.lock:
+            if handle in self.exports:
+                self.exports[handle]['future'] = future
+        return handle
+
+    def status(self, handle: str) -> Optional[Dict]:
+        """{'status', 'label', 'done', 'total', 'error'} of an export; status is running, done or failed
+
+        None once the export has been dropped to stay within EXPORT_RESULT_LIMIT (or was never submitted).
+        """
+        with self.lock:
+            export = self.exports.get(handle)
+            if export is None:
+                return None
+            export = dict(export)
+        future = export.pop('future')
+        status, error = 'running', None
+        if future is not None and future.done():
+            error = future.exception()
+            status = 'failed' if error else 'done'
+        return {'status': status, 'label': export['label'], 'done': export['done'], 'total': export['total'],
+                'error': str(error) if error else None}
+
+    def result(self, handle: str, timeout: float = None) -> Tuple[bytes, str]:
+        """(file contents, file name) of an export, waiting up to timeout seconds; raises if it failed"""
+        with self.lock:
+            export = self.exports.get(handle)
+        if export is None or export['future'] is None:
+            raise KeyError(f"Unknown export: {handle}")
+        return export['future'].result(timeout)
@@ -0,0 +1,39 @@
+from typing import Dict
+from job_queue import JobQueue
+from scene_patch import edit_scene
+
+# TextModifier methods the Text Tools panel may run in the background
+TEXT_TOOL_METHODS = {
+    'modify_tone', 'modify_setting', 'generate_dialogue', 'expand_scene', 'condense_scene',
+    'change_perspective', 'add_conflict', 'improve_dialogue', 'add_visual_elements',
+    'create_transition', 'fix_continuity_issues', 'enhance_character_development',
+    'modify_tone_variants', 'sample_tone_variants'
+}
+
+def check_llm_result(result):
+    """LLMClient reports failures as text; turn them into job failures
+    
+    Variant results (a list of {'label', 'text'}) only fail when every variant failed.
+    """
+    if isinstance(result, str) and result.startswith("Error generating"):
+        raise RuntimeError(result)
+    if isinstance(result, list) and result and all(variant['text'].startswith("Error generating") for variant in result):
+        raise RuntimeError(result[0]['text'])
+    return result
+
+def register_generation_handlers(job_queue: JobQueue, llm_client, text_modifier):
+    """Register the job kinds used by the Scene Generator and Text Tools"""
+
+    def run_prompt(payload: Dict) -> str:
+        if payload.get('edit_request'):
+            return check_llm_result(edit_scene(llm_client, payload['edit_request'], payload['scene_text'], payload['prompt']))
+        return check_llm_result(llm_client.generate_response(payload['prompt'], operation=payload.get('operation', 'generate')))
+
+    def run_text_tool(payload: Dict) -> str:
+        method = payload['method']
+        if method not in TEXT_TOOL_METHODS:
+            raise ValueError(f"Unknown text tool: {method}")
+        return check_llm_result(getattr(text_modifier, method)(*payload.get('args', [])))
+
+    job_queue.register_handler('scene_prompt', run_prompt)
+    job_queue.register_handler('text_tool', run_text_tool)
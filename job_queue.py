@@ -0,0 +1,195 @@
+import json
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from config import Config
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+class JobQueue:
+    """Persistent background job queue with a worker thread pool
+
+    Jobs are plain dicts stored in data/jobs.json, so they survive Streamlit reruns and
+    app restarts (jobs that were queued or running when the app stopped are re-queued).
+    Work is done by handlers registered per job kind.
+    """
+
+    def __init__(self, jobs_file: str = None, workers: int = None):
+        self.jobs_file = jobs_file or os.path.join("data", "jobs.json")
+        self.workers = workers or Config.JOB_WORKERS
+        self.handlers = {}  # kind -> (handler(payload) -> result, on_complete(job) or None)
+        self.lock = threading.RLock()
+        self.queue = queue.PriorityQueue()
+        self.sequence = 0  # FIFO tie-break within a priority
+        self.threads = []
+        self.jobs = self.load_jobs()
+
+    def load_jobs(self) -> Dict:
+        """Load jobs from JSON file"""
+        if os.path.exists(self.jobs_file):
+            try:
+                with open(self.jobs_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+            except Exception as e:
+                print(f"Error loading jobs: {e}")
+        return {}
+
+    def save_jobs(self):
+        """Save jobs to JSON file, keeping only the most recent finished jobs"""
+        with self.lock:
+            finished = sorted(
+                (job for job in self.jobs.values() if job['status'] in ('done', 'failed', 'cancelled')),
+                key=lambda job: job['created_at']
+            )
+            for job in finished[:max(0, len(finished) - Config.JOB_HISTORY_LIMIT)]:
+                del self.jobs[job['id']]
+            try:
+                os.makedirs(os.path.dirname(self.jobs_file) or '.', exist_ok=True)
+                tmp_file = f"{self.jobs_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.jobs, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, self.jobs_file)
+            except Exception as e:
+                print(f"Error saving jobs: {e}")
+
+    def register_handler(self, kind: str, handler: Callable[[Dict], object], on_complete: Callable[[Dict], None] = None):
+        """Register the function that runs jobs of a kind, and an optional callback for finished jobs"""
+        self.handlers[kind] = (handler, on_complete)
+
+    def start(self):
+        """Re-queue unfinished jobs from a previous run and start the workers (call after registering handlers)"""
+        with self.lock:
+            if self.threads:
+                return
+            for job in sorted(self.jobs.values(), key=lambda job: job['created_at']):
+                if job['status'] in ('queued', 'running'):
+                    job['status'] = 'queued'
+                    self.enqueue(job)
+            for i in range(self.workers):
+                thread = threading.Thread(target=self.worker_loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def enqueue(self, job: Dict):
+        with self.lock:
+            self.sequence += 1
+            self.queue.put((job['priority'], self.sequence, job['id']))
+
+    def submit(self, kind: str, payload: Dict, username: str, label: str = "", priority: int = PRIORITY_NORMAL,
+               dedupe_key: str = None, metadata: Dict = None) -> str:
+        """Submit a job and return its id
+
+        With a dedupe_key, an identical job that is still queued or running is reused
+        instead of adding a second one.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+
+        with self.lock:
+            if dedupe_key:
+                for job in self.jobs.values():
+                    if job.get('dedupe_key') == dedupe_key and job['status'] in ('queued', 'running'):
+                        return job['id']
+
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'kind': kind,
+                'label': label or kind,
+                'username': username,
+                'payload': payload,
+                'metadata': metadata or {},
+                'priority': priority,
+                'dedupe_key': dedupe_key,
+                'status': 'queued',
+                'result': None,
+                'error': None,
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self.jobs[job['id']] = job
+            self.save_jobs()
+            self.enqueue(job)
+        return job['id']
+
+    def worker_loop(self):
+        """Take jobs off the queue, highest priority first, and run them"""
+        while True:
+            _, _, job_id = self.queue.get()
+            try:
+                self.run_job(job_id)
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def run_job(self, job_id: str):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] != 'queued':
+                return  # cancelled or already handled
+            handler, on_complete = self.handlers.get(job['kind'], (None, None))
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+            self.save_jobs()
+
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job['kind']}")
+            result = handler(job['payload'])
+            with self.lock:
+                job['status'] = 'done'
+                job['result'] = result
+        except Exception as e:
+            with self.lock:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+
+        with self.lock:
+            job['finished_at'] = datetime.now().isoformat()
+            self.save_jobs()
+
+        if on_complete and job['status'] == 'done':
+            try:
+                on_complete(job)
+            except Exception as e:
+                print(f"Error in completion callback for job {job_id}: {e}")
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job by id"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, username: str, kinds: List[str] = None, limit: int = 20) -> List[Dict]:
+        """Most recent jobs of a user, newest first"""
+        with self.lock:
+            jobs = [dict(job) for job in self.jobs.values()
+                    if job['username'] == username and (not kinds or job['kind'] in kinds)]
+        jobs.sort(key=lambda job: job['created_at'], reverse=True)
+        return jobs[:limit]
+
+    def update_job(self, job_id: str, **fields):
+        """Update bookkeeping fields of a job (e.g. mark a result as applied)"""
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+                self.save_jobs()
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] != 'queued':
+                return False
+            job['status'] = 'cancelled'
+            job['finished_at'] = datetime.now().isoformat()
+            self.save_jobs()
+            return True
@@ -0,0 +1,306 @@
+import datetime
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+import google.generativeai as genai
+from config import Config
+
+class LLMBackend:
+    """Interface for text generation backends used by LLMClient"""
+
+    name = "base"
+    # Whether the backend can store a prompt prefix server-side and reference it on later calls
+    supports_cached_content = False
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int, model: str = None) -> str:
+        """Generate text for a complete prompt (model defaults to the backend's own)"""
+        raise NotImplementedError
+
+    def create_cached_prefix(self, prefix: str, ttl_seconds: int, model: str = None) -> str:
+        """Register a prompt prefix for a model with the backend and return a handle for it"""
+        raise NotImplementedError
+
+    def generate_with_cached_prefix(self, handle: str, suffix: str, temperature: float, max_output_tokens: int) -> str:
+        """Generate text for a registered prefix followed by a suffix"""
+        raise NotImplementedError
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google.generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = None):
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        self.model_name = model_name or Config.MODEL_NAME
+        self.models = {self.model_name: genai.GenerativeModel(self.model_name)}
+        self.cached_models = {}  # handle -> GenerativeModel bound to cached content
+        # Context caching is only available in newer google-generativeai releases
+        self.supports_cached_content = hasattr(genai, 'caching')
+
+    def get_model(self, model: str = None):
+        """GenerativeModel for a model name, created on first use"""
+        model = model or self.model_name
+        if model not in self.models:
+            self.models[model] = genai.GenerativeModel(model)
+        return self.models[model]
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int, model: str = None) -> str:
+        response = self.get_model(model).generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_output_tokens
+            )
+        )
+        return response.text
+
+    def create_cached_prefix(self, prefix: str, ttl_seconds: int, model: str = None) -> str:
+        cached_content = genai.caching.CachedContent.create(
+            model=f"models/{model or self.model_name}",
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl_seconds)
+        )
+        self.cached_models[cached_content.name] = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        return cached_content.name
+
+    def generate_with_cached_prefix(self, handle: str, suffix: str, temperature: float, max_output_tokens: int) -> str:
+        model = self.cached_models.get(handle)
+        if model is None:
+            raise KeyError(f"Unknown cached content: {handle}")
+        response = model.generate_content(
+            suffix,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_output_tokens
+            )
+        )
+        return response.text
+
+class SimulatedBackendError(Exception):
+    """Error injected by the simulator to mimic backend failures"""
+
+SIMULATED_ERRORS = [
+    "429 Resource has been exhausted (simulated)",
+    "503 The model is overloaded (simulated)",
+    "500 Internal error encountered (simulated)"
+]
+
+SIMULATOR_VOCABULARY = (
+    "the scene opens on a quiet street as rain falls she turns toward the door he hesitates "
+    "then steps inside lights flicker across the room a phone rings somewhere distant they "
+    "exchange a look nobody speaks the camera lingers on her hands tension builds slowly "
+    "outside sirens wail he smiles but his eyes stay cold"
+).split()
+
+class SimulatorBackend(LLMBackend):
+    """Offline backend with deterministic responses, configurable latency, token rate and error injection
+    
+    Every random choice is seeded from the simulator seed, the prompt and how many times that
+    prompt has been seen, so repeated runs produce the same responses, delays and failures.
+    """
+
+    name = "simulator"
+    supports_cached_content = True
+
+    def __init__(self, latency_distribution: str = None, latency_mean: float = None, latency_stddev: float = None,
+                 tokens_per_second: float = None, error_rate: float = None, seed: int = None, sleep: bool = True):
+        self.latency_distribution = latency_distribution or Config.SIM_LATENCY_DISTRIBUTION
+        self.latency_mean = latency_mean if latency_mean is not None else Config.SIM_LATENCY_MEAN
+        self.latency_stddev = latency_stddev if latency_stddev is not None else Config.SIM_LATENCY_STDDEV
+        self.tokens_per_second = tokens_per_second if tokens_per_second is not None else Config.SIM_TOKENS_PER_SECOND
+        self.error_rate = error_rate if error_rate is not None else Config.SIM_ERROR_RATE
+        self.seed = seed if seed is not None else Config.SIM_SEED
+        # Benchmarks of pure overhead can disable sleeping and read the simulated time from stats
+        self.sleep = sleep
+        self.cached_prefixes = {}  # handle -> prefix text
+        self.seen = {}  # prompt digest -> number of calls so far
+        self.lock = threading.Lock()
+        self.stats = {'calls': 0, 'errors': 0, 'prompt_chars': 0, 'cached_prefix_chars': 0,
+                      'prefixes_registered': 0, 'output_tokens': 0, 'simulated_seconds': 0.0,
+                      'calls_by_model': {}}
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Time to first token, drawn from the configured distribution"""
+        mean, stddev = self.latency_mean, self.latency_stddev
+        if self.latency_distribution == "fixed":
+            return mean
+        if self.latency_distribution == "uniform":
+            return rng.uniform(max(0.0, mean - stddev), mean + stddev)
+        if self.latency_distribution == "normal":
+            return max(0.0, rng.gauss(mean, stddev))
+        if self.latency_distribution == "lognormal":
+            # Parameterized by the mean and standard deviation of the resulting distribution
+            if mean <= 0:
+                return 0.0
+            sigma_squared = math.log(1 + (stddev / mean) ** 2)
+            return rng.lognormvariate(math.log(mean) - sigma_squared / 2, math.sqrt(sigma_squared))
+        raise ValueError(f"Unknown latency distribution: {self.latency_distribution}")
+
+    def respond(self, prompt: str, max_output_tokens: int) -> str:
+        """Deterministic response derived from the prompt; simulates latency and injected errors"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        with self.lock:
+            occurrence = self.seen.get(digest, 0)
+            self.seen[digest] = occurrence + 1
+        rng = random.Random(f"{self.seed}:{digest}:{occurrence}")
+        content_rng = random.Random(f"{self.seed}:{digest}")
+
+        delay = self.sample_latency(rng)
+        if rng.random() < self.error_rate:
+            with self.lock:
+                self.stats['errors'] += 1
+                self.stats['simulated_seconds'] += delay
+            if self.sleep:
+                time.sleep(delay)
+            raise SimulatedBackendError(rng.choice(SIMULATED_ERRORS))
+
+        # Same prompt, same answer: content does not depend on the occurrence
+        output_tokens = max(1, int(max_output_tokens * content_rng.uniform(0.3, 0.9)))
+        words = [content_rng.choice(SIMULATOR_VOCABULARY) for _ in range(max(1, int(output_tokens * 0.75)))]
+        response = f"[simulated:{digest[:12]}] " + ' '.join(words)
+
+        if self.tokens_per_second > 0:
+            delay += output_tokens / self.tokens_per_second
+        with self.lock:
+            self.stats['output_tokens'] += output_tokens
+            self.stats['simulated_seconds'] += delay
+        if self.sleep:
+            time.sleep(delay)
+        return response
+
+    def count_call(self, model: str = None):
+        model = model or Config.MODEL_NAME
+        self.stats['calls'] += 1
+        self.stats['calls_by_model'][model] = self.stats['calls_by_model'].get(model, 0) + 1
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int, model: str = None) -> str:
+        with self.lock:
+            self.count_call(model)
+            self.stats['prompt_chars'] += len(prompt)
+        return self.respond(prompt, max_output_tokens)
+
+    def create_cached_prefix(self, prefix: str, ttl_seconds: int, model: str = None) -> str:
+        # Cached content is bound to a model, like on the real API
+        handle = f"cachedContents/{hashlib.sha256(f'{model}|{prefix}'.encode('utf-8')).hexdigest()[:16]}"
+        with self.lock:
+            self.cached_prefixes[handle] = (prefix, model)
+            self.stats['prefixes_registered'] += 1
+        return handle
+
+    def generate_with_cached_prefix(self, handle: str, suffix: str, temperature: float, max_output_tokens: int) -> str:
+        if handle not in self.cached_prefixes:
+            raise KeyError(f"Unknown cached content: {handle}")
+        prefix, model = self.cached_prefixes[handle]
+        with self.lock:
+            self.count_call(model)
+            self.stats['prompt_chars'] += len(suffix)
+            self.stats['cached_prefix_chars'] += len(prefix)
+        # Same answer as the uncached call so both paths are interchangeable
+        return self.respond(f"{prefix}\n\n{suffix}", max_output_tokens)
+
+class CassetteBackend(LLMBackend):
+    """Record responses of another backend to a JSON cassette, or replay them offline
+    
+    In record mode every call goes to the inner backend and the response is stored under a
+    hash of the request. In replay mode responses come from the cassette; a request that was
+    never recorded raises KeyError so missing coverage is visible.
+    """
+
+    name = "cassette"
+
+    def __init__(self, path: str, mode: str = "replay", inner: LLMBackend = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording a cassette needs an inner backend")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.lock = threading.Lock()
+        self.entries = self.load()
+        # Cached prefixes are resolved locally so replayed prompts match recorded ones
+        self.supports_cached_content = True
+        self.cached_prefixes = {}
+
+    def load(self) -> Dict:
+        """Load recorded entries from the cassette file"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error loading cassette {self.path}: {e}")
+        return {}
+
+    def save(self):
+        """Write recorded entries to the cassette file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+
+    @staticmethod
+    def request_key(prompt: str, temperature: float, max_output_tokens: int, model: str = None) -> str:
+        """Key identifying a request in the cassette"""
+        request = f"{temperature}|{max_output_tokens}|{prompt}"
+        if model:
+            request = f"{model}|{request}"
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int, model: str = None) -> str:
+        key = self.request_key(prompt, temperature, max_output_tokens, model)
+        if self.mode == "replay":
+            entry = self.entries.get(key)
+            if entry is None:
+                raise KeyError(f"Request not recorded in cassette {self.path}")
+            return entry['response']
+
+        response = self.inner.generate(prompt, temperature, max_output_tokens, model)
+        with self.lock:
+            self.entries[key] = {
+                'model': model,
+                'prompt': prompt,
+                'temperature': temperature,
+                'max_output_tokens': max_output_tokens,
+                'response': response
+            }
+            self.save()
+        return response
+
+    def create_cached_prefix(self, prefix: str, ttl_seconds: int, model: str = None) -> str:
+        handle = f"cassette/{hashlib.sha256(f'{model}|{prefix}'.encode('utf-8')).hexdigest()[:16]}"
+        self.cached_prefixes[handle] = (prefix, model)
+        return handle
+
+    def generate_with_cached_prefix(self, handle: str, suffix: str, temperature: float, max_output_tokens: int) -> str:
+        if handle not in self.cached_prefixes:
+            raise KeyError(f"Unknown cached content: {handle}")
+        prefix, model = self.cached_prefixes[handle]
+        return self.generate(f"{prefix}\n\n{suffix}", temperature, max_output_tokens, model)
+
+def create_backend(name: str = None) -> LLMBackend:
+    """Create the backend selected by name (defaults to Config.LLM_BACKEND)
+    
+    When Config.LLM_CASSETTE_MODE is 'record' or 'replay', the backend is wrapped in a
+    CassetteBackend using Config.LLM_CASSETTE_PATH.
+    """
+    name = (name or Config.LLM_BACKEND).lower()
+    if Config.LLM_CASSETTE_MODE == "replay":
+        return CassetteBackend(Config.LLM_CASSETTE_PATH, "replay")
+
+    if name == "simulator":
+        backend = SimulatorBackend()
+    elif name == "gemini":
+        backend = GeminiBackend()
+    else:
+        raise ValueError(f"Unknown LLM backend: {name}")
+
+    if Config.LLM_CASSETTE_MODE == "record":
+        return CassetteBackend(Config.LLM_CASSETTE_PATH, "record", inner=backend)
+    return backend
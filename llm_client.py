@@ -1,59 +1,132 @@
-import google.generativeai as genai
-import json
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from config import Config
+from llm_backends import LLMBackend, create_backend
+from model_router import ModelRouter
+from prompt_cache import PromptPrefixCache
+from single_flight import SingleFlight
+
+SYSTEM_PROMPT = "You are an expert screenwriting assistant. Help filmmakers with script development, character development, scene writing, and story structure."
+
+CHAT_SYSTEM_PROMPT = """
+You are an expert screenwriting assistant with full knowledge of the filmmaker's script. Use the context below to provide personalized, relevant advice.
+
+IMPORTANT: Keep your responses short and concise (2-3 sentences maximum). Only answer if the user is asking a question.
+"""
 
 class LLMClient:
-    def __init__(self):
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(Config.MODEL_NAME)
+    def __init__(self, backend: LLMBackend = None, router: ModelRouter = None):
+        self.backend = backend or create_backend()
+        self.router = router or ModelRouter()
         self.temperature = Config.TEMPERATURE
         self.max_tokens = Config.MAX_TOKENS
+        self.prefix_cache = PromptPrefixCache()
+        self.single_flight = SingleFlight()
+    
+    def get_metrics(self) -> Dict:
+        """Request coalescing, prefix cache and model routing counters"""
+        return {
+            'single_flight': self.single_flight.get_stats(),
+            'prefix_cache': self.prefix_cache.get_stats(),
+            'router': self.router.get_stats()
+        }
     
-    def generate_response(self, prompt: str, context: str = "") -> str:
+    def generate_with_prefix(self, prefix: str, suffix: str, max_output_tokens: int = None, operation: str = "generate") -> str:
+        """Generate from a stable prefix plus a per-call suffix, reusing backend cached content when possible
+        
+        The operation class (chat, summarize, analyze, rewrite, generate) selects the models and
+        output token cap via the router. Identical requests already in flight (e.g. several
+        sessions analyzing the same shared scene, or a double click) are not sent again:
+        callers wait for and share the first result.
+        """
+        models, route_max_tokens = self.router.route(operation)
+        max_output_tokens = max_output_tokens or route_max_tokens
+        key = hashlib.sha256(f"{operation}|{self.temperature}|{max_output_tokens}|{prefix}\x00{suffix}".encode('utf-8')).hexdigest()
+        return self.single_flight.do(key, lambda: self.send_routed(operation, models, prefix, suffix, max_output_tokens))
+    
+    def send_routed(self, operation: str, models: List[str], prefix: str, suffix: str, max_output_tokens: int) -> str:
+        """Try the routed models in order of preference, reporting each call's latency to the router"""
+        last_error = None
+        for model in models:
+            started = time.perf_counter()
+            try:
+                response = self.send(prefix, suffix, max_output_tokens, model)
+            except Exception as e:
+                self.router.record(operation, model, time.perf_counter() - started, ok=False)
+                print(f"Model {model} failed for {operation}: {e}")
+                last_error = e
+                continue
+            self.router.record(operation, model, time.perf_counter() - started)
+            return response
+        raise last_error
+    
+    def send(self, prefix: str, suffix: str, max_output_tokens: int, model: str = None) -> str:
+        """Send one request to the backend, through cached content when available"""
+        handle = self.prefix_cache.get_handle(self.backend, prefix, model)
+        if handle:
+            try:
+                return self.backend.generate_with_cached_prefix(handle, suffix, self.temperature, max_output_tokens)
+            except Exception as e:
+                print(f"Cached prefix call failed, retrying with full prompt: {e}")
+                self.prefix_cache.invalidate(prefix, model)
+        return self.backend.generate(f"{prefix}\n\n{suffix}", self.temperature, max_output_tokens, model)
+    
+    def generate_response(self, prompt: str, context: str = "", operation: str = "generate") -> str:
         """Generate response from Gemini with context"""
         try:
-            full_prompt = f"{context}\n\n{prompt}" if context else prompt
-            
-            # Add system prompt for screenwriting expertise
-            system_prompt = "You are an expert screenwriting assistant. Help filmmakers with script development, character development, scene writing, and story structure."
-            full_prompt = f"{system_prompt}\n\n{full_prompt}"
-            
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=self.temperature,
-                    max_output_tokens=self.max_tokens
-                )
-            )
-            return response.text
+            # System prompt for screenwriting expertise plus any shared context form the reusable prefix
+            prefix = f"{SYSTEM_PROMPT}\n\n{context}" if context else SYSTEM_PROMPT
+            return self.generate_with_prefix(prefix, prompt, operation=operation)
         except Exception as e:
             return f"Error generating response: {str(e)}"
     
-    def chat_with_context(self, user_message: str, context: str) -> str:
-        """Chat with full context from characters, scenes, and chat history"""
+    def generate_batch(self, prompts: List[str], context: str = "", operation: str = "generate") -> List[str]:
+        """Generate responses for several prompts in one parallel batch, in prompt order
+        
+        All prompts share the same prefix, so the round-trip costs about as much as the
+        slowest single call instead of the sum of all of them.
+        """
+        if len(prompts) <= 1:
+            return [self.generate_response(prompt, context, operation) for prompt in prompts]
+        with ThreadPoolExecutor(max_workers=min(len(prompts), Config.VARIANT_MAX_PARALLEL)) as executor:
+            return list(executor.map(lambda prompt: self.generate_response(prompt, context, operation), prompts))
+    
+    def generate_variants(self, prompt: str, count: int, context: str = "", operation: str = "generate") -> List[str]:
+        """Generate several distinct candidates for one prompt
+        
+        Each candidate is numbered in its prompt so identical requests are neither
+        coalesced nor answered identically.
+        """
+        prompts = [f"{prompt}\n\nThis is alternative {i} of {count}; take a different approach from the other alternatives."
+                   for i in range(1, count + 1)]
+        return self.generate_batch(prompts, context, operation)
+    
+    def build_chat_prefix(self, script_context: str) -> str:
+        """Render the stable part of a chat prompt: instructions plus script-level context"""
+        return f"{CHAT_SYSTEM_PROMPT}\nCONTEXT:\n{script_context}"
+    
+    def chat_with_context(self, user_message: str, context: str, script_context: str = None) -> str:
+        """Chat with full context from characters, scenes, and chat history
+        
+        script_context is the part of the context that only changes with the script version
+        (see ChatManager.get_script_overview); it forms a cacheable prompt prefix, while
+        context carries the per-message details.
+        """
         try:
-            full_prompt = f"""
-You are an expert screenwriting assistant with full knowledge of the filmmaker's script. Use the context below to provide personalized, relevant advice.
-
-IMPORTANT: Keep your responses short and concise (2-3 sentences maximum). Only answer if the user is asking a question.
-
-CONTEXT:
-{context}
-
-USER MESSAGE: {user_message}
+            if script_context is None:
+                prefix = self.build_chat_prefix(context)
+                details = ""
+            else:
+                prefix = self.build_chat_prefix(script_context)
+                details = f"RELEVANT DETAILS:\n{context}\n\n"
+            suffix = f"""{details}USER MESSAGE: {user_message}
 
 Please respond as a helpful screenwriting assistant, referencing specific characters, scenes, and previous conversation when relevant. Be conversational but professional. Keep answers brief and to the point.
 """
-            
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=self.temperature,
-                    max_output_tokens=150  # Reduced for shorter responses
-                )
-            )
-            return response.text
+            # The chat route has a reduced output budget for shorter responses
+            return self.generate_with_prefix(prefix, suffix, operation="chat")
         except Exception as e:
             return f"Error generating chat response: {str(e)}"
     
@@ -75,11 +148,12 @@ Please respond as a helpful screenwriting assistant, referencing specific charac
         3. Potential conflicts and obstacles
         4. Character development opportunities
         """
-        return self.generate_response(prompt)
+        return self.generate_response(prompt, operation="analyze")
     
-    def modify_text_tone(self, text: str, new_tone: str) -> str:
-        """Modify text to match a specific tone"""
-        prompt = f"""
+    @staticmethod
+    def build_tone_prompt(text: str, new_tone: str) -> str:
+        """Build the prompt that rewrites text in a given tone"""
+        return f"""
         Rewrite the following text to match the tone: {new_tone}
         
         Original text:
@@ -87,7 +161,14 @@ Please respond as a helpful screenwriting assistant, referencing specific charac
         
         Please maintain the same meaning and structure while changing the tone to {new_tone}.
         """
-        return self.generate_response(prompt)
+    
+    def modify_text_tone(self, text: str, new_tone: str) -> str:
+        """Modify text to match a specific tone"""
+        return self.generate_response(self.build_tone_prompt(text, new_tone), operation="rewrite")
+    
+    def modify_text_tone_variants(self, text: str, tones: List[str]) -> List[str]:
+        """Rewrite text in several tones at once, one result per tone"""
+        return self.generate_batch([self.build_tone_prompt(text, tone) for tone in tones], operation="rewrite")
     
     def modify_setting(self, scene_text: str, new_setting: str) -> str:
         """Modify scene to fit a new setting"""
@@ -99,7 +180,7 @@ Please respond as a helpful screenwriting assistant, referencing specific charac
         
         Please rewrite the scene to fit the new setting while maintaining the core action and dialogue.
         """
-        return self.generate_response(prompt)
+        return self.generate_response(prompt, operation="rewrite")
     
     def generate_dialogue(self, character_name: str, context: str, emotion: str = "neutral") -> str:
         """Generate dialogue for a character"""
@@ -111,7 +192,7 @@ Please respond as a helpful screenwriting assistant, referencing specific charac
         
         Please write natural, character-appropriate dialogue that fits the context and emotion.
         """
-        return self.generate_response(prompt)
+        return self.generate_response(prompt, operation="generate")
     
     def analyze_scene(self, scene_data: Dict) -> str:
         """Analyze scene and provide improvement suggestions"""
@@ -140,4 +221,4 @@ Please respond as a helpful screenwriting assistant, referencing specific charac
         7. Tone and mood consistency
         8. Goal and conflict clarity
         """
-        return self.generate_response(prompt) 
\ No newline at end of file
+        return self.generate_response(prompt, operation="analyze") 
\ No newline at end of file
@@ -0,0 +1,86 @@
+import threading
+from typing import Dict, List, Tuple
+from config import Config
+
+OPERATIONS = ('chat', 'summarize', 'analyze', 'rewrite', 'generate')
+# Every this many calls of an operation the least used model goes first, so a model that
+# was slow or failing once can win traffic back
+PROBE_INTERVAL = 20
+
+class ModelRouter:
+    """Pick a model and output token cap per operation class (chat, summarize, analyze, rewrite, generate)
+
+    Each operation lists one or more models of the same quality tier. Observed latency
+    (an exponentially weighted moving average per operation and model) decides which of
+    them is tried first, so traffic shifts to whichever is currently faster; the others
+    remain fallbacks when a call fails.
+    """
+
+    def __init__(self, routes: Dict = None, alpha: float = None, min_samples: int = None):
+        self.routes = {}
+        for operation, route in (routes or Config.MODEL_ROUTES).items():
+            models = route['models']
+            if isinstance(models, str):
+                models = [model.strip() for model in models.split(',') if model.strip()]
+            self.routes[operation] = {'models': models or [Config.MODEL_NAME],
+                                      'max_output_tokens': int(route['max_output_tokens'])}
+        self.alpha = alpha if alpha is not None else Config.ROUTER_EWMA_ALPHA
+        self.min_samples = min_samples if min_samples is not None else Config.ROUTER_MIN_SAMPLES
+        self.lock = threading.Lock()
+        self.stats = {}  # operation -> model -> {'calls', 'errors', 'ewma_seconds'}
+        self.routed = {}  # operation -> number of route() calls
+
+    def get_route(self, operation: str) -> Dict:
+        """Route for an operation; unknown operations use the 'generate' route"""
+        route = self.routes.get(operation) or self.routes.get('generate')
+        if route is None:
+            return {'models': [Config.MODEL_NAME], 'max_output_tokens': Config.MAX_TOKENS}
+        return route
+
+    def model_stats(self, operation: str, model: str) -> Dict:
+        return self.stats.setdefault(operation, {}).setdefault(
+            model, {'calls': 0, 'errors': 0, 'ewma_seconds': None})
+
+    def route(self, operation: str) -> Tuple[List[str], int]:
+        """Models to try for an operation, preferred first, and the output token cap
+
+        Models with fewer than min_samples calls go first so every candidate gets measured;
+        after that the lowest average latency wins, except for a periodic probe of the least
+        used model. Ties keep the configured order.
+        """
+        route = self.get_route(operation)
+        models = route['models']
+        with self.lock:
+            def preference(indexed):
+                index, model = indexed
+                stats = self.model_stats(operation, model)
+                # Unmeasured models are explored first even when min_samples is 0
+                if stats['calls'] < self.min_samples or stats['ewma_seconds'] is None:
+                    return (0, stats['calls'], index)
+                return (1, stats['ewma_seconds'], index)
+            ordered = [model for _, model in sorted(enumerate(models), key=preference)]
+            self.routed[operation] = self.routed.get(operation, 0) + 1
+            if len(ordered) > 1 and self.routed[operation] % PROBE_INTERVAL == 0:
+                probe = min(ordered, key=lambda model: self.model_stats(operation, model)['calls'])
+                ordered.remove(probe)
+                ordered.insert(0, probe)
+        return ordered, route['max_output_tokens']
+
+    def record(self, operation: str, model: str, seconds: float, ok: bool = True):
+        """Feed back the latency of a call; a failed call counts as twice the slower of its time and the average"""
+        with self.lock:
+            stats = self.model_stats(operation, model)
+            stats['calls'] += 1
+            if not ok:
+                stats['errors'] += 1
+                seconds = 2 * max(seconds, stats['ewma_seconds'] or 0.0)
+            if stats['ewma_seconds'] is None:
+                stats['ewma_seconds'] = seconds
+            else:
+                stats['ewma_seconds'] += self.alpha * (seconds - stats['ewma_seconds'])
+
+    def get_stats(self) -> Dict:
+        """Calls, errors and average latency per operation and model"""
+        with self.lock:
+            return {operation: {model: dict(stats) for model, stats in models.items()}
+                    for operation, models in self.stats.items()}
@@ -0,0 +1,161 @@
+import hashlib
+import textwrap
+import threading
+from typing import Dict, List, Tuple
+from config import Config
+from screenplay_exporters import scene_heading
+from screenplay_parser import parse_scene
+
+# Standard Courier 12pt layout (10 characters per inch): element -> (line width in characters,
+# blank lines before it). Synopses and notes are not printed.
+ELEMENT_LAYOUT = {
+    'heading': (60, 2),
+    'action': (60, 1),
+    'character': (38, 1),
+    'parenthetical': (25, 0),
+    'dialogue': (35, 0),
+    'transition': (20, 1)
+}
+# Elements that must not end a page: they move to the next page with the start of what follows
+KEEP_WITH_NEXT = ('heading', 'character', 'parenthetical')
+# Fewest lines of a split action or dialogue block left on either page
+MIN_SPLIT_LINES = 2
+
+# A position is (page, lines used on that page)
+Position = Tuple[int, int]
+
+def wrap_element(element_type: str, text: str) -> List[str]:
+    """Lines an element occupies at its standard width"""
+    width = ELEMENT_LAYOUT[element_type][0]
+    lines = []
+    for line in text.split('\n'):
+        lines.extend(textwrap.wrap(line, width) or [''])
+    return lines
+
+def scene_blocks(scene_data: Dict) -> List[Tuple[str, int]]:
+    """(element type, line count) of every printed element of a scene, heading first"""
+    heading, _ = scene_heading(scene_data)
+    blocks = [('heading', len(wrap_element('heading', heading)))]
+    for element_type, text in parse_scene(scene_data.get('action', '') or ''):
+        if element_type in ELEMENT_LAYOUT:
+            blocks.append((element_type, len(wrap_element(element_type, text))))
+    return blocks
+
+def layout_scene(blocks: List[Tuple[str, int]], start: Position, lines_per_page: int) -> Tuple[int, Position]:
+    """Place a scene's blocks from a position; return the page its heading lands on and the position after it
+
+    Page breaking follows the usual screenplay rules: headings, cues and parentheticals are
+    kept with the line after them, action splits between lines when at least MIN_SPLIT_LINES
+    stay on each page, and split dialogue adds (MORE) at the bottom and a CHARACTER (CONT'D)
+    cue at the top of the next page.
+    """
+    page, line = start
+    first_page = None
+    for index, (element_type, count) in enumerate(blocks):
+        spacing = ELEMENT_LAYOUT[element_type][1] if line else 0
+        needed = spacing + count
+        if element_type in KEEP_WITH_NEXT and index + 1 < len(blocks):
+            next_type = blocks[index + 1][0]
+            needed += ELEMENT_LAYOUT[next_type][1] + 1
+        if line + needed <= lines_per_page:
+            first_page = first_page or page
+            line += spacing + count
+            continue
+
+        available = lines_per_page - line - spacing
+        first_page = first_page or (page if element_type in ('action', 'dialogue') else page + 1)
+        if element_type == 'action' and available >= MIN_SPLIT_LINES and count - available >= MIN_SPLIT_LINES:
+            remaining = count - available
+        elif element_type == 'dialogue' and available - 1 >= MIN_SPLIT_LINES and count - (available - 1) >= MIN_SPLIT_LINES:
+            # (MORE) takes the last line here; the repeated cue the first line there
+            remaining = 1 + count - (available - 1)
+        else:
+            remaining = count
+        page += 1
+        # A block longer than a page keeps breaking until the rest fits
+        while remaining > lines_per_page:
+            if element_type == 'dialogue':
+                remaining -= lines_per_page - 2  # (MORE) at the bottom, (CONT'D) cue on the next page
+            else:
+                remaining -= lines_per_page
+            page += 1
+        line = remaining
+    return first_page or page, (page, line)
+
+def format_eighths(eighths: int) -> str:
+    """Scene length the way schedules write it, e.g. 1 3/8"""
+    pages, rest = divmod(eighths, 8)
+    if not rest:
+        return str(pages)
+    fraction = f"{rest // 4}/2" if rest % 4 == 0 else f"{rest // 2}/4" if rest % 2 == 0 else f"{rest}/8"
+    return f"{pages} {fraction}" if pages else fraction
+
+class Paginator:
+    """Page counts and page-start positions of scenes, updated incrementally
+
+    The last pagination of each script is kept as one entry per scene: its content key and
+    its start and end positions. Re-paginating lays out only the scenes from the first changed
+    one onward, and of those only scenes that changed or now start at a different position:
+    once an unchanged scene starts where it did before, it and everything after it are reused.
+    """
+
+    def __init__(self, lines_per_page: int = None):
+        self.lines_per_page = lines_per_page or Config.PAGE_LINES
+        self.lock = threading.Lock()
+        self.runs = {}  # script id -> list of {'key', 'start', 'page', 'end'}
+        self.stats = {'laid_out': 0, 'reused': 0}
+
+    @staticmethod
+    def scene_key(scene_data: Dict) -> str:
+        heading, _ = scene_heading(scene_data)
+        return hashlib.sha1(f"{heading}\x00{scene_data.get('action', '') or ''}".encode('utf-8')).hexdigest()
+
+    def paginate(self, script_id: str, scenes: List[Dict]) -> Dict:
+        """Paginate scenes in script order (e.g. ScriptAwareManager.get_scene_sequence)
+
+        Returns {'pages': page count, 'scenes': [{'scene_id', 'scene_number', 'heading',
+        'page', 'eighths', 'length'}]} where page is the page the scene starts on and
+        eighths its length in eighths of a page.
+        """
+        keys = [self.scene_key(scene) for scene in scenes]
+        with self.lock:
+            previous = self.runs.get(script_id, [])
+
+        entries = []
+        position = (1, 0)
+        laid_out = 0
+        for index, (scene, key) in enumerate(zip(scenes, keys)):
+            old = previous[index] if index < len(previous) else None
+            if old is not None and old['key'] == key and old['start'] == position:
+                entries.append(old)
+                position = old['end']
+                continue
+            page, end = layout_scene(scene_blocks(scene), position, self.lines_per_page)
+            entries.append({'key': key, 'start': position, 'page': page, 'end': end})
+            position = end
+            laid_out += 1
+
+        with self.lock:
+            self.runs[script_id] = entries
+            self.stats['laid_out'] += laid_out
+            self.stats['reused'] += len(entries) - laid_out
+
+        result = []
+        for scene, entry in zip(scenes, entries):
+            (start_page, start_line), (end_page, end_line) = entry['start'], entry['end']
+            lines = (end_page - start_page) * self.lines_per_page + end_line - start_line
+            eighths = max(1, round(8 * lines / self.lines_per_page))
+            heading, _ = scene_heading(scene)
+            result.append({
+                'scene_id': scene.get('id'),
+                'scene_number': scene.get('scene_number'),
+                'heading': heading,
+                'page': entry['page'],
+                'eighths': eighths,
+                'length': format_eighths(eighths)
+            })
+        return {'pages': position[0] if position[1] else position[0] - 1, 'scenes': result}
+
+    def page_count(self, script_id: str, scenes: List[Dict]) -> int:
+        """Number of pages of the script (about one minute of screen time each)"""
+        return self.paginate(script_id, scenes)['pages']
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from config import Config
+
+def prefix_hash(text: str, model: str = None) -> str:
+    """Hash identifying a rendered prompt prefix (registered for a model)"""
+    if model:
+        text = f"{model}\x00{text}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class PromptPrefixCache:
+    """Cache rendered prompt prefixes and the backend handles they were registered under"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, min_chars: int = None):
+        self.max_entries = max_entries or Config.PROMPT_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.PROMPT_CACHE_TTL_SECONDS
+        self.min_chars = min_chars if min_chars is not None else Config.PROMPT_CACHE_MIN_CHARS
+        self.rendered = OrderedDict()  # key -> rendered prefix text
+        self.handles = {}  # prefix hash -> (handle or None, expires_at)
+        self.lock = threading.Lock()
+        self.stats = {'render_hits': 0, 'render_misses': 0, 'handle_hits': 0, 'registrations': 0, 'fallbacks': 0}
+
+    def get_prefix(self, key: str, render: Callable[[], str]) -> str:
+        """Return the rendered prefix for a key (e.g. script id + version), rendering it only on a miss"""
+        with self.lock:
+            if key in self.rendered:
+                self.rendered.move_to_end(key)
+                self.stats['render_hits'] += 1
+                return self.rendered[key]
+        text = render()
+        with self.lock:
+            self.stats['render_misses'] += 1
+            self.rendered[key] = text
+            while len(self.rendered) > self.max_entries:
+                self.rendered.popitem(last=False)
+        return text
+
+    def get_handle(self, backend, prefix: str, model: str = None) -> Optional[str]:
+        """Return a backend cached-content handle for a prefix and model, registering it on first use
+
+        Returns None when the backend has no cached content support, the prefix is too short
+        to be worth caching, or registration failed; callers then send the plain prompt.
+        """
+        if not getattr(backend, 'supports_cached_content', False) or len(prefix) < self.min_chars:
+            return None
+
+        key = prefix_hash(prefix, model)
+        now = time.time()
+        with self.lock:
+            entry = self.handles.get(key)
+            if entry and entry[1] > now:
+                if entry[0] is not None:
+                    self.stats['handle_hits'] += 1
+                return entry[0]
+
+        try:
+            handle = backend.create_cached_prefix(prefix, self.ttl_seconds, model)
+            with self.lock:
+                self.stats['registrations'] += 1
+        except Exception as e:
+            print(f"Prompt prefix caching unavailable, using plain prompts: {e}")
+            handle = None
+        with self.lock:
+            # Failures are remembered too, so we do not retry registration on every call
+            self.handles[key] = (handle, now + self.ttl_seconds)
+            while len(self.handles) > self.max_entries:
+                self.handles.pop(next(iter(self.handles)))
+        return handle
+
+    def invalidate(self, prefix: str, model: str = None):
+        """Forget the backend handle for a prefix (e.g. after it expired server-side)"""
+        with self.lock:
+            self.handles.pop(prefix_hash(prefix, model), None)
+            self.stats['fallbacks'] += 1
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters for rendered prefixes and backend registrations"""
+        with self.lock:
+            return dict(self.stats)
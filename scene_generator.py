@@ -1,13 +1,22 @@
 import streamlit as st
+import hashlib
+import uuid
 from typing import Dict, List, Optional
 from datetime import datetime
+from scene_patch import edit_scene
+
+# Edit request used by "Process Scene" when the model returns line edits (see scene_patch)
+PROCESS_SCENE_REQUEST = ("Improve the dialogue (natural, character-specific, engaging), the writing (clarity, flow, "
+                         "visual storytelling) and the structure (pacing, scene beats, dramatic tension)")
 
 class SceneGenerator:
-    def __init__(self, character_manager, scene_manager, location_manager, llm_client):
+    def __init__(self, character_manager, scene_manager, location_manager, llm_client, job_queue=None):
         self.character_manager = character_manager
         self.scene_manager = scene_manager
         self.location_manager = location_manager
         self.llm_client = llm_client
+        # When a JobQueue is given, generation runs in the background instead of inside the rerun
+        self.job_queue = job_queue
     
     def render_scene_generator(self):
         """Render the main scene generator interface"""
@@ -34,6 +43,10 @@ class SceneGenerator:
                 'links_to_scenes': []
             }
         
+        # Pick up results of background jobs before the editor renders
+        if self.job_queue:
+            self.apply_finished_jobs(username)
+        
         # Main layout with columns
         col1, col2 = st.columns([2, 1])
         
@@ -44,6 +57,8 @@ class SceneGenerator:
             self.render_action_buttons(username)
         
         with col2:
+            if self.job_queue:
+                self.render_background_jobs_panel(username)
             self.render_prompt_assistant_sidebar()
             self.render_storyboard_panel()
             self.render_scene_notes_panel(username)
@@ -243,7 +258,8 @@ class SceneGenerator:
         if st.session_state.current_scene['action']:
             scene_text = st.session_state.current_scene['action']
             summary = self.llm_client.generate_response(
-                f"Please provide a brief summary of this scene:\n\n{scene_text}"
+                f"Please provide a brief summary of this scene:\n\n{scene_text}",
+                operation="summarize"
             )
             st.info(f"**Scene Summary:**\n{summary}")
     
@@ -259,7 +275,8 @@ class SceneGenerator:
         if st.session_state.current_scene['action']:
             scene_text = st.session_state.current_scene['action']
             consistency_check = self.llm_client.generate_response(
-                f"Please check this scene for consistency issues:\n\n{scene_text}"
+                f"Please check this scene for consistency issues:\n\n{scene_text}",
+                operation="analyze"
             )
             st.info(f"**Consistency Check:**\n{consistency_check}")
     
@@ -268,7 +285,8 @@ class SceneGenerator:
         if st.session_state.current_scene['action']:
             scene_text = st.session_state.current_scene['action']
             suggestion = self.llm_client.generate_response(
-                f"Based on this scene, suggest what could happen next:\n\n{scene_text}"
+                f"Based on this scene, suggest what could happen next:\n\n{scene_text}",
+                operation="analyze"
             )
             st.info(f"**Next Action Suggestion:**\n{suggestion}")
     
@@ -336,24 +354,63 @@ class SceneGenerator:
             st.session_state.current_scene.update(template)
             st.rerun()
     
+    @staticmethod
+    def build_auto_generate_prompt(scene: Dict) -> str:
+        """Build the prompt that generates a scene from its overview fields"""
+        return f"""
+        Generate a scene with the following details:
+        Title: {scene['title']}
+        Location: {scene['location']}
+        Time: {scene['time_of_day']}
+        Tone: {', '.join(scene['tone_mood'])}
+        Characters: {', '.join(scene['characters'])}
+        Goal: {scene['goal']}
+        Conflict: {scene['conflict_stakes']}
+        
+        Please generate a complete scene with action and dialogue mixed naturally.
+        """
+    
+    @staticmethod
+    def build_process_prompt(scene_text: str) -> str:
+        """Build the prompt that improves dialogue, writing and structure of a scene"""
+        return f"""
+            Please improve this scene by enhancing the dialogue, writing quality, and structure:
+            
+            {scene_text}
+            
+            Please provide improvements in these areas:
+            1. Dialogue: Make it more natural, character-specific, and engaging
+            2. Writing: Improve clarity, flow, and visual storytelling
+            3. Structure: Enhance pacing, scene beats, and dramatic tension
+            
+            Return the improved scene text.
+            """
+    
+    @staticmethod
+    def build_custom_request_prompt(request: str, scene_text: str) -> str:
+        """Build the prompt that applies a free-form modification request to a scene"""
+        return f"""
+            Please modify this scene according to the following request:
+            
+            REQUEST: {request}
+            
+            CURRENT SCENE:
+            {scene_text}
+            
+            Please return the modified scene text that addresses the request while maintaining the scene's core elements and structure.
+            """
+    
     def auto_generate_scene(self):
         """Auto-generate a scene based on current data"""
         if not st.session_state.current_scene['title']:
             st.error("Please provide a scene title first!")
             return
         
-        prompt = f"""
-        Generate a scene with the following details:
-        Title: {st.session_state.current_scene['title']}
-        Location: {st.session_state.current_scene['location']}
-        Time: {st.session_state.current_scene['time_of_day']}
-        Tone: {', '.join(st.session_state.current_scene['tone_mood'])}
-        Characters: {', '.join(st.session_state.current_scene['characters'])}
-        Goal: {st.session_state.current_scene['goal']}
-        Conflict: {st.session_state.current_scene['conflict_stakes']}
+        prompt = self.build_auto_generate_prompt(st.session_state.current_scene)
         
-        Please generate a complete scene with action and dialogue mixed naturally.
-        """
+        if self.job_queue:
+            self.submit_scene_job("Auto-generate scene", prompt)
+            return
         
         generated_scene = self.llm_client.generate_response(prompt)
         
@@ -371,22 +428,16 @@ class SceneGenerator:
         
         scene_text = st.session_state.current_scene['action']
         
+        if self.job_queue:
+            self.submit_scene_job("Process scene", self.build_process_prompt(scene_text), operation="rewrite",
+                                  edit_request=PROCESS_SCENE_REQUEST)
+            return
+        
         with st.spinner("Processing scene - improving dialogue, writing, and structure..."):
             # Process the scene with AI
-            prompt = f"""
-            Please improve this scene by enhancing the dialogue, writing quality, and structure:
-            
-            {scene_text}
-            
-            Please provide improvements in these areas:
-            1. Dialogue: Make it more natural, character-specific, and engaging
-            2. Writing: Improve clarity, flow, and visual storytelling
-            3. Structure: Enhance pacing, scene beats, and dramatic tension
-            
-            Return the improved scene text.
-            """
+            prompt = self.build_process_prompt(scene_text)
             
-            processed_scene = self.llm_client.generate_response(prompt)
+            processed_scene = edit_scene(self.llm_client, PROCESS_SCENE_REQUEST, scene_text, prompt)
             
             # Update the scene with processed content
             st.session_state.current_scene['action'] = processed_scene
@@ -402,20 +453,16 @@ class SceneGenerator:
         
         scene_text = st.session_state.current_scene['action']
         
+        if self.job_queue:
+            self.submit_scene_job(f"Request: {request}", self.build_custom_request_prompt(request, scene_text),
+                                  operation="rewrite", edit_request=request)
+            return
+        
         with st.spinner(f"Processing your request: {request}..."):
             # Process the custom request with AI
-            prompt = f"""
-            Please modify this scene according to the following request:
+            prompt = self.build_custom_request_prompt(request, scene_text)
             
-            REQUEST: {request}
-            
-            CURRENT SCENE:
-            {scene_text}
-            
-            Please return the modified scene text that addresses the request while maintaining the scene's core elements and structure.
-            """
-            
-            modified_scene = self.llm_client.generate_response(prompt)
+            modified_scene = edit_scene(self.llm_client, request, scene_text, prompt)
             
             # Update the scene with modified content
             st.session_state.current_scene['action'] = modified_scene
@@ -423,6 +470,83 @@ class SceneGenerator:
             st.success(f"Scene modified according to your request: '{request}'")
             st.rerun()
     
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Hash of the editor content, used to tell whether it changed while a job ran"""
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+    
+    def get_session_id(self) -> str:
+        """Identify this browser session so its own job results can be applied automatically"""
+        if 'job_session_id' not in st.session_state:
+            st.session_state.job_session_id = uuid.uuid4().hex
+        return st.session_state.job_session_id
+    
+    def submit_scene_job(self, label: str, prompt: str, operation: str = "generate", edit_request: str = None):
+        """Queue a generation job whose result replaces the current scene content
+        
+        With an edit_request the job asks for line edits to the current scene and only
+        uses prompt as the full-rewrite fallback.
+        """
+        username = st.session_state.get('username', '')
+        payload = {'prompt': prompt, 'operation': operation}
+        if edit_request:
+            payload.update(edit_request=edit_request, scene_text=st.session_state.current_scene['action'])
+        self.job_queue.submit(
+            'scene_prompt',
+            payload,
+            username,
+            label=label,
+            dedupe_key=f"{username}:{self.text_hash(prompt)}",
+            metadata={
+                'session_id': self.get_session_id(),
+                'source_hash': self.text_hash(st.session_state.current_scene['action']),
+                'scene_title': st.session_state.current_scene['title'],
+                'applied': False
+            }
+        )
+        st.info(f"⏳ '{label}' is running in the background. The result will be applied when it is ready.")
+    
+    def apply_finished_jobs(self, username: str):
+        """Apply finished jobs from this session if the scene was not edited in the meantime"""
+        current_hash = self.text_hash(st.session_state.current_scene['action'])
+        for job in self.job_queue.list_jobs(username, kinds=['scene_prompt']):
+            metadata = job['metadata']
+            if (job['status'] == 'done' and not metadata.get('applied')
+                    and metadata.get('session_id') == self.get_session_id()
+                    and metadata.get('source_hash') == current_hash):
+                st.session_state.current_scene['action'] = job['result']
+                self.job_queue.update_job(job['id'], metadata=dict(metadata, applied=True))
+                st.success(f"'{job['label']}' finished and was applied. Review the changes.")
+                break
+    
+    def render_background_jobs_panel(self, username: str):
+        """Render the status of background generation jobs"""
+        jobs = self.job_queue.list_jobs(username, kinds=['scene_prompt'], limit=5)
+        with st.expander("⏳ Background Jobs", expanded=any(job['status'] in ('queued', 'running') for job in jobs)):
+            if not jobs:
+                st.info("No background jobs yet.")
+                return
+            
+            if st.button("🔄 Refresh", key="refresh_scene_jobs"):
+                st.rerun()
+            
+            status_icons = {'queued': '🕒', 'running': '⚙️', 'done': '✅', 'failed': '❌', 'cancelled': '🚫'}
+            for job in jobs:
+                st.write(f"{status_icons.get(job['status'], '')} **{job['label'][:60]}** – {job['status']}")
+                if job['status'] == 'failed':
+                    st.caption(job['error'])
+                elif job['status'] == 'queued':
+                    if st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                        self.job_queue.cancel(job['id'])
+                        st.rerun()
+                elif job['status'] == 'done' and not job['metadata'].get('applied'):
+                    # Not applied automatically because the scene changed or it came from another session
+                    st.caption(f"For scene: {job['metadata'].get('scene_title') or 'untitled'}")
+                    if st.button("Apply Result", key=f"apply_job_{job['id']}"):
+                        st.session_state.current_scene['action'] = job['result']
+                        self.job_queue.update_job(job['id'], metadata=dict(job['metadata'], applied=True))
+                        st.rerun()
+    
     def render_action_buttons(self, username: str):
         """Render action buttons at the bottom"""
         st.markdown("---")
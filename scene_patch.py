@@ -0,0 +1,88 @@
+import json
+import re
+from typing import Dict, List
+from config import Config
+
+class ScenePatchError(ValueError):
+    """The model's edits could not be parsed or do not fit the scene"""
+
+def number_lines(text: str) -> str:
+    """Prefix every line with its 1-based number so the model can reference line ranges"""
+    return '\n'.join(f"{number}| {line}" for number, line in enumerate(text.split('\n'), start=1))
+
+def build_edit_prompt(request: str, scene_text: str) -> str:
+    """Build the prompt that asks for line-range edits instead of the whole rewritten scene"""
+    return f"""
+        Edit this scene according to the following request:
+
+        REQUEST: {request}
+
+        SCENE (each line is prefixed with its line number):
+        {number_lines(scene_text)}
+
+        Do NOT return the whole scene. Return only JSON describing the smallest set of edits:
+        {{"edits": [{{"start": <first line>, "end": <last line>, "replacement": "<new text for those lines>"}}]}}
+
+        - Line numbers are 1-based and inclusive, and refer to the original scene.
+        - The replacement may span several lines (use \\n) or be empty to delete the lines.
+        - To insert new lines before line N without replacing anything, use "start": N, "end": N - 1.
+        - Edits must not overlap. Do not include the line number prefixes in replacements.
+        - Return {{"edits": []}} if nothing needs to change.
+        """
+
+def parse_edits(response: str) -> List[Dict]:
+    """Extract and validate the edits JSON from a model response"""
+    text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", response.strip())
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ScenePatchError("No JSON object in response")
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ScenePatchError(f"Invalid JSON: {e}")
+
+    edits = data.get('edits') if isinstance(data, dict) else None
+    if not isinstance(edits, list):
+        raise ScenePatchError("Missing 'edits' list")
+    for edit in edits:
+        if (not isinstance(edit, dict) or not isinstance(edit.get('start'), int)
+                or not isinstance(edit.get('end'), int) or not isinstance(edit.get('replacement', ''), str)):
+            raise ScenePatchError(f"Malformed edit: {edit}")
+    return edits
+
+def apply_edits(scene_text: str, edits: List[Dict]) -> str:
+    """Apply line-range edits to a scene; raises ScenePatchError if a range is out of bounds or overlaps another"""
+    lines = scene_text.split('\n')
+    ordered = sorted(edits, key=lambda edit: (edit['start'], edit['end']))
+    previous_end = 0
+    for edit in ordered:
+        start, end = edit['start'], edit['end']
+        if start < 1 or start > len(lines) + 1 or end < start - 1 or end > len(lines):
+            raise ScenePatchError(f"Line range {start}-{end} is outside the scene (1-{len(lines)})")
+        if start <= previous_end:
+            raise ScenePatchError(f"Line range {start}-{end} overlaps a previous edit")
+        previous_end = max(previous_end, end)
+
+    # Apply bottom-up so earlier line numbers stay valid
+    for edit in reversed(ordered):
+        replacement = edit.get('replacement', '')
+        new_lines = replacement.split('\n') if replacement else []
+        lines[edit['start'] - 1:edit['end']] = new_lines
+    return '\n'.join(lines)
+
+def edit_scene(llm_client, request: str, scene_text: str, fallback_prompt: str) -> str:
+    """Apply a modification request to a scene and return the new scene text
+
+    With Config.SCENE_EDIT_MODE 'patch' the model returns line-range edits that are applied
+    locally, so output size follows the size of the change. If the edits cannot be parsed
+    or applied, the scene is rewritten in full with fallback_prompt.
+    """
+    if Config.SCENE_EDIT_MODE == 'patch' and scene_text.strip():
+        response = llm_client.generate_response(build_edit_prompt(request, scene_text), operation="rewrite")
+        if response.startswith("Error generating"):
+            return response
+        try:
+            return apply_edits(scene_text, parse_edits(response))
+        except ScenePatchError as e:
+            print(f"Scene patch failed, falling back to full rewrite: {e}")
+    return llm_client.generate_response(fallback_prompt, operation="rewrite")
@@ -0,0 +1,131 @@
+import io
+import re
+from datetime import datetime
+from typing import Dict, Iterable, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+from screenplay_parser import TRANSITION_PATTERN, classify_line, inline_speech, parse_scene
+
+# Characters XML 1.0 does not allow (FDX is XML)
+INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+SCENE_HEADING_PREFIX = re.compile(r"^(INT|EXT|EST|INT\./EXT|INT/EXT|I/E)[. ]", re.IGNORECASE)
+# Final Draft paragraph type of each screenplay element type; other elements are 'Action'
+FDX_PARAGRAPH_TYPES = {
+    'heading': 'Scene Heading', 'character': 'Character', 'parenthetical': 'Parenthetical',
+    'dialogue': 'Dialogue', 'transition': 'Transition'
+}
+
+def export_filename(name: str, extension: str) -> str:
+    """Timestamped file name for an export"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{name.replace(' ', '_')}_{timestamp}.{extension}"
+
+def scene_heading(scene_data: Dict) -> Tuple[str, bool]:
+    """Slugline for a scene and whether it is a standard INT./EXT. heading
+
+    Scenes store location and time of day separately; the location may or may not
+    already carry the INT./EXT. prefix.
+    """
+    location = (scene_data.get('location') or scene_data.get('title') or f"SCENE {scene_data.get('scene_number', '')}").strip()
+    time_of_day = (scene_data.get('time_of_day') or '').strip()
+    heading = f"{location} - {time_of_day}" if time_of_day else location
+    return heading.upper(), bool(SCENE_HEADING_PREFIX.match(location))
+
+def fountain_element(element_type: str, text: str) -> str:
+    """Fountain markup of a parsed element, forcing its type where the text alone would read as another"""
+    if element_type == 'heading':
+        return text if SCENE_HEADING_PREFIX.match(text) else f".{text}"
+    if element_type == 'character':
+        return text if classify_line(text) == 'character' else f"@{text}"
+    if element_type == 'transition':
+        return text if TRANSITION_PATTERN.fullmatch(text) else f"> {text}"
+    if element_type == 'synopsis':
+        return f"= {text}"
+    if element_type == 'note':
+        return f"[[{text}]]"
+    if element_type == 'action':
+        first_line = text.split('\n', 1)[0].strip()
+        if classify_line(first_line) != 'action' or inline_speech(first_line) or first_line.startswith('!'):
+            return f"!{text}"
+    return text
+
+class FountainExporter:
+    """Write scenes as Fountain plain text, one scene at a time"""
+
+    extension = "fountain"
+    mime = "text/plain"
+
+    def write(self, scenes: Iterable[Dict], out: TextIO, title: str = "Screenplay", author: str = "Screenwriter") -> int:
+        """Stream scenes to a text file-like object and return the number of scenes written"""
+        out.write(f"Title: {title}\nAuthor: {author}\n\n")
+        count = 0
+        for scene in scenes:
+            self.write_scene(scene, out)
+            count += 1
+        return count
+
+    def write_scene(self, scene_data: Dict, out: TextIO):
+        heading, standard = scene_heading(scene_data)
+        # Non-standard headings are forced with a leading period; scene numbers go between #...#
+        number = scene_data.get('scene_number')
+        out.write(f"{heading if standard else '.' + heading}{f' #{number}#' if number not in (None, '') else ''}\n\n")
+        if scene_data.get('title'):
+            out.write(f"= {scene_data['title']}\n\n")
+        # Elements come from the parser, so one-line speeches (SARAH: Hello.) are written as a cue
+        # and dialogue, and all-caps action is forced with ! rather than read back as a cue
+        elements = parse_scene(scene_data.get('action', '') or '')
+        for index, (element_type, text) in enumerate(elements):
+            if index and element_type not in ('parenthetical', 'dialogue'):
+                out.write("\n")
+            out.write(f"{fountain_element(element_type, text)}\n")
+        if elements:
+            out.write("\n")
+        if scene_data.get('notes'):
+            out.write(f"[[NOTES: {scene_data['notes']}]]\n\n")
+
+    def render(self, scenes: Iterable[Dict], title: str = "Screenplay", author: str = "Screenwriter") -> Tuple[bytes, str]:
+        """Render to memory and return (file contents, file name)"""
+        buffer = io.StringIO()
+        self.write(scenes, buffer, title, author)
+        return buffer.getvalue().encode('utf-8'), export_filename(title, self.extension)
+
+class FDXExporter:
+    """Write scenes as Final Draft XML (.fdx), one scene at a time without building a DOM"""
+
+    extension = "fdx"
+    mime = "application/xml"
+
+    @staticmethod
+    def paragraph(out: TextIO, paragraph_type: str, text: str, number=None, alignment: str = None, scene_title: str = None):
+        text = escape(INVALID_XML_CHARS.sub('', text))
+        attributes = f" Number={quoteattr(str(number))}" if number not in (None, '') else ""
+        if alignment:
+            attributes += f' Alignment="{alignment}"'
+        # Final Draft keeps a scene's title in the heading's scene properties
+        properties = f"\n      <SceneProperties Title={quoteattr(INVALID_XML_CHARS.sub('', scene_title))}/>" if scene_title else ""
+        out.write(f'    <Paragraph{attributes} Type="{paragraph_type}">{properties}\n      <Text>{text}</Text>\n    </Paragraph>\n')
+
+    def write(self, scenes: Iterable[Dict], out: TextIO, title: str = "Screenplay", author: str = "Screenwriter") -> int:
+        """Stream scenes to a text file-like object and return the number of scenes written"""
+        out.write('<?xml version="1.0" encoding="UTF-8" standalone="no" ?>\n')
+        out.write('<FinalDraft DocumentType="Script" Template="No" Version="5">\n  <Content>\n')
+        count = 0
+        for scene in scenes:
+            self.write_scene(scene, out)
+            count += 1
+        out.write('  </Content>\n  <TitlePage>\n    <Content>\n')
+        self.paragraph(out, "General", title.upper(), alignment="Center")
+        self.paragraph(out, "General", f"by {author}", alignment="Center")
+        out.write('    </Content>\n  </TitlePage>\n</FinalDraft>\n')
+        return count
+
+    def write_scene(self, scene_data: Dict, out: TextIO):
+        heading, _ = scene_heading(scene_data)
+        self.paragraph(out, "Scene Heading", heading, scene_data.get('scene_number'), scene_title=scene_data.get('title'))
+        for element_type, text in parse_scene(scene_data.get('action', '') or ''):
+            self.paragraph(out, FDX_PARAGRAPH_TYPES.get(element_type, "Action"), text)
+
+    def render(self, scenes: Iterable[Dict], title: str = "Screenplay", author: str = "Screenwriter") -> Tuple[bytes, str]:
+        """Render to memory and return (file contents, file name)"""
+        buffer = io.StringIO()
+        self.write(scenes, buffer, title, author)
+        return buffer.getvalue().encode('utf-8'), export_filename(title, self.extension)
@@ -0,0 +1,216 @@
+import io
+import itertools
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterable, Iterator, Tuple
+from screenplay_parser import HEADING_PATTERN, SCENE_NUMBER_PATTERN, Element, character_name, iter_elements
+
+# Elements are screenplay_parser elements plus title and profile (a character from a
+# WordExporter character list)
+
+# WordExporter headings: "SCENE 3 - TITLE - LOCATION"
+EXPORTED_HEADING_PATTERN = re.compile(r"^SCENE\s+\S+(?:\s+-\s+(.*))?$")
+TITLE_PAGE_PATTERN = re.compile(r"^(title|credit|authors?|source|draft date|contact|notes|copyright)\s*:\s*(.*)$", re.IGNORECASE)
+PROFILE_PATTERN = re.compile(r"^(.*?)\s*\(Age:\s*(.*)\)$")
+
+FDX_TYPES = {
+    'Scene Heading': 'heading', 'Action': 'action', 'Character': 'character', 'Dialogue': 'dialogue',
+    'Parenthetical': 'parenthetical', 'General': 'action', 'Transition': 'action', 'Shot': 'action'
+}
+DOCX_STYLES = {
+    'Scene Heading': 'heading', 'Action': 'action', 'Character': 'character',
+    'Dialogue': 'dialogue', 'Parenthetical': 'parenthetical'
+}
+
+def iter_fountain(lines: Iterable[str]) -> Iterator[Element]:
+    """Parse Fountain text line by line, so large files are never held in memory"""
+    lines = iter(lines)
+    for line in lines:
+        if not line.strip():
+            continue
+        if not TITLE_PAGE_PATTERN.match(line.strip()):
+            # No title page: the first line already belongs to the script
+            yield from iter_elements(itertools.chain([line], lines))
+            return
+        # Title page: key/value lines up to the first blank line
+        for entry in itertools.chain([line], lines):
+            if not entry.strip():
+                break
+            match = TITLE_PAGE_PATTERN.match(entry.strip())
+            if match and match.group(1).lower() == 'title':
+                yield 'title', match.group(2).strip()
+        yield from iter_elements(lines)
+        return
+
+def iter_fdx(stream: BinaryIO) -> Iterator[Element]:
+    """Parse Final Draft XML incrementally, discarding each paragraph once read"""
+    in_title_page = False
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        if element.tag == 'TitlePage':
+            in_title_page = event == 'start'
+        elif event == 'end' and element.tag == 'Paragraph':
+            text = ''.join(''.join(node.itertext()) for node in element.findall('Text')).strip()
+            element_type = FDX_TYPES.get(element.get('Type', 'Action'), 'action')
+            if not text:
+                pass
+            elif in_title_page:
+                # The first title page line is the title; the rest is credits
+                yield 'title', text
+            elif element_type == 'heading':
+                yield element_type, SCENE_NUMBER_PATTERN.sub('', text).strip()
+                properties = element.find('SceneProperties')
+                if properties is not None and properties.get('Title', '').strip():
+                    yield 'synopsis', properties.get('Title').strip()
+            elif element_type == 'action':
+                yield from iter_elements(text.split('\n'))
+            else:
+                yield element_type, text
+            element.clear()
+
+def iter_docx(stream: BinaryIO) -> Iterator[Element]:
+    """Parse a .docx screenplay, using WordExporter's paragraph styles when present"""
+    from docx import Document
+
+    seen_heading = False
+    in_character_list = False
+    for paragraph in Document(stream).paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        style = DOCX_STYLES.get(paragraph.style.name if paragraph.style is not None else '')
+
+        if style == 'heading' and text == 'SCENE INDEX':
+            # WordExporter's index table is rebuilt on export; its rows are not paragraphs
+            continue
+        if style == 'heading' and text == 'CHARACTER LIST':
+            in_character_list = True
+            continue
+        if in_character_list:
+            yield ('profile' if PROFILE_PATTERN.match(text) else 'action'), text
+            continue
+        if style == 'heading':
+            seen_heading = True
+            match = EXPORTED_HEADING_PATTERN.match(text)
+            if not match:
+                yield 'heading', text
+                continue
+            # WordExporter puts the title and/or the location after the scene number
+            parts = (match.group(1) or '').split(' - ', 1)
+            if len(parts) == 2:
+                title, location = parts
+            elif HEADING_PATTERN.match(parts[0]):
+                title, location = '', parts[0]
+            else:
+                title, location = parts[0], ''
+            yield 'heading', location
+            if title:
+                yield 'synopsis', title.title()
+            continue
+        if text.startswith('NOTES:'):
+            yield 'note', text[len('NOTES:'):].strip()
+            continue
+        if style == 'action':
+            yield from iter_elements(text.split('\n'))
+            continue
+        if style:
+            yield style, text
+            continue
+        # Unstyled documents: treat every paragraph as a Fountain block
+        elements = list(iter_elements(text.split('\n')))
+        if not seen_heading and elements[0][0] != 'heading':
+            # Title page before the first scene
+            yield 'title', text
+            continue
+        seen_heading = seen_heading or elements[0][0] == 'heading'
+        yield from elements
+
+def parse_heading(heading: str) -> Tuple[str, str]:
+    """Split 'INT. OFFICE - NIGHT' into location 'INT. OFFICE' and time of day 'Night'"""
+    if ' - ' in heading:
+        location, time_of_day = heading.rsplit(' - ', 1)
+        return location.strip(), time_of_day.strip().title()
+    return heading.strip(), ''
+
+def location_name(location: str) -> str:
+    """Location name without the INT./EXT. prefix"""
+    prefix = HEADING_PATTERN.match(location)
+    return (location[prefix.end():] if prefix else location).strip(' .').title() or location
+
+def assemble(elements: Iterable[Element]) -> Dict:
+    """Group parsed elements into scenes, characters and locations
+
+    Scene content is kept as Fountain-style text (cue, parenthetical and dialogue lines
+    in one block), which is how scenes entered in the app store action and dialogue.
+    """
+    result = {'title': '', 'scenes': [], 'characters': {}, 'locations': {}}
+    scene = None
+    blocks = []
+    profile = None
+    profile_has_description = False
+
+    def finish_scene():
+        if scene is not None:
+            scene['action'] = '\n\n'.join(blocks)
+            result['scenes'].append(scene)
+
+    def new_scene(heading: str):
+        location, time_of_day = parse_heading(heading)
+        if location:
+            name = location_name(location)
+            result['locations'].setdefault(name.lower(), {'name': name, 'description': ''})
+        return {
+            'scene_number': len(result['scenes']) + 1, 'title': location_name(location) if location else '',
+            'location': location, 'time_of_day': time_of_day, 'tone_mood': [], 'characters': [],
+            'action': '', 'goal': '', 'conflict_stakes': '', 'notes': ''
+        }
+
+    for element_type, text in elements:
+        if element_type == 'title':
+            result['title'] = result['title'] or text
+        elif element_type == 'profile':
+            name, age = PROFILE_PATTERN.match(text).groups()
+            profile = result['characters'].setdefault(name.lower(), {'name': name.title()})
+            profile['age'] = age
+            profile.setdefault('description', '')
+            profile_has_description = False
+        elif profile is not None and element_type == 'action':
+            # Character list entries: description, then personality
+            profile['personality' if profile_has_description else 'description'] = text
+            profile_has_description = True
+        elif element_type == 'heading':
+            finish_scene()
+            scene, blocks = new_scene(text), []
+        else:
+            if scene is None:
+                scene, blocks = new_scene(''), []
+                scene['title'] = 'Opening'
+            if element_type == 'synopsis':
+                scene['title'] = text
+            elif element_type == 'note':
+                scene['notes'] = f"{scene['notes']}\n{text}".strip()
+            elif element_type == 'character':
+                name = character_name(text)
+                if name and name not in scene['characters']:
+                    scene['characters'].append(name)
+                result['characters'].setdefault(name.lower(), {'name': name, 'description': ''})
+                blocks.append(text)
+            elif element_type in ('parenthetical', 'dialogue') and blocks:
+                blocks[-1] += f"\n{text}"
+            else:
+                blocks.append(text)
+    finish_scene()
+    return result
+
+def import_screenplay(stream: BinaryIO, filename: str) -> Dict:
+    """Parse an uploaded .fountain/.txt, .fdx or .docx file into scenes, characters and locations"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.fdx':
+        elements = iter_fdx(stream)
+    elif extension == '.docx':
+        elements = iter_docx(stream)
+    elif extension in ('.fountain', '.spmd', '.txt'):
+        elements = iter_fountain(io.TextIOWrapper(stream, encoding='utf-8', errors='replace'))
+    else:
+        raise ValueError(f"Unsupported screenplay format: {extension}")
+    return assemble(elements)
@@ -0,0 +1,181 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Tuple
+from config import Config
+
+# An element is (type, text). Types: heading, action, character, parenthetical, dialogue,
+# transition, synopsis and note. Consecutive action lines form one element.
+Element = Tuple[str, str]
+
+# Patterns are anchored and free of nested or overlapping quantifiers, so each line is
+# matched in time linear in its length
+HEADING_PATTERN = re.compile(r"(?:INT|EXT|EST|INT\./EXT|INT/EXT|I/E)[. ]", re.IGNORECASE)
+SCENE_NUMBER_PATTERN = re.compile(r"#[^#]*#$")
+CHARACTER_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9 .'&\-]*(?:\([^()]*\))?\^?")
+CHARACTER_EXTENSION_PATTERN = re.compile(r"\([^()]*\)|\^")
+TRANSITION_PATTERN = re.compile(r"[A-Z][A-Z .'\-]*TO:")
+# All-caps words that open a line with a colon without naming a speaker (times, transitions, inserts)
+NON_SPEAKER_CUES = frozenset((
+    'LATER', 'MOMENTS LATER', 'CONTINUOUS', 'SAME', 'SAME TIME', 'MEANWHILE', 'DAY', 'NIGHT', 'MORNING',
+    'AFTERNOON', 'EVENING', 'DAWN', 'DUSK', 'FADE IN', 'FADE OUT', 'CUT TO', 'SMASH CUT', 'MATCH CUT',
+    'JUMP CUT', 'INTERCUT', 'FLASHBACK', 'END FLASHBACK', 'BACK TO SCENE', 'INSERT', 'MONTAGE',
+    'END MONTAGE', 'SERIES OF SHOTS', 'SUPER', 'TITLE', 'TITLE CARD', 'CHYRON', 'NOTE', 'NOTES', 'THE END'
+))
+# Extensions that belong to the cue, e.g. (V.O.) or (CONT'D); other parentheticals are acting directions
+EXTENSION_TEXT_PATTERN = re.compile(r"\([^()a-z]*\)")
+
+def classify_line(stripped: str) -> str:
+    """Type of a line that starts a new block, before looking at the line after it"""
+    if stripped.startswith('.') and not stripped.startswith('..'):
+        return 'heading'
+    if HEADING_PATTERN.match(stripped):
+        return 'heading'
+    if stripped.startswith('[[') and stripped.endswith(']]'):
+        return 'note'
+    if stripped.startswith('=') and not stripped.startswith('==='):
+        return 'synopsis'
+    if (stripped.startswith('>') and not stripped.endswith('<')) or TRANSITION_PATTERN.fullmatch(stripped):
+        return 'transition'
+    if stripped.startswith('@') or (CHARACTER_PATTERN.fullmatch(stripped) and stripped.split('(', 1)[0].isupper()):
+        # Only a cue if dialogue follows on the next line
+        return 'character'
+    return 'action'
+
+def inline_speech(stripped: str) -> Tuple[Element, ...]:
+    """Elements of a one-line speech like `SARAH: "Hello."` or `SARAH (quietly): Hello.`, as the
+    app's own scenes write dialogue; empty if the line is not one"""
+    name, colon, speech = stripped.partition(':')
+    name, speech = name.strip(), speech.strip()
+    if not colon or not speech or not name.split('(', 1)[0].isupper() or not CHARACTER_PATTERN.fullmatch(name):
+        return ()
+    if (HEADING_PATTERN.match(stripped) or TRANSITION_PATTERN.fullmatch(name + ':')
+            or name.split('(', 1)[0].strip() in NON_SPEAKER_CUES):
+        return ()
+    if len(speech) > 1 and speech[0] == speech[-1] == '"':
+        speech = speech[1:-1].strip()
+    cue, _, parenthetical = name.partition('(')
+    parenthetical = f"({parenthetical}" if parenthetical else ''
+    if not parenthetical or EXTENSION_TEXT_PATTERN.fullmatch(parenthetical):
+        return ('character', name), ('dialogue', speech)
+    return ('character', cue.strip()), ('parenthetical', parenthetical), ('dialogue', speech)
+
+def element_text(element_type: str, stripped: str) -> str:
+    """Text of a single-line element without its Fountain markers"""
+    if element_type == 'heading':
+        return SCENE_NUMBER_PATTERN.sub('', stripped[1:] if stripped.startswith('.') else stripped).strip()
+    if element_type == 'note':
+        note = stripped[2:-2].strip()
+        return note[len('NOTES:'):].strip() if note.startswith('NOTES:') else note
+    if element_type == 'synopsis':
+        return stripped.lstrip('=').strip()
+    if element_type == 'transition':
+        return stripped.lstrip('>').strip()
+    return stripped
+
+def iter_elements(lines: Iterable[str]) -> Iterator[Element]:
+    """Classify screenplay lines into elements in a single pass
+
+    Keeps at most one pending line of lookahead (a possible character cue) and the current
+    action block, so it also works on streams too large to hold in memory.
+    """
+    action = []
+    cue = None  # possible character cue waiting for the next line
+    in_dialogue = False
+    block_start = True  # the previous line was blank, or the start of the text
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            if cue is not None:
+                action.append(cue)
+                cue = None
+            if action:
+                yield 'action', '\n'.join(action)
+                action = []
+            in_dialogue = False
+            block_start = True
+            continue
+
+        if cue is not None:
+            yield 'character', cue.lstrip('@')
+            cue = None
+            in_dialogue = True
+        else:
+            speech = inline_speech(stripped)
+            if speech:
+                if action:
+                    yield 'action', '\n'.join(action)
+                    action = []
+                yield from speech
+                # The speech is complete on its line; what follows is action unless it is another speech
+                in_dialogue = False
+                block_start = False
+                continue
+        if in_dialogue:
+            yield ('parenthetical' if stripped.startswith('(') and stripped.endswith(')') else 'dialogue'), stripped
+            continue
+        if not block_start:
+            action.append(line.rstrip())
+            continue
+
+        element_type = classify_line(stripped)
+        if element_type == 'character':
+            cue = stripped
+            block_start = False
+        elif element_type == 'action':
+            action.append(line.rstrip().lstrip('!'))
+            block_start = False
+        else:
+            # Single-line elements; a line directly below one starts a new block
+            yield element_type, element_text(element_type, stripped)
+
+    if cue is not None:
+        action.append(cue)
+    if action:
+        yield 'action', '\n'.join(action)
+
+# Parsed scenes by content hash, shared by the exporter, analytics and search
+_parse_cache = OrderedDict()
+_parse_lock = threading.Lock()
+parse_stats = {'hits': 0, 'misses': 0}
+
+def parse_scene(text: str) -> Tuple[Element, ...]:
+    """Elements of a scene's text; unchanged scenes are served from the parse cache"""
+    key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    with _parse_lock:
+        elements = _parse_cache.get(key)
+        if elements is not None:
+            _parse_cache.move_to_end(key)
+            parse_stats['hits'] += 1
+            return elements
+
+    elements = tuple(iter_elements(text.splitlines()))
+    with _parse_lock:
+        parse_stats['misses'] += 1
+        _parse_cache[key] = elements
+        while len(_parse_cache) > Config.PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return elements
+
+def character_name(cue: str) -> str:
+    """Character name from a dialogue cue without extensions like (V.O.) or (CONT'D)"""
+    return CHARACTER_EXTENSION_PATTERN.sub('', cue.lstrip('@')).strip().title()
+
+def scene_stats(text: str) -> Dict:
+    """Dialogue and action statistics of a scene's text"""
+    stats = {'speakers': {}, 'dialogue_words': 0, 'action_words': 0}
+    for element_type, element in parse_scene(text):
+        if element_type == 'character':
+            speaker = character_name(element)
+            stats['speakers'][speaker] = stats['speakers'].get(speaker, 0) + 1
+        elif element_type == 'dialogue':
+            stats['dialogue_words'] += len(element.split())
+        elif element_type == 'action':
+            stats['action_words'] += len(element.split())
+    return stats
+
+def speakers(text: str) -> Dict[str, int]:
+    """Characters with dialogue in a scene and their number of speeches"""
+    return scene_stats(text)['speakers']
@@ -1,12 +1,28 @@
 import streamlit as st
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from user_manager import UserManager
+from screenplay_parser import speakers
+from batch_transform import is_stale_revision
 
 class ScriptAwareManager:
     """Wrapper to make managers work with script-specific data"""
     
     def __init__(self, user_manager: UserManager):
         self.user_manager = user_manager
+        self.listeners = []
+    
+    def add_listener(self, callback: Callable):
+        """Register a callback(username, script_id, data_type, entity_id, data) run after an entity changes"""
+        self.listeners.append(callback)
+    
+    def notify_change(self, username: str, data_type: str, entity_id: str, data: Optional[Dict]):
+        """Notify listeners that an entity was added, updated or deleted (data is None on delete)"""
+        script_id = st.session_state.get('current_script_id')
+        for callback in self.listeners:
+            try:
+                callback(username, script_id, data_type, entity_id, data)
+            except Exception as e:
+                print(f"Error in script change listener: {e}")
     
     def get_current_script_data(self, username: str) -> Optional[Dict]:
         """Get current script data for the user"""
@@ -18,12 +34,13 @@ class ScriptAwareManager:
     
     def update_script_data(self, username: str, data_type: str, data: Dict) -> bool:
         """Update script data (characters, scenes, locations)"""
-        script = self.get_current_script_data(username)
-        if not script:
-            return False
-        
-        script[data_type] = data
-        return self.user_manager.update_script(username, script['id'], script)
+        with self.user_manager.lock:
+            script = self.get_current_script_data(username)
+            if not script:
+                return False
+            
+            script[data_type] = data
+            return self.user_manager.update_script(username, script['id'], script)
     
     def get_script_data(self, username: str, data_type: str) -> Dict:
         """Get script data (characters, scenes, locations)"""
@@ -34,10 +51,14 @@ class ScriptAwareManager:
     
     def add_character(self, username: str, character_data: Dict) -> bool:
         """Add character to current script"""
-        characters = self.get_script_data(username, 'characters')
-        character_id = str(len(characters) + 1)
-        characters[character_id] = character_data
-        return self.update_script_data(username, 'characters', characters)
+        with self.user_manager.lock:
+            characters = self.get_script_data(username, 'characters')
+            character_id = str(len(characters) + 1)
+            characters[character_id] = character_data
+            if self.update_script_data(username, 'characters', characters):
+                self.notify_change(username, 'characters', character_id, character_data)
+                return True
+            return False
     
     def get_characters(self, username: str) -> Dict:
         """Get all characters for current script"""
@@ -50,19 +71,25 @@ class ScriptAwareManager:
     
     def update_character(self, username: str, character_id: str, character_data: Dict) -> bool:
         """Update character in current script"""
-        characters = self.get_script_data(username, 'characters')
-        if character_id in characters:
-            characters[character_id] = character_data
-            return self.update_script_data(username, 'characters', characters)
-        return False
+        with self.user_manager.lock:
+            characters = self.get_script_data(username, 'characters')
+            if character_id in characters:
+                characters[character_id] = character_data
+                if self.update_script_data(username, 'characters', characters):
+                    self.notify_change(username, 'characters', character_id, character_data)
+                    return True
+            return False
     
     def delete_character(self, username: str, character_id: str) -> bool:
         """Delete character from current script"""
-        characters = self.get_script_data(username, 'characters')
-        if character_id in characters:
-            del characters[character_id]
-            return self.update_script_data(username, 'characters', characters)
-        return False
+        with self.user_manager.lock:
+            characters = self.get_script_data(username, 'characters')
+            if character_id in characters:
+                del characters[character_id]
+                if self.update_script_data(username, 'characters', characters):
+                    self.notify_change(username, 'characters', character_id, None)
+                    return True
+            return False
     
     def search_characters(self, username: str, query: str) -> Dict:
         """Search characters in current script"""
@@ -81,11 +108,58 @@ class ScriptAwareManager:
     
     def add_scene(self, username: str, scene_data: Dict) -> bool:
         """Add scene to current script"""
-        scenes = self.get_script_data(username, 'scenes')
-        scene_id = str(len(scenes) + 1)
-        scene_data['id'] = scene_id
-        scenes[scene_id] = scene_data
-        return self.update_script_data(username, 'scenes', scenes)
+        with self.user_manager.lock:
+            scenes = self.get_script_data(username, 'scenes')
+            scene_id = str(len(scenes) + 1)
+            scene_data['id'] = scene_id
+            scenes[scene_id] = scene_data
+            if self.update_script_data(username, 'scenes', scenes):
+                self.notify_change(username, 'scenes', scene_id, scene_data)
+                return True
+            return False
+    
+    def import_entities(self, username: str, scenes: List[Dict], characters: List[Dict], locations: List[Dict]) -> Dict:
+        """Add many scenes, characters and locations to the current script with a single save
+        
+        Characters and locations whose name already exists are skipped; imported scenes are
+        numbered after the existing ones. Listeners are not notified per entity; the context
+        and embedding indexes pick the new entities up on their next sync.
+        """
+        with self.user_manager.lock:
+            script = self.get_current_script_data(username)
+            if not script:
+                return {}
+            
+            def first_free_id(entities: Dict) -> int:
+                return max((int(entity_id) for entity_id in entities if str(entity_id).isdigit()), default=0) + 1
+            
+            counts = {}
+            for data_type, items in (('characters', characters), ('locations', locations)):
+                entities = script.setdefault(data_type, {})
+                existing = {entity.get('name', '').lower() for entity in entities.values()}
+                next_id = first_free_id(entities)
+                counts[data_type] = 0
+                for item in items:
+                    name = item.get('name', '').lower()
+                    if name in existing:
+                        continue
+                    entities[str(next_id)] = item
+                    existing.add(name)
+                    next_id += 1
+                    counts[data_type] += 1
+            
+            existing_scenes = script.setdefault('scenes', {})
+            next_id = first_free_id(existing_scenes)
+            first_number = max((int(scene.get('scene_number', 0)) for scene in existing_scenes.values()
+                                if str(scene.get('scene_number', '')).isdigit()), default=0)
+            for offset, scene in enumerate(scenes):
+                scene_id = str(next_id + offset)
+                existing_scenes[scene_id] = dict(scene, id=scene_id, scene_number=first_number + offset + 1)
+            counts['scenes'] = len(scenes)
+            
+            if not self.user_manager.update_script(username, script['id'], script):
+                return {}
+            return counts
     
     def get_scenes(self, username: str) -> Dict:
         """Get all scenes for current script"""
@@ -102,26 +176,60 @@ class ScriptAwareManager:
     
     def update_scene(self, username: str, scene_id: str, scene_data: Dict) -> bool:
         """Update scene in current script"""
-        scenes = self.get_script_data(username, 'scenes')
-        if scene_id in scenes:
-            scenes[scene_id] = scene_data
-            return self.update_script_data(username, 'scenes', scenes)
-        return False
+        with self.user_manager.lock:
+            scenes = self.get_script_data(username, 'scenes')
+            if scene_id in scenes:
+                scenes[scene_id] = scene_data
+                if self.update_script_data(username, 'scenes', scenes):
+                    self.notify_change(username, 'scenes', scene_id, scene_data)
+                    return True
+            return False
+    
+    def review_scene_revision(self, username: str, scene_id: str, revision_id: str, accept: bool) -> bool:
+        """Accept (replace the scene content) or reject a pending scene revision
+        
+        A revision made from text the scene no longer has is not applied, since that would
+        discard the later edits; it is marked 'stale' instead and False is returned.
+        """
+        with self.user_manager.lock:
+            scenes = self.get_script_data(username, 'scenes')
+            scene = scenes.get(scene_id)
+            if not scene:
+                return False
+            for revision in scene.get('revisions', []):
+                if revision['id'] == revision_id and revision.get('status') == 'pending':
+                    if accept and is_stale_revision(scene, revision):
+                        revision['status'] = 'stale'
+                        self.update_scene(username, scene_id, scene)
+                        return False
+                    revision['status'] = 'accepted' if accept else 'rejected'
+                    if accept:
+                        scene['action'] = revision['action']
+                    return self.update_scene(username, scene_id, scene)
+            return False
     
     def delete_scene(self, username: str, scene_id: str) -> bool:
         """Delete scene from current script"""
-        scenes = self.get_script_data(username, 'scenes')
-        if scene_id in scenes:
-            del scenes[scene_id]
-            return self.update_script_data(username, 'scenes', scenes)
-        return False
+        with self.user_manager.lock:
+            scenes = self.get_script_data(username, 'scenes')
+            if scene_id in scenes:
+                del scenes[scene_id]
+                if self.update_script_data(username, 'scenes', scenes):
+                    self.notify_change(username, 'scenes', scene_id, None)
+                    return True
+            return False
     
     def search_scenes(self, username: str, query: str) -> Dict:
-        """Search scenes in current script"""
+        """Search scenes in current script; '@name' finds the scenes where a character has dialogue"""
         scenes = self.get_script_data(username, 'scenes')
         if not query:
             return scenes
         
+        if query.startswith('@'):
+            name = query[1:].strip().lower()
+            return {scene_id: scene for scene_id, scene in scenes.items()
+                    if any(name in speaker.lower() for speaker in speakers(scene.get('action', '') or ''))}
+        
         results = {}
         query_lower = query.lower()
         for scene_id, scene in scenes.items():
@@ -152,10 +260,14 @@ class ScriptAwareManager:
     
     def add_location(self, username: str, location_data: Dict) -> bool:
         """Add location to current script"""
-        locations = self.get_script_data(username, 'locations')
-        location_id = str(len(locations) + 1)
-        locations[location_id] = location_data
-        return self.update_script_data(username, 'locations', locations)
+        with self.user_manager.lock:
+            locations = self.get_script_data(username, 'locations')
+            location_id = str(len(locations) + 1)
+            locations[location_id] = location_data
+            if self.update_script_data(username, 'locations', locations):
+                self.notify_change(username, 'locations', location_id, location_data)
+                return True
+            return False
     
     def get_locations(self, username: str) -> Dict:
         """Get all locations for current script"""
@@ -172,19 +284,25 @@ class ScriptAwareManager:
     
     def update_location(self, username: str, location_id: str, location_data: Dict) -> bool:
         """Update location in current script"""
-        locations = self.get_script_data(username, 'locations')
-        if location_id in locations:
-            locations[location_id] = location_data
-            return self.update_script_data(username, 'locations', locations)
-        return False
+        with self.user_manager.lock:
+            locations = self.get_script_data(username, 'locations')
+            if location_id in locations:
+                locations[location_id] = location_data
+                if self.update_script_data(username, 'locations', locations):
+                    self.notify_change(username, 'locations', location_id, location_data)
+                    return True
+            return False
     
     def delete_location(self, username: str, location_id: str) -> bool:
         """Delete location from current script"""
-        locations = self.get_script_data(username, 'locations')
-        if location_id in locations:
-            del locations[location_id]
-            return self.update_script_data(username, 'locations', locations)
-        return False
+        with self.user_manager.lock:
+            locations = self.get_script_data(username, 'locations')
+            if location_id in locations:
+                del locations[location_id]
+                if self.update_script_data(username, 'locations', locations):
+                    self.notify_change(username, 'locations', location_id, None)
+                    return True
+            return False
     
     def search_locations(self, username: str, query: str) -> Dict:
         """Search locations in current script"""
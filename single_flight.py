@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key: the first caller runs, the others wait for its result"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}  # key -> Future of the leading call
+        self.stats = {'executed': 0, 'coalesced': 0, 'failed': 0}
+
+    def do(self, key: Hashable, fn: Callable):
+        """Run fn for key, or wait on the identical call already in flight and share its outcome"""
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+                self.stats['executed'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self.lock:
+                self.stats['failed'] += 1
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+        future.set_result(result)
+        return result
+
+    def get_stats(self) -> Dict:
+        """Counts of executed, coalesced and failed calls"""
+        with self.lock:
+            return dict(self.stats, in_flight=len(self.in_flight))
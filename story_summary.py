@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+from config import Config
+
+class StorySummarizer:
+    """Bounded "story so far" for long scripts built from cached hierarchical summaries
+
+    Scenes are summarized individually, groups of about SUMMARY_SEQUENCE_SIZE scene summaries
+    are folded into sequence summaries, and groups of about SUMMARY_ACT_SIZE sequences into act
+    summaries. Act summaries are folded again until at most SUMMARY_MAX_ACTS remain. Group
+    boundaries are chosen by the content hash of each item rather than its position, so
+    inserting or editing one scene only recomputes the summaries of the groups containing it;
+    every summary is cached by a hash of its input.
+    """
+
+    def __init__(self, llm_client, cache_file: str = None):
+        self.llm_client = llm_client
+        self.cache_file = cache_file or os.path.join("data", "summary_cache.json")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict(self.load_cache())
+
+    def load_cache(self):
+        """Load cached summaries from JSON file"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+            except Exception as e:
+                print(f"Error loading summary cache: {e}")
+        return {}
+
+    def save_cache(self):
+        """Save cached summaries to JSON file, dropping the least recently used beyond the limit"""
+        with self.lock:
+            while len(self.cache) > Config.SUMMARY_CACHE_LIMIT:
+                self.cache.popitem(last=False)
+            try:
+                os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+                with open(self.cache_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.cache, f, indent=2, ensure_ascii=False)
+            except Exception as e:
+                print(f"Error saving summary cache: {e}")
+
+    @staticmethod
+    def summary_key(level: str, text: str) -> str:
+        return hashlib.sha256(f"{level}\x00{text}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def build_summary_prompt(level: str, text: str) -> str:
+        if level == 'scene':
+            return f"""
+            Summarize this scene in 2-3 sentences for continuity tracking. Mention who is present,
+            what happens, and any facts later scenes must respect (injuries, objects, time, places, revelations).
+
+            {text}
+            """
+        return f"""
+        Condense these consecutive {level} summaries into one {level} summary of at most 5 sentences.
+        Keep the facts later scenes must respect (who knows what, injuries, objects, time, places).
+
+        {text}
+        """
+
+    def summarize_many(self, level: str, texts: List[str]) -> List[str]:
+        """Summaries for several texts; cache misses are generated in one parallel batch"""
+        keys = [self.summary_key(level, text) for text in texts]
+        with self.lock:
+            summaries = [self.cache.get(key) for key in keys]
+            for key, summary in zip(keys, summaries):
+                if summary is not None:
+                    self.cache.move_to_end(key)
+
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if missing:
+            prompts = [self.build_summary_prompt(level, texts[i]) for i in missing]
+            results = self.llm_client.generate_batch(prompts, operation="summarize")
+            with self.lock:
+                for i, result in zip(missing, results):
+                    if result.startswith("Error generating"):
+                        # Not cached; fall back to the start of the text so the check can still run
+                        summaries[i] = texts[i][:Config.SUMMARY_FALLBACK_CHARS]
+                    else:
+                        summaries[i] = result.strip()
+                        self.cache[keys[i]] = summaries[i]
+            self.save_cache()
+        return summaries
+
+    @staticmethod
+    def chunk(keys: List[str], group_size: int, close_last: bool = False) -> Tuple[List[List[int]], List[int]]:
+        """Split items into groups ending where an item's key hashes to a boundary; return (groups, leftover)
+
+        Groups average group_size items and hold at most twice that. A boundary only depends on
+        the item itself, so inserting an item moves no boundary outside its own group.
+        """
+        groups, current = [], []
+        for i, key in enumerate(keys):
+            current.append(i)
+            if int(key[:8], 16) % group_size == 0 or len(current) >= 2 * group_size:
+                groups.append(current)
+                current = []
+        if close_last and current:
+            groups.append(current)
+            current = []
+        return groups, current
+
+    def fold(self, level: str, items: List[Tuple[str, str]], group_size: int,
+             close_last: bool = False) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """Summarize complete groups of (key, summary) items; return (group items, leftover items)"""
+        groups, leftover = self.chunk([key for key, _ in items], group_size, close_last)
+        texts = ["\n".join(items[i][1] for i in group) for group in groups]
+        folded = [(self.summary_key(level, text), summary) for text, summary in zip(texts, self.summarize_many(level, texts))]
+        return folded, [items[i] for i in leftover]
+
+    def story_so_far(self, scenes: List[str]) -> str:
+        """Bounded summary of scenes: top-level act summaries, then the summaries of the unfinished tail"""
+        if not scenes:
+            return ""
+        scene_items = list(zip([self.summary_key('scene', text) for text in scenes], self.summarize_many('scene', scenes)))
+        sequences, recent_scenes = self.fold('sequence', scene_items, Config.SUMMARY_SEQUENCE_SIZE)
+        acts, recent_sequences = self.fold('act', sequences, Config.SUMMARY_ACT_SIZE)
+        tails = [("Sequence", recent_sequences), ("Scene", recent_scenes)]
+
+        # Fold act summaries into summaries of several acts until few enough remain
+        while len(acts) > Config.SUMMARY_MAX_ACTS:
+            folded, leftover = self.fold('act', acts, Config.SUMMARY_ACT_SIZE)
+            if len(folded) + len(leftover) >= len(acts):
+                # Every group was a single act; condense them all into one summary instead
+                text = "\n".join(summary for _, summary in acts)
+                folded, leftover = [(self.summary_key('act', text), self.summarize_many('act', [text])[0])], []
+            tails.insert(0, ("Act", leftover))
+            acts = folded
+
+        parts = [f"Act {i}: {summary}" for i, (_, summary) in enumerate(acts, start=1)]
+        for label, items in tails:
+            parts += [f"{label}: {summary}" for _, summary in items]
+        return "\n".join(parts)
+
+    def continuity_context(self, previous_scenes: List[str]) -> Tuple[str, List[str]]:
+        """Split previous scenes into a summarized "story so far" and the neighbouring scenes kept verbatim"""
+        neighbours = Config.CONTINUITY_NEIGHBOUR_SCENES
+        earlier = previous_scenes[:-neighbours] if neighbours else previous_scenes
+        recent = previous_scenes[-neighbours:] if neighbours else []
+        return self.story_so_far(earlier), recent
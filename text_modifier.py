@@ -1,14 +1,26 @@
 from typing import Dict, List, Optional
 from llm_client import LLMClient
+from story_summary import StorySummarizer
 
 class TextModifier:
-    def __init__(self):
-        self.llm_client = LLMClient()
+    def __init__(self, llm_client: LLMClient = None):
+        self.llm_client = llm_client or LLMClient()
+        self.story_summarizer = StorySummarizer(self.llm_client)
     
     def modify_tone(self, text: str, new_tone: str, context: str = "") -> str:
         """Modify the tone of text while maintaining meaning"""
         return self.llm_client.modify_text_tone(text, new_tone)
     
+    def modify_tone_variants(self, text: str, tones: List[str]) -> List[Dict]:
+        """Rewrite text in several tones in one batch, for side-by-side comparison"""
+        results = self.llm_client.modify_text_tone_variants(text, tones)
+        return [{'label': tone, 'text': result} for tone, result in zip(tones, results)]
+    
+    def sample_tone_variants(self, text: str, new_tone: str, count: int = 3) -> List[Dict]:
+        """Generate several alternative rewrites of text in the same tone"""
+        results = self.llm_client.generate_variants(self.llm_client.build_tone_prompt(text, new_tone), count, operation="rewrite")
+        return [{'label': f"{new_tone} #{i}", 'text': result} for i, result in enumerate(results, start=1)]
+    
     def modify_setting(self, scene_text: str, new_setting: str) -> str:
         """Modify scene to fit a new setting"""
         return self.llm_client.modify_setting(scene_text, new_setting)
@@ -26,7 +38,7 @@ class TextModifier:
         
         Please add more {expansion_type} while maintaining the original structure and meaning.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def condense_scene(self, scene_text: str) -> str:
         """Condense a scene while maintaining key elements"""
@@ -37,7 +49,7 @@ class TextModifier:
         
         Please create a more concise version that preserves the essential elements.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def change_perspective(self, scene_text: str, new_perspective: str) -> str:
         """Change the narrative perspective of a scene"""
@@ -48,7 +60,7 @@ class TextModifier:
         
         Please maintain the same events and dialogue while changing the narrative perspective to {new_perspective}.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def add_conflict(self, scene_text: str, conflict_type: str) -> str:
         """Add conflict to a scene"""
@@ -59,7 +71,7 @@ class TextModifier:
         
         Please integrate the conflict naturally into the existing scene while maintaining character consistency.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def improve_dialogue(self, dialogue: str, character_name: str = "") -> str:
         """Improve dialogue to be more natural and character-specific"""
@@ -71,7 +83,7 @@ class TextModifier:
         
         Please make the dialogue more realistic, character-specific, and emotionally engaging.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def add_visual_elements(self, scene_text: str) -> str:
         """Add visual storytelling elements to a scene"""
@@ -82,7 +94,7 @@ class TextModifier:
         
         Please add cinematic details, visual cues, and atmospheric elements that enhance the visual storytelling.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def create_transition(self, scene1: str, scene2: str) -> str:
         """Create a smooth transition between two scenes"""
@@ -97,11 +109,18 @@ class TextModifier:
         
         Please write a brief transition that connects these scenes naturally and maintains narrative flow.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="generate")
     
     def fix_continuity_issues(self, scene_text: str, previous_scenes: List[str]) -> str:
-        """Fix continuity issues in a scene"""
-        context = "\n\n".join(previous_scenes)
+        """Fix continuity issues in a scene
+        
+        Only the scenes right before this one are sent verbatim; everything earlier is
+        condensed into a cached "story so far", so the prompt stays bounded for long scripts.
+        """
+        story_so_far, recent_scenes = self.story_summarizer.continuity_context(previous_scenes)
+        context = "\n\n".join(recent_scenes)
+        if story_so_far:
+            context = f"Story so far (summary):\n{story_so_far}\n\nMost recent scenes:\n{context}"
         prompt = f"""
         Fix any continuity issues in the following scene based on the previous scenes:
         
@@ -113,7 +132,7 @@ class TextModifier:
         
         Please identify and fix any continuity issues while maintaining the scene's integrity.
         """
-        return self.llm_client.generate_response(prompt)
+        return self.llm_client.generate_response(prompt, operation="rewrite")
     
     def enhance_character_development(self, scene_text: str, character_name: str) -> str:
         """Enhance character development in a scene"""
@@ -124,4 +143,4 @@ class TextModifier:
         
         Please add elements that reveal more about {character_name}'s personality, motivations, or growth.
         """
-        return self.llm_client.generate_response(prompt) 
\ No newline at end of file
+        return self.llm_client.generate_response(prompt, operation="rewrite") 
\ No newline at end of file
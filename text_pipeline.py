@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+from config import Config
+from generation_jobs import check_llm_result
+from job_queue import JobQueue
+
+# Text tools that can be chained: method -> (label, parameter label, parameter choices or None for free text)
+PIPELINE_STAGES = {
+    'expand_scene': ("Expand", "What to expand", ["detail", "dialogue", "action", "description", "emotion"]),
+    'add_conflict': ("Add Conflict", "Conflict type", ["internal", "external", "interpersonal", "environmental", "societal"]),
+    'add_visual_elements': ("Add Visual Elements", None, None),
+    'improve_dialogue': ("Improve Dialogue", "Character name (optional)", None),
+    'modify_tone': ("Change Tone", "Tone", ["dramatic", "comedic", "suspenseful", "romantic", "dark", "lighthearted", "formal", "casual"]),
+    'condense_scene': ("Condense", None, None),
+    'change_perspective': ("Change Perspective", "Perspective", ["first person", "third person limited", "third person omniscient", "second person"]),
+    'enhance_character_development': ("Enhance Character Development", "Character", None)
+}
+
+def stage_label(stage: Dict) -> str:
+    """Human readable name of a stage, e.g. 'Add Conflict (internal)'"""
+    label = PIPELINE_STAGES[stage['method']][0]
+    return f"{label} ({stage['param']})" if stage.get('param') else label
+
+def apply_stage(text_modifier, text: str, stage: Dict) -> str:
+    """Run one stage's text tool on text; raises if the tool reports an error"""
+    method = stage['method']
+    if method not in PIPELINE_STAGES:
+        raise ValueError(f"Unknown pipeline stage: {method}")
+    args = [text]
+    if PIPELINE_STAGES[method][1]:
+        args.append(stage.get('param', ''))
+    return check_llm_result(getattr(text_modifier, method)(*args))
+
+class TextPipeline:
+    """Chain text tools so each stage's output feeds the next
+
+    Every stage result is cached by a hash of its input text and settings, so re-running a
+    pipeline after changing only a later stage reuses the earlier outputs. Pipelines can be
+    saved per user as named presets.
+    """
+
+    def __init__(self, text_modifier, job_queue: JobQueue = None, cache_file: str = None, presets_file: str = None):
+        self.text_modifier = text_modifier
+        self.cache_file = cache_file or os.path.join("data", "pipeline_cache.json")
+        self.presets_file = presets_file or os.path.join("data", "pipeline_presets.json")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict(self.load_json(self.cache_file))
+        self.presets = self.load_json(self.presets_file)
+        if job_queue is not None:
+            job_queue.register_handler('text_pipeline', self.run_pipeline_job)
+
+    @staticmethod
+    def load_json(path: str) -> Dict:
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    if isinstance(data, dict):
+                        return data
+            except Exception as e:
+                print(f"Error loading {path}: {e}")
+        return {}
+
+    @staticmethod
+    def save_json(path: str, data: Dict):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error saving {path}: {e}")
+
+    @staticmethod
+    def stage_key(text: str, stage: Dict) -> str:
+        """Cache key of a stage applied to an input text"""
+        encoded = json.dumps([stage['method'], stage.get('param', ''), text], ensure_ascii=False)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def run(self, text: str, stages: List[Dict]) -> List[Dict]:
+        """Run stages in order and return one {'label', 'text', 'cached'} per stage"""
+        results = []
+        for stage in stages:
+            key = self.stage_key(text, stage)
+            with self.lock:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.cache.move_to_end(key)
+            if cached is None:
+                text = apply_stage(self.text_modifier, text, stage)
+                with self.lock:
+                    self.cache[key] = text
+                    while len(self.cache) > Config.PIPELINE_CACHE_LIMIT:
+                        self.cache.popitem(last=False)
+                    self.save_json(self.cache_file, self.cache)
+            else:
+                text = cached
+            results.append({'label': stage_label(stage), 'text': text, 'cached': cached is not None})
+        return results
+
+    def run_pipeline_job(self, payload: Dict) -> List[Dict]:
+        results = self.run(payload['text'], payload['stages'])
+        for number, result in enumerate(results, start=1):
+            result['label'] = f"{number}. {result['label']}" + (" ♻️" if result['cached'] else "")
+        return results
+
+    def list_presets(self, username: str) -> Dict[str, List[Dict]]:
+        """Saved pipelines of a user by name"""
+        with self.lock:
+            return dict(self.presets.get(username, {}))
+
+    def save_preset(self, username: str, name: str, stages: List[Dict]):
+        """Save (or overwrite) a named pipeline for a user"""
+        with self.lock:
+            self.presets.setdefault(username, {})[name] = list(stages)
+            self.save_json(self.presets_file, self.presets)
+
+    def delete_preset(self, username: str, name: str) -> bool:
+        """Delete a named pipeline of a user"""
+        with self.lock:
+            if name not in self.presets.get(username, {}):
+                return False
+            del self.presets[username][name]
+            self.save_json(self.presets_file, self.presets)
+            return True
@@ -3,20 +3,57 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
 from docx.oxml.shared import OxmlElement, qn
-from typing import Dict, List
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Callable, Dict, List, Tuple
+import hashlib
+import io
+import json
 import os
+import re
+import threading
 from datetime import datetime
 from config import Config
+from screenplay_parser import parse_scene
+
+# Persisted exports look like My_Screenplay_20250625_203519.docx (or Bundle_20250625_203519.zip)
+EXPORT_FILE_PATTERN = re.compile(r".+_\d{8}_\d{6}\.(?:docx|zip)$")
+
+# Bump when setup_document_styles or add_scene change how a scene renders; invalidates cached fragments
+STYLE_VERSION = 4
+# Scene fields add_scene reads
+FRAGMENT_FIELDS = ('scene_number', 'title', 'location', 'action', 'notes')
+# Paragraph style of each screenplay element type; other elements use 'Action'
+ELEMENT_STYLES = {
+    'heading': 'Scene Heading', 'character': 'Character',
+    'parenthetical': 'Parenthetical', 'dialogue': 'Dialogue'
+}
 
 class WordExporter:
     def __init__(self):
-        self.document = Document()
-        self.setup_document_styles()
+        # Styled empty document built once; every export starts from a fresh copy of it
+        self.template = self.build_template()
+        # Rendered scene paragraphs (XML elements) by scene content hash, reused across exports
+        self.fragments = OrderedDict()
+        self.fragment_lock = threading.Lock()
+        self.fragment_stats = {'hits': 0, 'misses': 0}
+    
+    def build_template(self) -> bytes:
+        """Build the styled, empty screenplay document and serialize it"""
+        document = Document()
+        self.setup_document_styles(document)
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
     
-    def setup_document_styles(self):
+    def new_document(self) -> Document:
+        """Fresh document for one export, cloned from the pre-styled template"""
+        return Document(io.BytesIO(self.template))
+    
+    def setup_document_styles(self, document: Document):
         """Setup professional screenplay formatting styles"""
         # Set page margins for screenplay format
-        sections = self.document.sections
+        sections = document.sections
         for section in sections:
             section.top_margin = Inches(1)
             section.bottom_margin = Inches(1)
@@ -24,7 +61,7 @@ class WordExporter:
             section.right_margin = Inches(1)
         
         # Create custom styles
-        styles = self.document.styles
+        styles = document.styles
         
         # Scene heading style
         scene_style = styles.add_style('Scene Heading', WD_STYLE_TYPE.PARAGRAPH)
@@ -63,10 +100,10 @@ class WordExporter:
         parenthetical_style.paragraph_format.left_indent = Inches(3)
         parenthetical_style.paragraph_format.right_indent = Inches(2.5)
     
-    def add_title_page(self, title: str, author: str = "Screenwriter"):
+    def add_title_page(self, document: Document, title: str, author: str = "Screenwriter"):
         """Add a professional title page"""
         # Title
-        title_para = self.document.add_paragraph()
+        title_para = document.add_paragraph()
         title_run = title_para.add_run(title.upper())
         title_run.font.name = 'Courier New'
         title_run.font.size = Pt(24)
@@ -74,20 +111,20 @@ class WordExporter:
         title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
         
         # Add some spacing
-        self.document.add_paragraph()
-        self.document.add_paragraph()
+        document.add_paragraph()
+        document.add_paragraph()
         
         # Author
-        author_para = self.document.add_paragraph()
+        author_para = document.add_paragraph()
         author_run = author_para.add_run(f"by\n{author}")
         author_run.font.name = 'Courier New'
         author_run.font.size = Pt(14)
         author_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
         
         # Add page break
-        self.document.add_page_break()
+        document.add_page_break()
     
-    def add_scene(self, scene_data: Dict):
+    def add_scene(self, document: Document, scene_data: Dict):
         """Add a scene in professional screenplay format"""
         # Scene heading
         scene_number = scene_data.get('scene_number', 'N/A')
@@ -103,17 +140,16 @@ class WordExporter:
         else:
             scene_heading = f"SCENE {scene_number}"
         
-        scene_para = self.document.add_paragraph(scene_heading, style='Scene Heading')
+        scene_para = document.add_paragraph(scene_heading, style='Scene Heading')
         
-        # Action/Description (now combined with dialogue)
-        action = scene_data.get('action', '')
-        if action:
-            action_para = self.document.add_paragraph(action, style='Action')
+        # Action and dialogue, one paragraph per screenplay element
+        for element_type, text in parse_scene(scene_data.get('action', '') or ''):
+            document.add_paragraph(text, style=ELEMENT_STYLES.get(element_type, 'Action'))
         
         # Notes (if any)
         notes = scene_data.get('notes', '')
         if notes:
-            notes_para = self.document.add_paragraph()
+            notes_para = document.add_paragraph()
             notes_run = notes_para.add_run(f"NOTES: {notes}")
             notes_run.font.name = 'Courier New'
             notes_run.font.size = Pt(10)
@@ -121,14 +157,68 @@ class WordExporter:
             notes_para.paragraph_format.left_indent = Inches(0.5)
         
         # Add spacing between scenes
-        self.document.add_paragraph()
+        document.add_paragraph()
+    
+    @staticmethod
+    def fragment_key(scene_data: Dict) -> str:
+        """Cache key of a scene's rendered paragraphs: its rendered fields plus the style version"""
+        fields = {field: scene_data.get(field) for field in FRAGMENT_FIELDS}
+        encoded = json.dumps([STYLE_VERSION, fields], sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
     
-    def add_character_list(self, characters: List[Dict]):
+    def add_scene_cached(self, document: Document, scene_data: Dict):
+        """Add a scene, copying its paragraphs from the fragment cache when the scene is unchanged"""
+        body = document.element.body
+        sect_pr = body.find(qn('w:sectPr'))
+        key = self.fragment_key(scene_data)
+        with self.fragment_lock:
+            fragment = self.fragments.get(key)
+            if fragment is not None:
+                self.fragments.move_to_end(key)
+                self.fragment_stats['hits'] += 1
+        
+        if fragment is not None:
+            for element in fragment:
+                if sect_pr is not None:
+                    sect_pr.addprevious(deepcopy(element))
+                else:
+                    body.append(deepcopy(element))
+            return
+        
+        # Render normally, then keep copies of the paragraphs it appended
+        start = len(body) - (1 if sect_pr is not None else 0)
+        self.add_scene(document, scene_data)
+        end = len(body) - (1 if sect_pr is not None else 0)
+        fragment = [deepcopy(element) for element in body[start:end]]
+        with self.fragment_lock:
+            self.fragment_stats['misses'] += 1
+            self.fragments[key] = fragment
+            while len(self.fragments) > Config.EXPORT_FRAGMENT_CACHE_SIZE:
+                self.fragments.popitem(last=False)
+    
+    def add_scene_index(self, document: Document, scene_index: List[Dict]):
+        """Add a table of scenes with their screenplay page and length in eighths of a page"""
+        document.add_paragraph("SCENE INDEX", style='Scene Heading')
+        
+        table = document.add_table(rows=1, cols=4)
+        for cell, label in zip(table.rows[0].cells, ("Scene", "Heading", "Page", "Length")):
+            cell.text = label
+            cell.paragraphs[0].runs[0].font.bold = True
+        for entry in scene_index:
+            row = table.add_row().cells
+            row[0].text = str(entry.get('scene_number', ''))
+            row[1].text = entry['heading']
+            row[2].text = str(entry['page'])
+            row[3].text = entry['length']
+        
+        document.add_page_break()
+    
+    def add_character_list(self, document: Document, characters: List[Dict]):
         """Add a character list at the end"""
-        self.document.add_page_break()
+        document.add_page_break()
         
         # Character List heading
-        char_heading = self.document.add_paragraph("CHARACTER LIST", style='Scene Heading')
+        char_heading = document.add_paragraph("CHARACTER LIST", style='Scene Heading')
         
         for char in characters:
             char_name = char.get('name', 'Unknown')
@@ -136,66 +226,123 @@ class WordExporter:
             char_desc = char.get('description', 'No description')
             char_personality = char.get('personality', 'No personality traits')
             
-            char_para = self.document.add_paragraph()
+            char_para = document.add_paragraph()
             char_run = char_para.add_run(f"{char_name.upper()} (Age: {char_age})")
             char_run.font.name = 'Courier New'
             char_run.font.size = Pt(12)
             char_run.font.bold = True
             
-            desc_para = self.document.add_paragraph(char_desc)
-            desc_para.style = self.document.styles['Action']
+            desc_para = document.add_paragraph(char_desc)
+            desc_para.style = document.styles['Action']
             
-            personality_para = self.document.add_paragraph(char_personality)
-            personality_para.style = self.document.styles['Action']
+            personality_para = document.add_paragraph(char_personality)
+            personality_para.style = document.styles['Action']
             
-            self.document.add_paragraph()
+            document.add_paragraph()
     
-    def export_scenes_to_word(self, scenes: List[Dict], characters: List[Dict], 
-                            title: str = "Screenplay", author: str = "Screenwriter") -> str:
-        """Export scenes to a Word document"""
+    @staticmethod
+    def export_filename(name: str) -> str:
+        """Timestamped .docx file name for an export"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"{name.replace(' ', '_')}_{timestamp}.docx"
+    
+    @staticmethod
+    def to_bytes(document: Document) -> bytes:
+        """Serialize a document in memory"""
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+    
+    def render_scenes(self, scenes: List[Dict], characters: List[Dict],
+                      title: str = "Screenplay", author: str = "Screenwriter",
+                      scene_index: List[Dict] = None,
+                      on_progress: Callable[[int, int], None] = None) -> Tuple[bytes, str]:
+        """Render scenes to a Word document in memory and return (file contents, file name)
+        
+        scene_index is the per-scene result of Paginator.paginate; when given, a page-numbered
+        scene index follows the title page. on_progress(done, total) is called after each scene.
+        """
         try:
+            document = self.new_document()
+            
             # Add title page
-            self.add_title_page(title, author)
+            self.add_title_page(document, title, author)
             
-            # Add scenes
-            for scene in scenes:
-                self.add_scene(scene)
+            # Add scene index
+            if scene_index:
+                self.add_scene_index(document, scene_index)
+            
+            # Add scenes (unchanged scenes come from the fragment cache)
+            for number, scene in enumerate(scenes, start=1):
+                self.add_scene_cached(document, scene)
+                if on_progress:
+                    on_progress(number, len(scenes))
             
             # Add character list
             if characters:
-                self.add_character_list(characters)
-            
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{title.replace(' ', '_')}_{timestamp}.docx"
-            filepath = os.path.join(Config.SCRIPT_FILE_PATH, filename)
+                self.add_character_list(document, characters)
             
-            # Save document
-            self.document.save(filepath)
-            
-            return filepath
+            return self.to_bytes(document), self.export_filename(title)
             
         except Exception as e:
             raise Exception(f"Error exporting to Word: {str(e)}")
     
-    def export_single_scene(self, scene_data: Dict, title: str = "Scene") -> str:
-        """Export a single scene to Word"""
+    def render_single_scene(self, scene_data: Dict, title: str = "Scene") -> Tuple[bytes, str]:
+        """Render a single scene to a Word document in memory and return (file contents, file name)"""
         try:
+            document = self.new_document()
+            
             # Add title page
-            self.add_title_page(f"{title} - Scene {scene_data.get('scene_number', 'N/A')}")
+            self.add_title_page(document, f"{title} - Scene {scene_data.get('scene_number', 'N/A')}")
             
             # Add the scene
-            self.add_scene(scene_data)
-            
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"Scene_{scene_data.get('scene_number', 'N/A')}_{timestamp}.docx"
-            filepath = os.path.join(Config.SCRIPT_FILE_PATH, filename)
+            self.add_scene_cached(document, scene_data)
             
-            # Save document
-            self.document.save(filepath)
-            
-            return filepath
+            return self.to_bytes(document), self.export_filename(f"Scene_{scene_data.get('scene_number', 'N/A')}")
             
         except Exception as e:
-            raise Exception(f"Error exporting scene to Word: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error exporting scene to Word: {str(e)}")
+    
+    def persist_export(self, data: bytes, filename: str) -> str:
+        """Save a rendered export to Config.EXPORT_DIR, applying the retention policy, and return its path"""
+        os.makedirs(Config.EXPORT_DIR, exist_ok=True)
+        filepath = os.path.join(Config.EXPORT_DIR, filename)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        self.cleanup_exports()
+        return filepath
+    
+    def cleanup_exports(self) -> int:
+        """Delete persisted exports older than EXPORT_RETENTION_DAYS or beyond the EXPORT_MAX_FILES newest
+        
+        Only timestamped export files (name_YYYYMMDD_HHMMSS.docx or .zip) are considered.
+        Returns the number of files deleted.
+        """
+        if not os.path.isdir(Config.EXPORT_DIR):
+            return 0
+        exports = []
+        for filename in os.listdir(Config.EXPORT_DIR):
+            if EXPORT_FILE_PATTERN.match(filename):
+                filepath = os.path.join(Config.EXPORT_DIR, filename)
+                exports.append((os.path.getmtime(filepath), filepath))
+        exports.sort(reverse=True)
+        
+        cutoff = datetime.now().timestamp() - Config.EXPORT_RETENTION_DAYS * 86400
+        deleted = 0
+        for position, (modified, filepath) in enumerate(exports):
+            if position >= Config.EXPORT_MAX_FILES or modified < cutoff:
+                try:
+                    os.remove(filepath)
+                    deleted += 1
+                except OSError as e:
+                    print(f"Error deleting old export {filepath}: {e}")
+        return deleted
+    
+    def export_scenes_to_word(self, scenes: List[Dict], characters: List[Dict], 
+                            title: str = "Screenplay", author: str = "Screenwriter") -> str:
+        """Export scenes to a Word document saved in Config.EXPORT_DIR"""
+        return self.persist_export(*self.render_scenes(scenes, characters, title, author))
+    
+    def export_single_scene(self, scene_data: Dict, title: str = "Scene") -> str:
+        """Export a single scene to a Word document saved in Config.EXPORT_DIR"""
+        return self.persist_export(*self.render_single_scene(scene_data, title))